@@ -44,6 +44,8 @@ The transport implementation is documented below:
 """
 
 import asyncio
+import collections
+import itertools
 import logging
 import socket
 
@@ -149,10 +151,29 @@ class STARTTLSTransport(asyncio.Transport):
     e.g. using DANE. The coroutine must not return a value. If it encounters an
     error, an appropriate exception should be raised, which will propagate out
     of :meth:`starttls` and/or passed to the `waiter` future.
+
+    Data passed to :meth:`write` is queued as a sequence of chunks, which are
+    sent without copying the whole pending data on each attempt. Before TLS is
+    started, multiple chunks are passed to the socket at once using
+    :meth:`socket.socket.sendmsg`, if available. When the amount of buffered
+    data exceeds the high water mark, :meth:`asyncio.Protocol.pause_writing`
+    is called on the protocol; when it drops to the low water mark again,
+    :meth:`asyncio.Protocol.resume_writing` is called. See
+    :meth:`set_write_buffer_limits`.
     """
 
     MAX_SIZE = 256 * 1024
 
+    #: Maximum number of chunks passed to a single
+    #: :meth:`socket.socket.sendmsg` call.
+    MAX_SENDMSG_CHUNKS = 64
+
+    #: Small chunks are merged up to this size before being passed to the TLS
+    #: layer, to avoid creating one TLS record per chunk.
+    MAX_TLS_WRITE_SIZE = 16 * 1024
+
+    DEFAULT_HIGH_WATER = 64 * 1024
+
     def __init__(self, loop, rawsock, protocol, ssl_context_factory,
                  waiter=None,
                  use_starttls=False,
@@ -178,7 +199,10 @@ class STARTTLSTransport(asyncio.Transport):
         self._waiter = waiter
         self._state = None
         self._conn_lost = 0
-        self._buffer = bytearray()
+        self._buffer = collections.deque()
+        self._buffer_size = 0
+        self._protocol_paused = False
+        self._set_write_buffer_limits()
         self._ssl_context_factory = ssl_context_factory
         self._extra.update(
             sslcontext=None,
@@ -198,6 +222,7 @@ class STARTTLSTransport(asyncio.Transport):
         self._tls_conn = None
         self._tls_read_wants_write = False
         self._tls_write_wants_read = False
+        self._tls_write_pending = False
         self._tls_post_handshake_callback = post_handshake_callback
 
         self._state = None
@@ -261,6 +286,7 @@ class STARTTLSTransport(asyncio.Transport):
 
         if self._buffer:
             self._buffer.clear()
+            self._buffer_size = 0
 
         self._loop.remove_reader(self._raw_fd)
         self._loop.remove_writer(self._raw_fd)
@@ -485,13 +511,15 @@ class STARTTLSTransport(asyncio.Transport):
 
         if self._buffer:
             try:
-                nsent = self._sock.send(bytes(self._buffer))
+                nsent = self._send_chunks()
             except (BlockingIOError, InterruptedError,
                     OpenSSL.SSL.WantWriteError):
                 nsent = 0
+                self._tls_write_pending = self._state.tls_started
             except OpenSSL.SSL.WantReadError:
                 nsent = 0
                 assert self._state.tls_started
+                self._tls_write_pending = True
                 self._tls_write_wants_read = True
                 self._trace_logger.debug(
                     "_write_ready: swap writer for reader")
@@ -504,7 +532,9 @@ class STARTTLSTransport(asyncio.Transport):
                 return
 
             if nsent:
-                del self._buffer[:nsent]
+                self._tls_write_pending = False
+                self._consume_chunks(nsent)
+                self._maybe_resume_protocol()
 
         if not self._buffer:
             if not self._tls_read_wants_write:
@@ -517,6 +547,97 @@ class STARTTLSTransport(asyncio.Transport):
                 else:
                     self._raw_shutdown()
 
+    def _send_chunks(self):
+        if not self._state.tls_started:
+            if hasattr(self._sock, "sendmsg") and len(self._buffer) > 1:
+                return self._sock.sendmsg(
+                    itertools.islice(self._buffer, self.MAX_SENDMSG_CHUNKS)
+                )
+            return self._sock.send(self._buffer[0])
+
+        # OpenSSL requires a retry after WantRead/WantWrite to pass the same
+        # buffer again, so we must not restructure the head chunk then
+        if not self._tls_write_pending and len(self._buffer) > 1:
+            self._merge_head_chunks()
+        return self._sock.send(self._buffer[0])
+
+    def _merge_head_chunks(self):
+        head = self._buffer[0]
+        if len(head) >= self.MAX_TLS_WRITE_SIZE:
+            return
+        size = 0
+        count = 0
+        for chunk in self._buffer:
+            if count and size + len(chunk) > self.MAX_TLS_WRITE_SIZE:
+                break
+            size += len(chunk)
+            count += 1
+        if count < 2:
+            return
+        merged = b"".join(
+            self._buffer.popleft()
+            for _ in range(count)
+        )
+        self._buffer.appendleft(merged)
+
+    def _consume_chunks(self, nsent):
+        self._buffer_size -= nsent
+        buffer_ = self._buffer
+        while nsent:
+            head = buffer_[0]
+            if nsent < len(head):
+                if not isinstance(head, memoryview):
+                    head = memoryview(head)
+                buffer_[0] = head[nsent:]
+                break
+            nsent -= len(head)
+            buffer_.popleft()
+
+    def _set_write_buffer_limits(self, high=None, low=None):
+        if high is None:
+            if low is None:
+                high = self.DEFAULT_HIGH_WATER
+            else:
+                high = 4 * low
+        if low is None:
+            low = high // 4
+        if not high >= low >= 0:
+            raise ValueError(
+                "high ({!r}) must be >= low ({!r}) must be >= 0".format(
+                    high, low
+                )
+            )
+        self._high_water = high
+        self._low_water = low
+
+    def _maybe_pause_protocol(self):
+        if self._buffer_size <= self._high_water or self._protocol_paused:
+            return
+        self._protocol_paused = True
+        try:
+            self._protocol.pause_writing()
+        except Exception as exc:
+            self._loop.call_exception_handler({
+                "message": "protocol.pause_writing() failed",
+                "exception": exc,
+                "transport": self,
+                "protocol": self._protocol,
+            })
+
+    def _maybe_resume_protocol(self):
+        if not self._protocol_paused or self._buffer_size > self._low_water:
+            return
+        self._protocol_paused = False
+        try:
+            self._protocol.resume_writing()
+        except Exception as exc:
+            self._loop.call_exception_handler({
+                "message": "protocol.resume_writing() failed",
+                "exception": exc,
+                "transport": self,
+                "protocol": self._protocol,
+            })
+
     def _eof_received(self, keep_open):
         self._trace_logger.debug("_eof_received: removing reader")
         self._loop.remove_reader(self._raw_fd)
@@ -666,7 +787,41 @@ class STARTTLSTransport(asyncio.Transport):
         if not self._buffer:
             self._loop.add_writer(self._raw_fd, self._write_ready)
 
-        self._buffer.extend(data)
+        if not isinstance(data, bytes):
+            # the caller may modify mutable buffers after write() returns
+            data = bytes(data)
+        self._buffer.append(data)
+        self._buffer_size += len(data)
+        self._maybe_pause_protocol()
+
+    def get_write_buffer_size(self):
+        """
+        Return the number of bytes which have been written to the transport,
+        but not sent yet.
+        """
+        return self._buffer_size
+
+    def get_write_buffer_limits(self):
+        """
+        Return the low and high water marks as ``(low, high)`` tuple.
+        """
+        return self._low_water, self._high_water
+
+    def set_write_buffer_limits(self, high=None, low=None):
+        """
+        Set the high and low water marks for the write buffer.
+
+        When more than `high` bytes are buffered, the protocols
+        :meth:`~asyncio.BaseProtocol.pause_writing` method is called. Once the
+        buffer has been drained to `low` bytes or less,
+        :meth:`~asyncio.BaseProtocol.resume_writing` is called.
+
+        If only one of the values is given, the other is derived from it. If
+        both are omitted, `high` defaults to 64 KiB and `low` to a quarter of
+        `high`. :class:`ValueError` is raised unless ``high >= low >= 0``.
+        """
+        self._set_write_buffer_limits(high=high, low=low)
+        self._maybe_pause_protocol()
 
     def write_eof(self):
         """
@@ -48,6 +48,12 @@ class AsyncDeque:
         self._data.appendleft(obj)
         self._non_empty.set()
 
+    def extendleft_nowait(self, objs):
+        # reversed so that the objects end up in their original order
+        self._data.extendleft(reversed(objs))
+        if self._data:
+            self._non_empty.set()
+
     def get_nowait(self):
         try:
             item = self._data.popleft()
@@ -67,6 +67,8 @@ The detailed documentation of the classes follows:
 
 .. currentmodule:: aioxmpp.disco
 
+.. autoclass:: CacheStatistics
+
 Entity information
 ------------------
 
@@ -109,4 +111,10 @@ Item queries
 """
 
 from . import xso  # NOQA
-from .service import DiscoClient, DiscoServer, Node, StaticNode  # NOQA
+from .service import (  # NOQA
+    CacheStatistics,
+    DiscoClient,
+    DiscoServer,
+    Node,
+    StaticNode,
+)
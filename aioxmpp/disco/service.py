@@ -20,8 +20,12 @@
 #
 ########################################################################
 import asyncio
+import collections
 import functools
 import itertools
+import json
+import time
+import weakref
 
 import aioxmpp.callbacks
 import aioxmpp.errors as errors
@@ -60,6 +64,8 @@ class Node(object):
 
     .. automethod:: iter_identities
 
+    .. automethod:: as_info_xso
+
     To access items, use:
 
     .. automethod:: iter_items
@@ -88,6 +94,7 @@ class Node(object):
         super().__init__()
         self._identities = {}
         self._features = set()
+        self._info_xso = None
 
     def iter_identities(self):
         """
@@ -115,6 +122,33 @@ class Node(object):
             iter(self._features)
         )
 
+    def as_info_xso(self):
+        """
+        Return a :class:`.xso.InfoQuery` with the identities and features of
+        this :class:`Node`.
+
+        The object is built on the first call and re-used until a feature or
+        identity is registered or unregistered. It is shared and must not be
+        modified.
+
+        .. versionadded:: 0.8
+        """
+        if self._info_xso is None:
+            info = disco_xso.InfoQuery(features=self.iter_features())
+            for category, type_, lang, name in self.iter_identities():
+                info.identities.append(disco_xso.Identity(
+                    category=category,
+                    type_=type_,
+                    lang=lang,
+                    name=name
+                ))
+            self._info_xso = info
+        return self._info_xso
+
+    def _info_changed(self):
+        self._info_xso = None
+        self.on_info_changed()
+
     def iter_items(self):
         """
         Return an iterator which yields the :class:`.xso.Item` objects which
@@ -135,7 +169,7 @@ class Node(object):
         if var in self._features or var in self.STATIC_FEATURES:
             raise ValueError("feature already claimed: {!r}".format(var))
         self._features.add(var)
-        self.on_info_changed()
+        self._info_changed()
 
     def register_identity(self, category, type_, *, names={}):
         """
@@ -153,7 +187,7 @@ class Node(object):
         if key in self._identities:
             raise ValueError("identity already claimed: {!r}".format(key))
         self._identities[key] = names
-        self.on_info_changed()
+        self._info_changed()
 
     def unregister_feature(self, var):
         """
@@ -172,7 +206,7 @@ class Node(object):
 
         """
         self._features.remove(var)
-        self.on_info_changed()
+        self._info_changed()
 
     def unregister_identity(self, category, type_):
         """
@@ -192,7 +226,7 @@ class Node(object):
         if len(self._identities) == 1:
             raise ValueError("cannot remove last identity")
         del self._identities[key]
-        self.on_info_changed()
+        self._info_changed()
 
 
 class StaticNode(Node):
@@ -297,23 +331,13 @@ class DiscoServer(service.Service, Node):
                 condition=(namespaces.stanzas, "item-not-found")
             )
 
-        response = disco_xso.InfoQuery()
-
-        for category, type_, lang, name in node.iter_identities():
-            response.identities.append(disco_xso.Identity(
-                category=category,
-                type_=type_,
-                lang=lang,
-                name=name
-            ))
+        response = node.as_info_xso()
 
         if not response.identities:
             raise errors.XMPPModifyError(
                 condition=(namespaces.stanzas, "item-not-found"),
             )
 
-        response.features.update(node.iter_features())
-
         return response
 
     @aioxmpp.service.iq_handler(
@@ -355,6 +379,57 @@ class DiscoServer(service.Service, Node):
         del self._node_mounts[mountpoint]
 
 
+class CacheStatistics(collections.namedtuple(
+        "CacheStatistics",
+        [
+            "info_entries",
+            "items_entries",
+            "shared_infos",
+            "hits",
+            "misses",
+            "evictions",
+            "expirations",
+        ])):
+    """
+    Metrics of the result cache of a :class:`DiscoClient`.
+
+    .. attribute:: info_entries
+
+       Number of ``(jid, node)`` pairs for which an info result or request is
+       cached.
+
+    .. attribute:: items_entries
+
+       Number of ``(jid, node)`` pairs for which an items result or request is
+       cached.
+
+    .. attribute:: shared_infos
+
+       Number of distinct :class:`~.xso.InfoQuery` results which are shared
+       between the cached info entries.
+
+    .. attribute:: hits
+
+       Number of queries which were answered from the cache or joined a
+       request in progress.
+
+    .. attribute:: misses
+
+       Number of queries which sent a new request.
+
+    .. attribute:: evictions
+
+       Number of entries dropped because the cache was full.
+
+    .. attribute:: expirations
+
+       Number of entries dropped because their :attr:`~DiscoClient.cache_ttl`
+       had passed.
+
+    .. versionadded:: 0.8
+    """
+
+
 class DiscoClient(service.Service):
     """
     Provide cache-backed Service Discovery (:xep:`30`) queries.
@@ -383,6 +458,35 @@ class DiscoClient(service.Service):
 
     .. automethod:: set_info_future
 
+    The cache is bounded and entries may expire:
+
+    .. attribute:: cache_size
+
+       The maximum number of ``(jid, node)`` pairs for which results are
+       cached, separately for info and items queries. When the cache is full,
+       the least recently used entry is dropped. :data:`None` disables the
+       limit.
+
+    .. attribute:: cache_ttl
+
+       A :class:`datetime.timedelta` after which cache entries expire,
+       counted from the time the entry was created. :data:`None` (the
+       default) keeps entries until they are evicted or the stream is
+       destroyed.
+
+    Info results with equal content (for example, the results which
+    :class:`.EntityCapsService` derives from the same ``ver`` hash for many
+    entities) are stored only once and shared between the cache entries.
+
+    .. autoattribute:: statistics
+
+    .. automethod:: reset_statistics
+
+    .. versionchanged:: 0.8
+
+       The cache is bounded by :attr:`cache_size` and entries can expire after
+       :attr:`cache_ttl`.
+
     Usage example, assuming that you have a :class:`.node.Client` `client`::
 
       import aioxmpp.disco as disco
@@ -406,24 +510,113 @@ class DiscoClient(service.Service):
     def __init__(self, client, **kwargs):
         super().__init__(client, **kwargs)
 
-        self._info_pending = {}
-        self._items_pending = {}
+        self.cache_size = 4096
+        self.cache_ttl = None
+
+        # (jid, node) -> [expires_at, future], in LRU order
+        self._info_pending = collections.OrderedDict()
+        self._items_pending = collections.OrderedDict()
+        self._info_shared = weakref.WeakValueDictionary()
+        self._info_content_keys = weakref.WeakKeyDictionary()
+        # hits, misses, evictions, expirations
+        self._cache_stats = [0, 0, 0, 0]
 
         self.client.on_stream_destroyed.connect(
             self._clear_cache
         )
 
+    @property
+    def statistics(self):
+        """
+        A :class:`CacheStatistics` snapshot of the cache.
+
+        .. versionadded:: 0.8
+        """
+        return CacheStatistics(
+            len(self._info_pending),
+            len(self._items_pending),
+            len(self._info_shared),
+            *self._cache_stats
+        )
+
+    def reset_statistics(self):
+        """
+        Reset the counters of :attr:`statistics`.
+
+        .. versionadded:: 0.8
+        """
+        self._cache_stats[:] = [0, 0, 0, 0]
+
     def _clear_cache(self):
-        for fut in self._info_pending.values():
+        for _, fut in self._info_pending.values():
             if not fut.done():
                 fut.cancel()
         self._info_pending.clear()
 
-        for fut in self._items_pending.values():
+        for _, fut in self._items_pending.values():
             if not fut.done():
                 fut.cancel()
         self._items_pending.clear()
 
+    def _cache_lookup(self, cache, key):
+        entry = cache[key]
+        expires_at, fut = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del cache[key]
+            self._cache_stats[3] += 1
+            raise KeyError(key)
+        cache.move_to_end(key)
+        return fut
+
+    def _cache_store(self, cache, key, fut):
+        cache.pop(key, None)
+        if self.cache_ttl is not None:
+            expires_at = time.monotonic() + self.cache_ttl.total_seconds()
+        else:
+            expires_at = None
+        cache[key] = [expires_at, fut]
+
+        if self.cache_size is not None:
+            while len(cache) > self.cache_size:
+                cache.popitem(last=False)
+                self._cache_stats[2] += 1
+
+    def _cache_discard(self, cache, key, fut):
+        try:
+            entry = cache[key]
+        except KeyError:
+            return
+        if entry[1] is fut:
+            del cache[key]
+
+    def _share_info(self, key, fut):
+        if fut.cancelled() or fut.exception() is not None:
+            return
+        info = fut.result()
+        if not isinstance(info, disco_xso.InfoQuery):
+            return
+
+        # results primed by EntityCapsService are the same object for all
+        # entities with the same ver; serialise those only once
+        try:
+            content_key = self._info_content_keys[info]
+        except KeyError:
+            content_key = (
+                info.node,
+                json.dumps(info.to_dict(), sort_keys=True),
+            )
+            self._info_content_keys[info] = content_key
+
+        try:
+            shared = self._info_shared[content_key]
+        except KeyError:
+            self._info_shared[content_key] = fut
+            return
+
+        entry = self._info_pending.get(key)
+        if entry is not None and entry[1] is fut:
+            entry[1] = shared
+
     def _handle_info_received(self, jid, node, task):
         try:
             result = task.result()
@@ -452,7 +645,9 @@ class DiscoClient(service.Service):
 
         The requests are cached. This means that only one request is ever fired
         for a given target (identified by the `jid` and the `node`). The
-        request is re-used for all subsequent requests to that identity.
+        request is re-used for all subsequent requests to that identity, until
+        the entry is evicted from the cache or expires (see :attr:`cache_size`
+        and :attr:`cache_ttl`).
 
         If `require_fresh` is set to true, the above does not hold and a fresh
         request is always created. The new request is the request which will be
@@ -481,15 +676,17 @@ class DiscoClient(service.Service):
 
         if not require_fresh:
             try:
-                request = self._info_pending[key]
+                request = self._cache_lookup(self._info_pending, key)
             except KeyError:
                 pass
             else:
+                self._cache_stats[0] += 1
                 try:
                     return (yield from request)
                 except asyncio.CancelledError:
                     pass
 
+        self._cache_stats[1] += 1
         request = asyncio.async(
             self.send_and_decode_info_query(jid, node)
         )
@@ -500,8 +697,11 @@ class DiscoClient(service.Service):
                 node
             )
         )
+        request.add_done_callback(
+            functools.partial(self._share_info, key)
+        )
 
-        self._info_pending[key] = request
+        self._cache_store(self._info_pending, key, request)
         try:
             if timeout is not None:
                 try:
@@ -514,13 +714,7 @@ class DiscoClient(service.Service):
                 result = yield from request
         except:
             if request.done():
-                try:
-                    pending = self._info_pending[key]
-                except KeyError:
-                    pass
-                else:
-                    if pending is request:
-                        del self._info_pending[key]
+                self._cache_discard(self._info_pending, key, request)
             raise
 
         return result
@@ -539,10 +733,11 @@ class DiscoClient(service.Service):
 
         if not require_fresh:
             try:
-                request = self._items_pending[key]
+                request = self._cache_lookup(self._items_pending, key)
             except KeyError:
                 pass
             else:
+                self._cache_stats[0] += 1
                 try:
                     return (yield from request)
                 except asyncio.CancelledError:
@@ -551,11 +746,12 @@ class DiscoClient(service.Service):
         request_iq = stanza.IQ(to=jid, type_=structs.IQType.GET)
         request_iq.payload = disco_xso.ItemsQuery(node=node)
 
+        self._cache_stats[1] += 1
         request = asyncio.async(
             self.client.stream.send(request_iq)
         )
 
-        self._items_pending[key] = request
+        self._cache_store(self._items_pending, key, request)
         try:
             if timeout is not None:
                 try:
@@ -568,13 +764,7 @@ class DiscoClient(service.Service):
                 result = yield from request
         except:
             if request.done():
-                try:
-                    pending = self._items_pending[key]
-                except KeyError:
-                    pass
-                else:
-                    if pending is request:
-                        del self._items_pending[key]
+                self._cache_discard(self._items_pending, key, request)
             raise
 
         return result
@@ -613,8 +803,10 @@ class DiscoClient(service.Service):
 
            If a future is set to exception state, it will still remain and make
            all queries for that target fail with that exception, until a query
-           uses `require_fresh`.
+           uses `require_fresh` or the entry is dropped from the cache.
 
         .. versionadded:: 0.5
         """
-        self._info_pending[jid, node] = fut
+        key = jid, node
+        fut.add_done_callback(functools.partial(self._share_info, key))
+        self._cache_store(self._info_pending, key, fut)
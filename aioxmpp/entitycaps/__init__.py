@@ -48,6 +48,10 @@ Service
 
 .. autoclass:: Cache
 
+.. autoclass:: CacheStatistics
+
+.. autoclass:: CapsEntry
+
 .. currentmodule:: aioxmpp.entitycaps.xso
 
 :mod:`.entitycaps.xso` --- Presence payload
@@ -64,9 +68,29 @@ not loaded, the :class:`Caps` instance is available at
 
 .. autoclass:: Caps
 
+.. currentmodule:: aioxmpp.entitycaps.database
+
+:mod:`.entitycaps.database` --- On-disk database
+================================================
+
+The submodule :mod:`aioxmpp.entitycaps.database` contains an on-disk database
+for entity capabilities entries which can be attached to a :class:`~.Cache`
+with :meth:`~.Cache.set_system_db` and :meth:`~.Cache.set_user_db`.
+
+.. versionadded:: 0.8
+
+.. autoclass:: Database
+
+.. autofunction:: serialize_entry
+
 
 """
 
-from .service import EntityCapsService, Cache  # NOQA
-from . import xso  # NOQA
+from .service import (  # NOQA
+    EntityCapsService,
+    Cache,
+    CacheStatistics,
+    CapsEntry,
+)
+from . import xso, database  # NOQA
 Service = EntityCapsService
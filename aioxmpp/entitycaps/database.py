@@ -0,0 +1,228 @@
+########################################################################
+# File name: database.py
+# This file is part of: aioxmpp
+#
+# LICENSE
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program.  If not, see
+# <http://www.gnu.org/licenses/>.
+#
+########################################################################
+import asyncio
+import io
+import logging
+import pathlib
+import sqlite3
+import urllib.parse
+
+import aioxmpp.disco as disco
+import aioxmpp.xml
+import aioxmpp.xso
+
+
+logger = logging.getLogger("aioxmpp.entitycaps")
+
+
+def serialize_entry(captured_events):
+    """
+    Serialise the captured XSO events of a disco#info response to
+    :class:`bytes`, in the format used by the entity caps databases.
+    """
+    buf = io.BytesIO()
+    generator = aioxmpp.xml.XMPPXMLGenerator(
+        buf,
+        short_empty_elements=True)
+    generator.startDocument()
+    aioxmpp.xso.events_to_sax(captured_events, generator)
+    generator.endDocument()
+    return buf.getvalue()
+
+
+class Database:
+    """
+    Entity capabilities database stored in a single SQLite file.
+
+    :param path: Path of the database file; it is created if it does not
+                 exist.
+    :type path: :class:`pathlib.Path` or :class:`str`
+    :param writeback_delay: Time in seconds for which added entries are
+                            collected before they are written to the file.
+    :type writeback_delay: :class:`float`
+    :param loop: The event loop to use for the writeback.
+
+    All entries are read into memory when the database is opened, so that
+    lookups never access the file. Entries are kept serialised and are only
+    parsed when they are looked up.
+
+    Entries added with :meth:`add` are visible immediately. They are written
+    to the file in batches, in the default executor of the event loop, at
+    most `writeback_delay` seconds after they have been added; :meth:`flush`
+    writes them out right away.
+
+    Use :meth:`import_directory` to migrate a database in the
+    directory-of-XML-files layout used by
+    :meth:`~.entitycaps.Cache.set_user_db_path`.
+
+    .. automethod:: get
+
+    .. automethod:: add
+
+    .. automethod:: flush
+
+    .. automethod:: import_directory
+
+    .. versionadded:: 0.8
+    """
+
+    def __init__(self, path, *, writeback_delay=1.0, loop=None):
+        super().__init__()
+        self._path = str(path)
+        self._loop = loop or asyncio.get_event_loop()
+        self.writeback_delay = writeback_delay
+        self._index = {}
+        self._pending = {}
+        self._writeback_handle = None
+        self._writeback_task = None
+
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "hash TEXT NOT NULL, "
+                "node TEXT NOT NULL, "
+                "data BLOB NOT NULL, "
+                "PRIMARY KEY (hash, node))"
+            )
+            for hash_, node, data in conn.execute(
+                    "SELECT hash, node, data FROM entries"):
+                self._index[hash_, node] = data
+        logger.debug("loaded %d entries from %s",
+                     len(self._index), self._path)
+
+    def _connect(self):
+        return sqlite3.connect(self._path)
+
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, key):
+        return key in self._index
+
+    def get(self, hash_, node):
+        """
+        Return the :class:`~.disco.xso.InfoQuery` stored for the given `hash_`
+        function and `node` URL.
+
+        Raise :class:`KeyError` if there is no such entry.
+        """
+        data = self._index[hash_, node]
+        return aioxmpp.xml.read_single_xso(
+            io.BytesIO(data),
+            disco.xso.InfoQuery
+        )
+
+    def add(self, hash_, node, data):
+        """
+        Add an entry for the given `hash_` function and `node` URL. `data` is
+        the serialised disco#info response, see :func:`serialize_entry`.
+        """
+        self._index[hash_, node] = data
+        self._pending[hash_, node] = data
+        if self._writeback_handle is None and self._writeback_task is None:
+            self._writeback_handle = self._loop.call_later(
+                self.writeback_delay,
+                self._start_writeback,
+            )
+
+    def _write(self, batch):
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO entries (hash, node, data) "
+                "VALUES (?, ?, ?)",
+                [(hash_, node, data) for (hash_, node), data in batch]
+            )
+
+    def _start_writeback(self):
+        self._writeback_handle = None
+        if self._writeback_task is not None or not self._pending:
+            return
+        batch = list(self._pending.items())
+        self._pending.clear()
+        logger.debug("writing %d entries to %s", len(batch), self._path)
+        self._writeback_task = asyncio.async(
+            self._loop.run_in_executor(None, self._write, batch),
+            loop=self._loop,
+        )
+        self._writeback_task.add_done_callback(self._writeback_done)
+
+    def _writeback_done(self, task):
+        self._writeback_task = None
+        if task.cancelled():
+            return
+        if task.exception() is not None:
+            logger.error("failed to write entity caps database %s",
+                         self._path,
+                         exc_info=task.exception())
+        if self._pending and self._writeback_handle is None:
+            self._writeback_handle = self._loop.call_later(
+                self.writeback_delay,
+                self._start_writeback,
+            )
+
+    @asyncio.coroutine
+    def flush(self):
+        """
+        Write all pending entries to the file and wait until they have been
+        written.
+        """
+        if self._writeback_handle is not None:
+            self._writeback_handle.cancel()
+            self._writeback_handle = None
+
+        while self._pending or self._writeback_task is not None:
+            if self._writeback_task is None:
+                self._start_writeback()
+            task = self._writeback_task
+            yield from task
+            if self._writeback_handle is not None:
+                self._writeback_handle.cancel()
+                self._writeback_handle = None
+
+    def import_directory(self, path):
+        """
+        Import all entries from a directory in the layout used by
+        :meth:`~.entitycaps.Cache.set_user_db_path` (one
+        ``{hash}_{quoted node}.xml`` file per entry) and return the number of
+        imported entries.
+
+        Files whose name does not follow that layout are skipped. The entries
+        are written to the file immediately; this method blocks and is meant
+        to be used once, when migrating.
+        """
+        batch = []
+        for entry_path in sorted(pathlib.Path(str(path)).glob("*.xml")):
+            hash_, sep, quoted = entry_path.stem.partition("_")
+            if not sep or not quoted:
+                logger.warning("skipping %s: not an entity caps entry",
+                               entry_path)
+                continue
+            node = urllib.parse.unquote(quoted)
+            with entry_path.open("rb") as f:
+                data = f.read()
+            self._index[hash_, node] = data
+            batch.append(((hash_, node), data))
+
+        self._write(batch)
+        logger.info("imported %d entries from %s into %s",
+                    len(batch), path, self._path)
+        return len(batch)
@@ -21,6 +21,7 @@
 ########################################################################
 import asyncio
 import base64
+import collections
 import copy
 import functools
 import hashlib
@@ -38,6 +39,7 @@ import aioxmpp.xml
 import aioxmpp.xso
 
 from . import xso as my_xso
+from .database import serialize_entry
 
 
 logger = logging.getLogger("aioxmpp.entitycaps")
@@ -137,6 +139,84 @@ def hash_query(query, algo):
     return base64.b64encode(hashimpl.digest()).decode("ascii")
 
 
+class CacheStatistics(collections.namedtuple(
+        "CacheStatistics",
+        [
+            "memory_hits",
+            "system_db_hits",
+            "user_db_hits",
+            "pending_hits",
+            "misses",
+        ])):
+    """
+    Hit and miss counters of a :class:`Cache`.
+
+    .. attribute:: memory_hits
+
+       Number of lookups answered from memory.
+
+    .. attribute:: system_db_hits
+
+       Number of lookups answered from the system-wide database.
+
+    .. attribute:: user_db_hits
+
+       Number of lookups answered from the user-level database.
+
+    .. attribute:: pending_hits
+
+       Number of lookups answered by a query which was already running for
+       the same hash.
+
+    .. attribute:: misses
+
+       Number of lookups which were not found in any of the databases.
+
+    .. versionadded:: 0.8
+    """
+
+
+class CapsEntry(collections.namedtuple(
+        "CapsEntry",
+        [
+            "info",
+            "features",
+            "info_dict",
+        ])):
+    """
+    A verified entity capabilities entry, as held in memory by a
+    :class:`Cache`.
+
+    There is only one entry per hash function and node URL; it is shared by
+    all entities which advertise that ``ver``.
+
+    .. attribute:: info
+
+       The :class:`~.disco.xso.InfoQuery`. It is shared and must not be
+       modified.
+
+    .. attribute:: features
+
+       The features of :attr:`info` as :class:`frozenset`.
+
+    .. attribute:: info_dict
+
+       The result of :meth:`~.disco.xso.InfoQuery.to_dict` for :attr:`info`.
+       It must not be modified either.
+
+    .. automethod:: from_info
+
+    .. versionadded:: 0.8
+    """
+
+    @classmethod
+    def from_info(cls, info):
+        """
+        Create an entry for the :class:`~.disco.xso.InfoQuery` `info`.
+        """
+        return cls(info, frozenset(info.features), info.to_dict())
+
+
 class Cache:
     """
     This provides a two-level cache for entity capabilities information. The
@@ -154,6 +234,10 @@ class Cache:
 
     Database management (user API):
 
+    .. automethod:: set_system_db
+
+    .. automethod:: set_user_db
+
     .. automethod:: set_system_db_path
 
     .. automethod:: set_user_db_path
@@ -162,16 +246,47 @@ class Cache:
 
     .. automethod:: create_query_future
 
+    .. automethod:: lookup_entry
+
+    .. automethod:: lookup_in_memory
+
     .. automethod:: lookup_in_database
 
     .. automethod:: lookup
+
+    Statistics:
+
+    .. autoattribute:: statistics
+
+    .. automethod:: reset_statistics
     """
 
     def __init__(self):
         self._lookup_cache = {}
         self._memory_overlay = {}
+        self._entries = {}
+        self._system_db = None
+        self._user_db = None
         self._system_db_path = None
         self._user_db_path = None
+        self.reset_statistics()
+
+    @property
+    def statistics(self):
+        """
+        A :class:`CacheStatistics` snapshot of the hit and miss counters.
+
+        .. versionadded:: 0.8
+        """
+        return CacheStatistics(*self._stats)
+
+    def reset_statistics(self):
+        """
+        Reset all counters of :attr:`statistics` to zero.
+
+        .. versionadded:: 0.8
+        """
+        self._stats = [0, 0, 0, 0, 0]
 
     def _erase_future(self, for_hash, for_node, fut):
         try:
@@ -182,46 +297,107 @@ class Cache:
             if existing is fut:
                 del self._lookup_cache[for_hash, for_node]
 
+    def set_system_db(self, db):
+        """
+        Use the :class:`~.entitycaps.database.Database` `db` as trusted
+        database, instead of a directory set with :meth:`set_system_db_path`.
+
+        .. versionadded:: 0.8
+        """
+        self._system_db = db
+
+    def set_user_db(self, db):
+        """
+        Use the :class:`~.entitycaps.database.Database` `db` as user-level
+        database, instead of a directory set with :meth:`set_user_db_path`.
+        New entries are written to `db`.
+
+        .. versionadded:: 0.8
+        """
+        self._user_db = db
+
     def set_system_db_path(self, path):
         self._system_db_path = path
 
     def set_user_db_path(self, path):
         self._user_db_path = path
 
+    def lookup_entry(self, hash_, node):
+        """
+        Return the :class:`CapsEntry` held in memory for the given `node` URL
+        and `hash_` function, without accessing the databases on disk and
+        without counting the lookup in :attr:`statistics`.
+
+        The entry is created on the first call and then re-used.
+
+        Raise :class:`KeyError` if there is no such entry.
+
+        .. versionadded:: 0.8
+        """
+        key = hash_, node
+        try:
+            return self._entries[key]
+        except KeyError:
+            pass
+        entry = CapsEntry.from_info(self._memory_overlay[key])
+        self._entries[key] = entry
+        return entry
+
+    def lookup_in_memory(self, hash_, node):
+        """
+        Look up the given `node` URL using the given `hash_` among the entries
+        held in memory, without accessing the databases on disk.
+
+        Raise :class:`KeyError` if there is no such entry.
+
+        .. versionadded:: 0.8
+        """
+        result = self._memory_overlay[hash_, node]
+        self._stats[0] += 1
+        return result
+
     def lookup_in_database(self, hash_, node):
         try:
-            result = self._memory_overlay[hash_, node]
+            result = self.lookup_in_memory(hash_, node)
         except KeyError:
             pass
         else:
             logger.debug("memory cache hit: %s %r", hash_, node)
             return result
 
-        quoted = urllib.parse.quote(node, safe="")
-        if self._system_db_path is not None:
-            try:
-                f = (
-                    self._system_db_path / "{}_{}.xml".format(hash_, quoted)
-                ).open("rb")
-            except OSError:
-                pass
-            else:
-                logger.debug("system db hit: %s %r", hash_, node)
+        quoted = None
+        tiers = (
+            (1, "system", self._system_db, self._system_db_path),
+            (2, "user", self._user_db, self._user_db_path),
+        )
+        for tier, name, db, path in tiers:
+            if db is not None:
+                try:
+                    result = db.get(hash_, node)
+                except KeyError:
+                    continue
+            elif path is not None:
+                if quoted is None:
+                    quoted = urllib.parse.quote(node, safe="")
+                try:
+                    f = (path / "{}_{}.xml".format(hash_, quoted)).open("rb")
+                except OSError:
+                    continue
                 with f:
-                    return aioxmpp.xml.read_single_xso(f, disco.xso.InfoQuery)
-
-        if self._user_db_path is not None:
-            try:
-                f = (
-                    self._user_db_path / "{}_{}.xml".format(hash_, quoted)
-                ).open("rb")
-            except OSError:
-                pass
+                    result = aioxmpp.xml.read_single_xso(
+                        f,
+                        disco.xso.InfoQuery
+                    )
             else:
-                logger.debug("user db hit: %s %r", hash_, node)
-                with f:
-                    return aioxmpp.xml.read_single_xso(f, disco.xso.InfoQuery)
+                continue
+
+            logger.debug("%s db hit: %s %r", name, hash_, node)
+            self._stats[tier] += 1
+            self._memory_overlay[hash_, node] = result
+            self._entries.pop((hash_, node), None)
+            return result
 
+        self._stats[4] += 1
         raise KeyError(node)
 
     @asyncio.coroutine
@@ -251,6 +427,7 @@ class Cache:
             except ValueError:
                 continue
             else:
+                self._stats[3] += 1
                 return result
 
     def create_query_future(self, hash_, node):
@@ -281,7 +458,14 @@ class Cache:
         copied_entry = copy.copy(entry)
         copied_entry.node = node
         self._memory_overlay[hash_, node] = copied_entry
-        if self._user_db_path is not None:
+        self._entries.pop((hash_, node), None)
+        if self._user_db is not None:
+            self._user_db.add(
+                hash_,
+                node,
+                serialize_entry(entry.captured_events)
+            )
+        elif self._user_db_path is not None:
             asyncio.async(asyncio.get_event_loop().run_in_executor(
                 None,
                 writeback,
@@ -324,6 +508,11 @@ class EntityCapsService(aioxmpp.service.Service):
 
     .. autoattribute:: cache
 
+    The capabilities which peers announced in their presence can be checked
+    without sending a query:
+
+    .. automethod:: has_feature
+
     .. versionchanged:: 0.8
 
        This class was formerly known as :class:`aioxmpp.entitycaps.Service`. It
@@ -346,12 +535,19 @@ class EntityCapsService(aioxmpp.service.Service):
 
         self.ver = None
         self._cache = Cache()
+        # JID -> (hash_, node) of the last caps announced by that entity
+        self._peer_caps = {}
+        self._update_hash_scheduled = False
+        self._hashed_info = None
 
         self.disco_server = self.dependencies[disco.DiscoServer]
         self.disco_client = self.dependencies[disco.DiscoClient]
         self.disco_server.register_feature(
             "http://jabber.org/protocol/caps"
         )
+        self.client.on_stream_destroyed.connect(
+            self._peer_caps.clear
+        )
 
     @property
     def cache(self):
@@ -372,10 +568,32 @@ class EntityCapsService(aioxmpp.service.Service):
     def cache(self):
         self._cache = Cache()
 
+    def has_feature(self, jid, var):
+        """
+        Return whether the entity `jid` supports the feature `var`, according
+        to the capabilities it announced in its last available presence.
+
+        Raise :class:`KeyError` if the entity has not announced capabilities
+        or if they have not been resolved (yet). In that case, use
+        :meth:`.DiscoClient.query_info` instead.
+
+        This does not send any queries and runs in constant time, which makes
+        it suitable for checks on every outgoing stanza.
+
+        .. versionadded:: 0.8
+        """
+        entry = self.cache.lookup_entry(*self._peer_caps[jid])
+        return var in entry.features
+
     @aioxmpp.service.depsignal(
         disco.DiscoServer,
         "on_info_changed")
     def _info_changed(self):
+        # many changes in a row (e.g. services registering their features)
+        # lead to a single update
+        if self._update_hash_scheduled:
+            return
+        self._update_hash_scheduled = True
         asyncio.get_event_loop().call_soon(
             self.update_hash
         )
@@ -450,34 +668,36 @@ class EntityCapsService(aioxmpp.service.Service):
                 "inbound presence with ver=%r and hash=%r from %s",
                 caps.ver, caps.hash_,
                 presence.from_)
-            task = asyncio.async(
-                self.lookup_info(presence.from_,
-                                 caps.node,
-                                 caps.ver,
-                                 caps.hash_)
-            )
-            self.disco_client.set_info_future(presence.from_, None, task)
+            key = caps.hash_, caps.node + "#" + caps.ver
+            self._peer_caps[presence.from_] = key
+            try:
+                info = self.cache.lookup_in_memory(*key)
+            except KeyError:
+                fut = asyncio.async(
+                    self.lookup_info(presence.from_,
+                                     caps.node,
+                                     caps.ver,
+                                     caps.hash_)
+                )
+            else:
+                # known hash: no need to spawn a task
+                fut = asyncio.Future()
+                fut.set_result(info)
+            self.disco_client.set_info_future(presence.from_, None, fut)
+        elif presence.type_.is_presence_state:
+            self._peer_caps.pop(presence.from_, None)
 
         return presence
 
     def update_hash(self):
-        identities = []
-        for category, type_, lang, name in self.disco_server.iter_identities():
-            identity = disco.xso.Identity(category=category,
-                                          type_=type_)
-            if lang is not None:
-                identity.lang = lang
-            if name is not None:
-                identity.name = name
-            identities.append(identity)
-
-        new_ver = hash_query(
-            disco.xso.InfoQuery(
-                identities=identities,
-                features=self.disco_server.iter_features(),
-            ),
-            "sha1",
-        )
+        self._update_hash_scheduled = False
+
+        info = self.disco_server.as_info_xso()
+        if info is self._hashed_info:
+            # the DiscoServer re-uses the XSO until its info changes
+            return
+        new_ver = hash_query(info, "sha1")
+        self._hashed_info = info
 
         if self.ver != new_ver:
             if self.ver is not None:
@@ -0,0 +1,492 @@
+########################################################################
+# File name: farm.py
+# This file is part of: aioxmpp
+#
+# LICENSE
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program.  If not, see
+# <http://www.gnu.org/licenses/>.
+#
+########################################################################
+"""
+:mod:`~aioxmpp.farm` --- Hosting many clients in one process
+############################################################
+
+This module provides tools to run a large number of :class:`~aioxmpp.Client`
+instances (one per account) in a single event loop.
+
+Each :class:`~aioxmpp.Client` is self-contained: it discovers its own
+connection options, keeps its own caches and reconnects on its own schedule.
+With thousands of accounts on the same few servers, this duplicates a lot of
+work and makes all clients hit the server at the same time after an outage.
+A :class:`ClientFarm` groups clients and shares the following between them:
+
+* The connection options discovered via DNS (see :class:`ConnectorCache`).
+* The :class:`aioxmpp.entitycaps.Cache` used by
+  :class:`~aioxmpp.EntityCapsService` instances summoned through
+  :meth:`ClientFarm.summon`.
+
+In addition, the farm staggers the initial connection attempts of its clients
+and applies random jitter to their reconnect backoff (see
+:attr:`aioxmpp.Client.backoff_jitter`), and it provides aggregate metrics over
+all clients.
+
+.. note::
+
+   TLS contexts are not shared: certificate verifiers configure the context of
+   each connection (see :attr:`.SecurityLayer.ssl_context_factory`). Clients
+   should however share a single :class:`~.SecurityLayer` instance, since the
+   SASL providers in it are stateless.
+
+.. versionadded:: 0.8
+
+.. autoclass:: ClientFarm
+
+.. autoclass:: FarmStatistics
+
+.. autoclass:: ConnectorCache
+
+"""
+import asyncio
+import collections
+import functools
+import itertools
+import logging
+
+from datetime import timedelta
+
+from . import (
+    entitycaps,
+    node,
+)
+
+
+logger = logging.getLogger(__name__)
+
+
+class ConnectorCache:
+    """
+    Cache the connection options discovered by
+    :func:`~aioxmpp.node.discover_connectors`.
+
+    :param ttl: Time for which discovered options are re-used.
+    :type ttl: :class:`datetime.timedelta`
+    :param loop: The event loop to use.
+    :type loop: :class:`asyncio.BaseEventLoop` or :data:`None`
+
+    Instances are coroutine functions with the signature of
+    :func:`~aioxmpp.node.discover_connectors` and can thus be used as
+    :attr:`aioxmpp.Client.discovery`.
+
+    Concurrent lookups for the same domain are coalesced into a single DNS
+    lookup. A lookup is not cancelled if one of the callers waiting for it is
+    cancelled. Failed lookups are not cached.
+
+    .. attribute:: ttl
+
+       The time for which discovered options are kept.
+
+    .. attribute:: hits
+
+       The number of calls which were answered from the cache or by joining a
+       lookup which was already in progress.
+
+    .. attribute:: misses
+
+       The number of calls which started a new lookup.
+
+    .. automethod:: clear
+    """
+
+    def __init__(self, *, ttl=timedelta(minutes=5), loop=None):
+        super().__init__()
+        self.ttl = ttl
+        self._loop = loop or asyncio.get_event_loop()
+        self._entries = {}
+        self._pending = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _lookup_done(self, domain, task):
+        del self._pending[domain]
+        if task.cancelled() or task.exception() is not None:
+            return
+        self._entries[domain] = (
+            self._loop.time() + self.ttl.total_seconds(),
+            task.result(),
+        )
+
+    @asyncio.coroutine
+    def __call__(self, domain, loop=None, logger=node.logger):
+        try:
+            expires_at, options = self._entries[domain]
+        except KeyError:
+            pass
+        else:
+            if expires_at > self._loop.time():
+                self.hits += 1
+                return list(options)
+            del self._entries[domain]
+
+        try:
+            task = self._pending[domain]
+        except KeyError:
+            self.misses += 1
+            task = asyncio.async(
+                node.discover_connectors(domain, loop=loop, logger=logger),
+                loop=self._loop,
+            )
+            self._pending[domain] = task
+            task.add_done_callback(
+                functools.partial(self._lookup_done, domain)
+            )
+        else:
+            self.hits += 1
+
+        options = yield from asyncio.shield(task, loop=self._loop)
+        return list(options)
+
+    def clear(self):
+        """
+        Drop all cached options. Lookups in progress are not affected.
+        """
+        self._entries.clear()
+
+
+class FarmStatistics(collections.namedtuple(
+        "FarmStatistics",
+        [
+            "clients",
+            "running",
+            "established",
+            "streams_established",
+            "streams_suspended",
+            "streams_destroyed",
+            "failures",
+            "discovery_hits",
+            "discovery_misses",
+        ])):
+    """
+    Aggregate metrics of a :class:`ClientFarm`.
+
+    .. attribute:: clients
+
+       Number of clients in the farm.
+
+    .. attribute:: running
+
+       Number of clients which are :attr:`~aioxmpp.Client.running`.
+
+    .. attribute:: established
+
+       Number of clients whose stream is currently
+       :attr:`~aioxmpp.Client.established`.
+
+    .. attribute:: streams_established
+
+       Number of :meth:`~aioxmpp.Client.on_stream_established` emissions
+       since the clients were added.
+
+    .. attribute:: streams_suspended
+
+       Number of :meth:`~aioxmpp.Client.on_stream_suspended` emissions.
+
+    .. attribute:: streams_destroyed
+
+       Number of :meth:`~aioxmpp.Client.on_stream_destroyed` emissions.
+
+    .. attribute:: failures
+
+       Number of :meth:`~aioxmpp.Client.on_failure` emissions.
+
+    .. attribute:: discovery_hits
+
+       :attr:`ConnectorCache.hits` of the shared cache.
+
+    .. attribute:: discovery_misses
+
+       :attr:`ConnectorCache.misses` of the shared cache.
+    """
+
+
+class ClientFarm:
+    """
+    Manage a group of :class:`~aioxmpp.Client` instances in one event loop.
+
+    :param start_interval: Delay between the starts of two clients in
+                           :meth:`start`.
+    :type start_interval: :class:`datetime.timedelta`
+    :param reconnect_jitter: Value for
+                             :attr:`~aioxmpp.Client.backoff_jitter` of the
+                             clients.
+    :type reconnect_jitter: :class:`float`
+    :param discovery_ttl: Time to cache discovered connection options.
+    :type discovery_ttl: :class:`datetime.timedelta`
+    :param loop: The event loop to use.
+    :type loop: :class:`asyncio.BaseEventLoop` or :data:`None`
+    :param logger: Logger to use instead of the default logger.
+    :type logger: :class:`logging.Logger` or :data:`None`
+
+    Clients are added with :meth:`add`. The farm sets the
+    :attr:`~aioxmpp.Client.discovery` and
+    :attr:`~aioxmpp.Client.backoff_jitter` attributes of each client and
+    listens to its signals to gather the :attr:`statistics`. The clients stay
+    fully usable on their own; the farm does not proxy any stanza traffic.
+
+    Managing clients:
+
+    .. automethod:: add
+
+    .. automethod:: remove
+
+    .. automethod:: summon
+
+    .. automethod:: start
+
+    .. automethod:: stop
+
+    Shared state:
+
+    .. attribute:: discovery
+
+       The :class:`ConnectorCache` used by all clients of the farm.
+
+    .. attribute:: caps_cache
+
+       The :class:`aioxmpp.entitycaps.Cache` assigned to all
+       :class:`~aioxmpp.EntityCapsService` instances summoned via
+       :meth:`summon`.
+
+    .. attribute:: start_interval
+
+       See the `start_interval` argument.
+
+    .. attribute:: reconnect_jitter
+
+       See the `reconnect_jitter` argument. Changing it only affects clients
+       added afterwards.
+
+    .. autoattribute:: statistics
+    """
+
+    def __init__(self, *,
+                 start_interval=timedelta(0),
+                 reconnect_jitter=0.5,
+                 discovery_ttl=timedelta(minutes=5),
+                 loop=None,
+                 logger=None):
+        super().__init__()
+        self._loop = loop or asyncio.get_event_loop()
+        self.logger = (logger or
+                       logging.getLogger(".".join([
+                           type(self).__module__,
+                           type(self).__qualname__,
+                       ])))
+        self.start_interval = start_interval
+        self.reconnect_jitter = reconnect_jitter
+        self.discovery = ConnectorCache(ttl=discovery_ttl, loop=self._loop)
+        self.caps_cache = entitycaps.Cache()
+
+        self._clients = collections.OrderedDict()
+        self._summoned = []
+        self._start_handles = {}
+
+        self._streams_established = 0
+        self._streams_suspended = 0
+        self._streams_destroyed = 0
+        self._failures = 0
+
+    def __len__(self):
+        return len(self._clients)
+
+    def __iter__(self):
+        return iter(self._clients)
+
+    def __contains__(self, client):
+        return client in self._clients
+
+    def _on_stream_established(self):
+        self._streams_established += 1
+
+    def _on_stream_suspended(self, reason):
+        self._streams_suspended += 1
+
+    def _on_stream_destroyed(self, reason=None):
+        self._streams_destroyed += 1
+
+    def _on_failure(self, err):
+        self._failures += 1
+
+    def _summon_into(self, client, class_):
+        instance = client.summon(class_)
+        # dependencies holds the instances of all (transitive) dependencies
+        # which the client has summoned for class_
+        for service in itertools.chain([instance],
+                                       instance.dependencies.values()):
+            if isinstance(service, entitycaps.EntityCapsService):
+                service.cache = self.caps_cache
+        return instance
+
+    def add(self, client):
+        """
+        Add a client to the farm.
+
+        :param client: The client to add.
+        :type client: :class:`~aioxmpp.Client`
+        :raises ValueError: if the client is already part of the farm
+        :return: `client`
+
+        The client is configured to use the shared :attr:`discovery` cache and
+        the :attr:`reconnect_jitter`. All services which have been summoned
+        via :meth:`summon` are summoned into the client.
+
+        The client is not started; use :meth:`start` or
+        :meth:`~aioxmpp.Client.start`.
+        """
+        if client in self._clients:
+            raise ValueError("client is already part of the farm")
+
+        client.discovery = self.discovery
+        client.backoff_jitter = self.reconnect_jitter
+
+        self._clients[client] = [
+            (client.on_stream_established,
+             client.on_stream_established.connect(
+                 self._on_stream_established)),
+            (client.on_stream_suspended,
+             client.on_stream_suspended.connect(
+                 self._on_stream_suspended)),
+            (client.on_stream_destroyed,
+             client.on_stream_destroyed.connect(
+                 self._on_stream_destroyed)),
+            (client.on_failure,
+             client.on_failure.connect(
+                 self._on_failure)),
+        ]
+
+        for class_ in self._summoned:
+            self._summon_into(client, class_)
+
+        return client
+
+    def remove(self, client):
+        """
+        Remove a client from the farm.
+
+        :param client: The client to remove.
+        :type client: :class:`~aioxmpp.Client`
+        :raises KeyError: if the client is not part of the farm
+
+        A pending delayed start of the client is cancelled. The client is not
+        stopped and keeps the services it has summoned.
+        """
+        tokens = self._clients.pop(client)
+        for signal, token in tokens:
+            signal.disconnect(token)
+
+        handle = self._start_handles.pop(client, None)
+        if handle is not None:
+            handle.cancel()
+
+        client.discovery = None
+
+    def summon(self, class_):
+        """
+        Summon a :class:`~aioxmpp.service.Service` in all clients.
+
+        :param class_: The service class to summon.
+        :return: The list of service instances, in the order the clients were
+                 added.
+
+        Clients added later will have the service summoned on :meth:`add`. If
+        `class_` is or depends on :class:`~aioxmpp.EntityCapsService`, the
+        service is configured to use the shared :attr:`caps_cache`.
+        """
+        if class_ not in self._summoned:
+            self._summoned.append(class_)
+        return [
+            self._summon_into(client, class_)
+            for client in self._clients
+        ]
+
+    def _start_client(self, client):
+        self._start_handles.pop(client, None)
+        if not client.running:
+            client.start()
+
+    def start(self):
+        """
+        Start all clients which are not running yet.
+
+        The starts are spread out over time using :attr:`start_interval`:
+        the first client is started immediately, the next one
+        :attr:`start_interval` later and so on. This avoids flooding the DNS
+        and the servers with connection attempts.
+        """
+        interval = self.start_interval.total_seconds()
+        nstarted = 0
+        for client in self._clients:
+            if client.running or client in self._start_handles:
+                continue
+            delay = nstarted * interval
+            nstarted += 1
+            if delay <= 0:
+                self._start_client(client)
+            else:
+                self._start_handles[client] = self._loop.call_later(
+                    delay,
+                    self._start_client,
+                    client,
+                )
+
+        self.logger.debug("starting %d clients", nstarted)
+
+    def stop(self):
+        """
+        Stop all clients and cancel pending starts.
+        """
+        for handle in self._start_handles.values():
+            handle.cancel()
+        self._start_handles.clear()
+
+        for client in self._clients:
+            client.stop()
+
+    @property
+    def statistics(self):
+        """
+        A :class:`FarmStatistics` snapshot of the farm.
+        """
+        running = 0
+        established = 0
+        for client in self._clients:
+            if client.running:
+                running += 1
+            if client.established:
+                established += 1
+
+        return FarmStatistics(
+            clients=len(self._clients),
+            running=running,
+            established=established,
+            streams_established=self._streams_established,
+            streams_suspended=self._streams_suspended,
+            streams_destroyed=self._streams_destroyed,
+            failures=self._failures,
+            discovery_hits=self.discovery.hits,
+            discovery_misses=self.discovery.misses,
+        )
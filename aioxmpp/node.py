@@ -62,6 +62,7 @@ Utilities
 import asyncio
 import contextlib
 import logging
+import random
 import warnings
 
 from datetime import timedelta
@@ -267,7 +268,8 @@ def connect_xmlstream(
         negotiation_timeout=60.,
         override_peer=[],
         loop=None,
-        logger=logger):
+        logger=logger,
+        discovery=None):
     """
     Prepare and connect a :class:`aioxmpp.protocol.XMLStream` to a server
     responsible for the given `jid` and authenticate against that server using
@@ -287,6 +289,11 @@ def connect_xmlstream(
     `loop` may be a :class:`asyncio.BaseEventLoop` to use. Defaults to the
     current event loop.
 
+    `discovery` may be a coroutine function with the same signature as
+    :func:`discover_connectors`, which is then used instead of
+    :func:`discover_connectors` to find the connection options (for example a
+    shared :class:`aioxmpp.farm.ConnectorCache`).
+
     If `domain` announces that XMPP is not supported at all,
     :class:`ValueError` is raised. If no options are returned from
     :func:`discover_connectors` and `override_peer` is empty,
@@ -314,8 +321,13 @@ def connect_xmlstream(
        The explicit raising of TLS errors has been introduced. Before, TLS
        errors were treated like any other connection error, possibly masking
        configuration problems.
+
+    .. versionchanged:: 0.8
+
+       The `discovery` argument was added.
     """
     loop = asyncio.get_event_loop() if loop is None else loop
+    discovery = discovery or discover_connectors
 
     domain = jid.domain.encode("idna")
 
@@ -331,7 +343,7 @@ def connect_xmlstream(
     if result is not None:
         return result
 
-    options = list((yield from discover_connectors(
+    options = list((yield from discovery(
         domain,
         loop=loop,
         logger=logger,
@@ -486,6 +498,16 @@ class Client:
 
        .. versionadded:: 0.6
 
+    .. attribute:: discovery
+       :annotation: = None
+
+       If not :data:`None`, a coroutine function which is passed as
+       `discovery` to :meth:`connect_xmlstream` and thus replaces
+       :meth:`discover_connectors`. This allows many clients to share one
+       cache of connection options, see :class:`aioxmpp.farm.ConnectorCache`.
+
+       .. versionadded:: 0.8
+
     Connection information:
 
     .. autoattribute:: established
@@ -531,6 +553,17 @@ class Client:
        The backoff time is capped to :attr:`backoff_cap`, to avoid having
        unrealistically high values.
 
+    .. attribute:: backoff_jitter
+       :annotation: = 0.0
+
+       Fraction by which each backoff delay is randomly shortened or
+       lengthened. With a value of ``0.5``, the actual delay is chosen
+       uniformly between half and one and a half times the nominal backoff
+       time. This spreads out the reconnects of many clients which lost their
+       connections at the same time.
+
+       .. versionadded:: 0.8
+
     Signals:
 
     .. signal:: on_failure(err)
@@ -667,7 +700,9 @@ class Client:
         self.backoff_start = timedelta(seconds=1)
         self.backoff_factor = 1.2
         self.backoff_cap = timedelta(seconds=60)
+        self.backoff_jitter = 0.0
         self.override_peer = list(override_peer)
+        self.discovery = None
         self._max_initial_attempts = max_initial_attempts
 
         self.on_stopped.logger = self.logger.getChild("on_stopped")
@@ -827,7 +862,8 @@ class Client:
                 negotiation_timeout=self.negotiation_timeout.total_seconds(),
                 override_peer=override_peer,
                 loop=self._loop,
-                logger=self.logger)
+                logger=self.logger,
+                discovery=self.discovery)
 
         self._had_connection = True
 
@@ -887,9 +923,12 @@ class Client:
 
                     if self._backoff_time is None:
                         self._backoff_time = self.backoff_start.total_seconds()
-                    self.logger.debug("re-trying after %.1f seconds",
-                                      self._backoff_time)
-                    yield from asyncio.sleep(self._backoff_time)
+                    delay = self._backoff_time
+                    if self.backoff_jitter:
+                        delay *= 1 + random.uniform(-self.backoff_jitter,
+                                                    self.backoff_jitter)
+                    self.logger.debug("re-trying after %.1f seconds", delay)
+                    yield from asyncio.sleep(delay)
                     self._backoff_time *= self.backoff_factor
                     if self._backoff_time > self.backoff_cap.total_seconds():
                         self._backoff_time = self.backoff_cap.total_seconds()
@@ -42,6 +42,10 @@ Utilities for XML streams
 
 .. autofunction:: reset_stream_and_get_features
 
+.. autoclass:: WriteCoalescer
+
+.. autoclass:: WriteStatistics
+
 Enumerations
 ============
 
@@ -49,9 +53,14 @@ Enumerations
 
 .. autoclass:: State
 
+.. autoclass:: ParserBackend
+
+.. autoclass:: SerializerBackend
+
 """
 
 import asyncio
+import collections
 import functools
 import inspect
 import logging
@@ -140,6 +149,52 @@ class State(Enum):
     CLOSED = 6
 
 
+class ParserBackend(Enum):
+    """
+    The XML parser backends which can be used by :class:`XMLStream`:
+
+    .. attribute:: SAX
+
+       Use a :mod:`xml.sax` parser (created by :func:`aioxmpp.xml.make_parser`)
+       with a :class:`~aioxmpp.xml.XMPPXMLProcessor` as content handler. This
+       is the default.
+
+    .. attribute:: EXPAT
+
+       Use a :class:`~aioxmpp.xml.XMPPXMLExpatProcessor`, which drives
+       :mod:`xml.parsers.expat` directly. This avoids the overhead of the SAX
+       layer and is considerably faster when receiving many stanzas.
+
+    .. versionadded:: 0.8
+    """
+
+    SAX = "sax"
+    EXPAT = "expat"
+
+
+class SerializerBackend(Enum):
+    """
+    The XML serializer backends which can be used by :class:`XMLStream`:
+
+    .. attribute:: SAX
+
+       Serialize XSOs by passing them to a
+       :class:`~aioxmpp.xml.XMPPXMLGenerator` using
+       :meth:`~aioxmpp.xso.XSO.unparse_to_sax`. This is the default.
+
+    .. attribute:: DIRECT
+
+       Serialize XSOs using a :class:`~aioxmpp.xml.XMPPXMLSerializer`, which
+       generates the same output considerably faster and passes it to the
+       transport as a single :class:`bytes` object per XSO.
+
+    .. versionadded:: 0.8
+    """
+
+    SAX = "sax"
+    DIRECT = "direct"
+
+
 class DebugWrapper:
     def __init__(self, dest, logger):
         self.dest = dest
@@ -160,6 +215,181 @@ class DebugWrapper:
         self._flush()
 
 
+class WriteStatistics(collections.namedtuple(
+        "WriteStatistics",
+        [
+            "writes",
+            "bytes_written",
+            "bytes_per_write",
+            "writes_per_second",
+        ])):
+    """
+    Counters of a :class:`WriteCoalescer`.
+
+    .. attribute:: writes
+
+       Number of writes issued to the transport.
+
+    .. attribute:: bytes_written
+
+       Number of bytes written to the transport.
+
+    .. attribute:: bytes_per_write
+
+       Average number of bytes per write.
+
+    .. attribute:: writes_per_second
+
+       Average number of writes per second since the connection was made.
+
+    .. versionadded:: 0.8
+    """
+
+
+class WriteCoalescer:
+    """
+    Collect the data written to a transport and pass it on in as few
+    :meth:`~asyncio.WriteTransport.write` calls as possible.
+
+    :param dest: The transport to write to.
+    :param loop: The event loop to use for scheduling the writes.
+    :param max_buffer_size: Number of bytes after which the buffer is written
+        immediately.
+    :type max_buffer_size: :class:`int`
+    :param max_delay: Time in seconds for which buffered data may be held
+        back.
+    :type max_delay: :class:`float`
+
+    Data passed to :meth:`write` is buffered. When :meth:`flush` is called
+    (which :func:`~aioxmpp.xml.write_xmlstream` does after each XSO), the
+    buffer is scheduled to be written to `dest`. With a `max_delay` of zero,
+    this happens in the next iteration of the event loop, so that all XSOs
+    sent within one iteration end up in a single write. Otherwise, the buffer
+    is written `max_delay` seconds after the first flush. If the buffer grows
+    to `max_buffer_size` bytes or more, it is written immediately.
+
+    .. automethod:: write
+
+    .. automethod:: flush
+
+    .. automethod:: drain
+
+    .. automethod:: discard
+
+    Statistics:
+
+    .. attribute:: writes
+
+       The number of writes issued to `dest`.
+
+    .. attribute:: bytes_written
+
+       The number of bytes written to `dest`.
+
+    .. autoattribute:: bytes_per_write
+
+    .. autoattribute:: writes_per_second
+
+    .. autoattribute:: statistics
+
+    .. versionadded:: 0.8
+    """
+
+    def __init__(self, dest, loop, max_buffer_size=65536, max_delay=0):
+        self.dest = dest
+        self.max_buffer_size = max_buffer_size
+        self.max_delay = max_delay
+        self._loop = loop
+        self._pieces = []
+        self._buffered = 0
+        self._handle = None
+        self._started = loop.time()
+        self.writes = 0
+        self.bytes_written = 0
+
+    def write(self, data):
+        """
+        Append `data` to the buffer.
+
+        If the buffer exceeds the configured maximum size, it is written to
+        the transport immediately.
+        """
+        self._pieces.append(data)
+        self._buffered += len(data)
+        if self._buffered >= self.max_buffer_size:
+            self.drain()
+
+    def flush(self):
+        """
+        Schedule the buffered data to be written to the transport.
+        """
+        if self._handle is not None or not self._pieces:
+            return
+        if self.max_delay > 0:
+            self._handle = self._loop.call_later(self.max_delay, self.drain)
+        else:
+            self._handle = self._loop.call_soon(self.drain)
+
+    def drain(self):
+        """
+        Write the buffered data to the transport immediately.
+        """
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        if not self._pieces:
+            return
+        data = b"".join(self._pieces)
+        self._pieces.clear()
+        self._buffered = 0
+        self.writes += 1
+        self.bytes_written += len(data)
+        self.dest.write(data)
+
+    def discard(self):
+        """
+        Drop the buffered data without writing it and cancel any scheduled
+        write.
+        """
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        self._pieces.clear()
+        self._buffered = 0
+
+    @property
+    def bytes_per_write(self):
+        """
+        The average number of bytes per write issued to the transport.
+        """
+        if not self.writes:
+            return 0.
+        return self.bytes_written / self.writes
+
+    @property
+    def writes_per_second(self):
+        """
+        The average number of writes per second issued to the transport since
+        the :class:`WriteCoalescer` was created.
+        """
+        elapsed = self._loop.time() - self._started
+        if elapsed <= 0:
+            return 0.
+        return self.writes / elapsed
+
+    @property
+    def statistics(self):
+        """
+        A :class:`WriteStatistics` snapshot of the counters.
+        """
+        return WriteStatistics(
+            self.writes,
+            self.bytes_written,
+            self.bytes_per_write,
+            self.writes_per_second,
+        )
+
+
 class XMLStream(asyncio.Protocol):
     """
     XML stream implementation. This is an streaming :class:`asyncio.Protocol`
@@ -182,6 +412,17 @@ class XMLStream(asyncio.Protocol):
     child for logging purposes. This eases debugging and allows for
     connection-specific loggers.
 
+    `parser_backend` may be a :class:`ParserBackend` member which selects the
+    XML parser used for received data. If it is :data:`None`, the value of the
+    :attr:`parser_backend` class attribute is used. Likewise,
+    `serializer_backend` may be a :class:`SerializerBackend` member which
+    selects how XSOs are serialized.
+
+    If `coalesce_writes` is true, the data written by the stream is collected
+    by a :class:`WriteCoalescer` and passed to the transport in batches. If it
+    is :data:`None`, the value of the :attr:`coalesce_writes` class attribute
+    is used.
+
     Receiving XSOs:
 
     .. attribute:: stanza_parser
@@ -249,17 +490,98 @@ class XMLStream(asyncio.Protocol):
        The maximum time to wait for the peer ``</stream:stream>`` before
        forcing to close the transport and considering the stream closed.
 
+    Parsing and serialization:
+
+    .. attribute:: parser_backend
+
+       The :class:`ParserBackend` used to parse the received data. Assigning
+       to the class attribute changes the default for all streams created
+       afterwards; the `parser_backend` argument overrides it for a single
+       stream.
+
+       .. versionadded:: 0.8
+
+    .. attribute:: serializer_backend
+
+       The :class:`SerializerBackend` used to serialize the XSOs sent over the
+       stream. Like :attr:`parser_backend`, it can be changed globally by
+       assigning to the class attribute or per stream using the
+       `serializer_backend` argument.
+
+       .. versionadded:: 0.8
+
+    Write coalescing:
+
+    .. attribute:: coalesce_writes
+
+       If true, all XSOs sent within one iteration of the event loop (or
+       within :attr:`write_delay`) are written to the transport with a single
+       call. Like :attr:`parser_backend`, it can be changed globally by
+       assigning to the class attribute or per stream using the
+       `coalesce_writes` argument. Defaults to false.
+
+       .. versionadded:: 0.8
+
+    .. attribute:: write_buffer_size
+
+       The number of buffered bytes after which the buffer is written to the
+       transport immediately, even if :attr:`write_delay` has not passed yet.
+       Only used if :attr:`coalesce_writes` is true.
+
+       .. versionadded:: 0.8
+
+    .. attribute:: write_delay
+
+       The maximum time in seconds for which data is held back to be combined
+       with further writes. If zero, the data is written in the next iteration
+       of the event loop. Only used if :attr:`coalesce_writes` is true.
+
+       .. versionadded:: 0.8
+
+    .. autoattribute:: write_statistics
+
+    Flow control:
+
+    The transport may ask the stream to stop writing by calling
+    :meth:`pause_writing` when its write buffer is full, and allow writing
+    again by calling :meth:`resume_writing`. :meth:`send_xso` keeps accepting
+    XSOs while writing is paused; users which produce many XSOs should wait
+    for :meth:`drain` to return instead.
+
+    .. autoattribute:: writing_paused
+
+    .. automethod:: drain
+
+    .. automethod:: pause_writing
+
+    .. automethod:: resume_writing
+
     """
 
     on_closing = callbacks.Signal()
     shutdown_timeout = 15
+    parser_backend = ParserBackend.SAX
+    serializer_backend = SerializerBackend.SAX
+    coalesce_writes = False
+    write_buffer_size = 65536
+    write_delay = 0
 
     def __init__(self, to,
                  features_future,
                  sorted_attributes=False,
                  base_logger=logging.getLogger("aioxmpp"),
-                 loop=None):
+                 loop=None,
+                 parser_backend=None,
+                 serializer_backend=None,
+                 coalesce_writes=None):
         self._to = to
+        if parser_backend is not None:
+            self.parser_backend = parser_backend
+        if serializer_backend is not None:
+            self.serializer_backend = serializer_backend
+        if coalesce_writes is not None:
+            self.coalesce_writes = coalesce_writes
+        self._coalescer = None
         self._sorted_attributes = sorted_attributes
         self._logger = base_logger.getChild("XMLStream")
         self._transport = None
@@ -270,6 +592,8 @@ class XMLStream(asyncio.Protocol):
         self._smachine = statemachine.OrderedStateMachine(State.READY)
         self._transport_closing = False
         self._footer_timeout_future = None
+        self._writable = asyncio.Event(loop=self._loop)
+        self._writable.set()
 
         self._closing_future = asyncio.async(
             self._smachine.wait_for(
@@ -302,10 +626,15 @@ class XMLStream(asyncio.Protocol):
             text += " (at: {})".format(at)
         return RuntimeError(text)
 
+    def _drain_writes(self):
+        if self._coalescer is not None:
+            self._coalescer.drain()
+
     def _close_transport(self):
         if self._transport_closing:
             return
         self._transport_closing = True
+        self._drain_writes()
         self._transport.close()
 
     def _stream_starts_closing(self, task):
@@ -452,6 +781,16 @@ class XMLStream(asyncio.Protocol):
 
         assert self._transport is None
         self._transport = transport
+        self._writable.set()
+        if self.coalesce_writes:
+            self._coalescer = WriteCoalescer(
+                transport,
+                self._loop,
+                max_buffer_size=self.write_buffer_size,
+                max_delay=self.write_delay,
+            )
+        else:
+            self._coalescer = None
         self._writer = None
         self._exception = None
         # we need to set the state before we call reset()
@@ -466,8 +805,13 @@ class XMLStream(asyncio.Protocol):
         self._smachine.state = State.CLOSED
         self._exception = self._exception or exc
         self._kill_state()
+        if self._coalescer is not None:
+            self._coalescer.discard()
         self._writer = None
         self._transport = None
+        # wake up anyone waiting in drain(); they will notice that the stream
+        # is gone when they try to send
+        self._writable.set()
         self._closing_future.cancel()
         if self._footer_timeout_future is not None:
             self._footer_timeout_future.cancel()
@@ -487,6 +831,49 @@ class XMLStream(asyncio.Protocol):
             # server at this point
             self._close_transport()
 
+    def pause_writing(self):
+        """
+        Called by the transport when its write buffer exceeds the high water
+        mark.
+
+        .. versionadded:: 0.8
+        """
+        self._logger.debug("transport paused writing")
+        self._writable.clear()
+
+    def resume_writing(self):
+        """
+        Called by the transport when its write buffer has been drained to the
+        low water mark.
+
+        .. versionadded:: 0.8
+        """
+        self._logger.debug("transport resumed writing")
+        self._writable.set()
+
+    @property
+    def writing_paused(self):
+        """
+        :data:`True` while the transport has paused writing (see
+        :meth:`pause_writing`).
+
+        .. versionadded:: 0.8
+        """
+        return not self._writable.is_set()
+
+    @asyncio.coroutine
+    def drain(self):
+        """
+        Wait until the transport accepts more data.
+
+        Returns immediately if writing is not paused. If the connection is
+        lost while waiting, this coroutine returns, too; the next attempt to
+        send will then raise the appropriate exception.
+
+        .. versionadded:: 0.8
+        """
+        yield from self._writable.wait()
+
     def eof_received(self):
         if self._smachine.state == State.OPEN:
             # close and set to EOF received
@@ -524,6 +911,7 @@ class XMLStream(asyncio.Protocol):
                 self._smachine.state == State.CLOSED):
             return
         self._writer.close()
+        self._drain_writes()
         if self._transport.can_write_eof():
             self._transport.write_eof()
         if self._smachine.state == State.STREAM_HEADER_SENT:
@@ -564,23 +952,29 @@ class XMLStream(asyncio.Protocol):
     def _reset_state(self):
         self._kill_state()
 
-        self._processor = xml.XMPPXMLProcessor()
+        if self.parser_backend == ParserBackend.EXPAT:
+            self._processor = xml.XMPPXMLExpatProcessor()
+            self._parser = self._processor
+        else:
+            self._processor = xml.XMPPXMLProcessor()
+            self._parser = xml.make_parser()
+            self._parser.setContentHandler(self._processor)
         self._processor.stanza_parser = self.stanza_parser
         self._processor.on_stream_header = self._rx_stream_header
         self._processor.on_stream_footer = self._rx_stream_footer
         self._processor.on_exception = self._rx_exception
-        self._parser = xml.make_parser()
-        self._parser.setContentHandler(self._processor)
 
+        dest = self._coalescer or self._transport
         if self._logger.getEffectiveLevel() <= logging.DEBUG:
-            dest = DebugWrapper(self._transport, self._logger)
-        else:
-            dest = self._transport
+            dest = DebugWrapper(dest, self._logger)
         self._writer = xml.write_xmlstream(
             dest,
             self._to,
             nsmap={None: "jabber:client"},
-            sorted_attributes=self._sorted_attributes)
+            sorted_attributes=self._sorted_attributes,
+            use_serializer=(
+                self.serializer_backend == SerializerBackend.DIRECT
+            ))
 
     def reset(self):
         """
@@ -625,8 +1019,12 @@ class XMLStream(asyncio.Protocol):
             return
         if     (self._smachine.state != State.CLOSING and
                 self._transport.can_write_eof()):
+            self._drain_writes()
             self._transport.write_eof()
         self._close_transport()
+        if self._coalescer is not None:
+            # nothing may be written after the transport has been closed
+            self._coalescer.discard()
 
     def send_xso(self, obj):
         """
@@ -672,6 +1070,7 @@ class XMLStream(asyncio.Protocol):
         if not self.can_starttls():
             raise RuntimeError("starttls not available on transport")
 
+        self._drain_writes()
         yield from self._transport.starttls(ssl_context,
                                             post_handshake_callback)
         self._reset_state()
@@ -697,6 +1096,22 @@ class XMLStream(asyncio.Protocol):
         """
         return self._transport
 
+    @property
+    def write_statistics(self):
+        """
+        A :class:`WriteStatistics` snapshot of the counters for the writes
+        issued to the transport on the current (or last) connection. This
+        attribute is :data:`None` if :attr:`coalesce_writes` was false when
+        the connection was made.
+
+        This attribute cannot be set.
+
+        .. versionadded:: 0.8
+        """
+        if self._coalescer is None:
+            return None
+        return self._coalescer.statistics
+
     @property
     def state(self):
         """
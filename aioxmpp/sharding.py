@@ -0,0 +1,655 @@
+########################################################################
+# File name: sharding.py
+# This file is part of: aioxmpp
+#
+# LICENSE
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program.  If not, see
+# <http://www.gnu.org/licenses/>.
+#
+########################################################################
+"""
+:mod:`~aioxmpp.sharding` --- Spreading clients over worker processes
+####################################################################
+
+A single :class:`~aioxmpp.farm.ClientFarm` runs in a single event loop and is
+thus limited to one CPU core. This module spreads the accounts over several
+worker processes, each of which runs its own event loop and its own
+:class:`~aioxmpp.farm.ClientFarm`.
+
+The front-end process owns a :class:`ShardedFarm`. Accounts are assigned to
+the workers by consistent hashing of their bare JID (see :class:`HashRing`),
+so that adding or removing a worker only moves the accounts of that worker.
+The front-end talks to the workers over a :mod:`multiprocessing` pipe, which
+is used to start and stop accounts, to send stanzas and to query statistics.
+
+The clients are created in the worker processes by a *client factory*, which
+is called with the JID of the account and the additional arguments passed to
+:meth:`ShardedFarm.add_account`. It must return an object which behaves like
+an :class:`aioxmpp.Client` (for example a
+:class:`aioxmpp.PresenceManagedClient`) and which is not started yet. The
+factory and the arguments must be picklable if the ``spawn`` or
+``forkserver`` start methods are used.
+
+If a worker process dies, its accounts are moved to the remaining workers (or
+to a replacement worker, see :attr:`ShardedFarm.respawn`).
+
+.. versionadded:: 0.8
+
+.. autoclass:: ShardedFarm
+
+.. autoclass:: HashRing
+
+"""
+import asyncio
+import bisect
+import functools
+import hashlib
+import io
+import itertools
+import logging
+import multiprocessing
+import pickle
+
+from . import (
+    callbacks,
+    farm,
+    stanza as stanza_,
+    structs,
+    xml,
+)
+
+
+logger = logging.getLogger(__name__)
+
+
+_STANZA_CLASSES = {
+    cls.TAG: cls
+    for cls in [stanza_.Message, stanza_.Presence, stanza_.IQ]
+}
+
+
+def _hash_key(key):
+    return int.from_bytes(
+        hashlib.md5(key.encode("utf-8")).digest()[:8],
+        "big",
+    )
+
+
+class HashRing:
+    """
+    Consistent hash ring mapping string keys to nodes.
+
+    :param nodes: Initial nodes of the ring.
+    :type nodes: iterable of hashable objects whose :func:`str` is unique
+    :param replicas: Number of points each node occupies on the ring.
+    :type replicas: :class:`int`
+
+    Each node is placed on the ring `replicas` times. A key belongs to the node
+    with the first point at or after the hash of the key. Removing a node thus
+    only re-assigns the keys of that node, and these are spread evenly over the
+    remaining nodes.
+
+    .. automethod:: add
+
+    .. automethod:: remove
+
+    .. automethod:: get
+    """
+
+    def __init__(self, nodes=(), *, replicas=64):
+        super().__init__()
+        self.replicas = replicas
+        self._hashes = []
+        self._nodes = []
+        self._members = set()
+        for node in nodes:
+            self.add(node)
+
+    def __len__(self):
+        return len(self._members)
+
+    def __iter__(self):
+        return iter(self._members)
+
+    def __contains__(self, node):
+        return node in self._members
+
+    def add(self, node):
+        """
+        Add a `node` to the ring.
+
+        :raises ValueError: if the node is already part of the ring
+        """
+        if node in self._members:
+            raise ValueError("node is already part of the ring")
+        self._members.add(node)
+        for i in range(self.replicas):
+            hash_ = _hash_key("{}#{}".format(node, i))
+            index = bisect.bisect_left(self._hashes, hash_)
+            self._hashes.insert(index, hash_)
+            self._nodes.insert(index, node)
+
+    def remove(self, node):
+        """
+        Remove a `node` from the ring.
+
+        :raises KeyError: if the node is not part of the ring
+        """
+        self._members.remove(node)
+        keep = [
+            (hash_, other)
+            for hash_, other in zip(self._hashes, self._nodes)
+            if other != node
+        ]
+        self._hashes = [hash_ for hash_, _ in keep]
+        self._nodes = [other for _, other in keep]
+
+    def get(self, key):
+        """
+        Return the node responsible for `key`.
+
+        :param key: The key to look up.
+        :type key: :class:`str`
+        :raises LookupError: if the ring is empty
+        """
+        if not self._hashes:
+            raise LookupError("hash ring is empty")
+        index = bisect.bisect_left(self._hashes, _hash_key(key))
+        if index == len(self._hashes):
+            index = 0
+        return self._nodes[index]
+
+
+class _Worker:
+    def __init__(self, conn, client_factory, farm_kwargs, loop):
+        super().__init__()
+        self._conn = conn
+        self._client_factory = client_factory
+        self._loop = loop
+        self._farm = farm.ClientFarm(loop=loop, **farm_kwargs)
+        self._clients = {}
+        self._done = asyncio.Future(loop=loop)
+        self._handlers = {
+            "start": self._handle_start,
+            "stop": self._handle_stop,
+            "send": self._handle_send,
+            "statistics": self._handle_statistics,
+        }
+
+    def _reply(self, id_, ok, value):
+        if not ok:
+            try:
+                pickle.dumps(value)
+            except Exception:
+                value = RuntimeError(repr(value))
+        self._conn.send((id_, ok, value))
+
+    def _handle_start(self, jid, args):
+        if jid in self._clients:
+            raise ValueError("account is already running")
+        client = self._client_factory(structs.JID.fromstr(jid), *args)
+        self._farm.add(client)
+        self._clients[jid] = client
+        self._farm.start()
+
+    def _handle_stop(self, jid):
+        client = self._clients.pop(jid)
+        self._farm.remove(client)
+        client.stop()
+
+    def _handle_send(self, jid, tag, data):
+        client = self._clients[jid]
+        client.stream.enqueue(xml.read_single_xso(
+            io.BytesIO(data),
+            _STANZA_CLASSES[tag],
+        ))
+
+    def _handle_statistics(self):
+        return tuple(self._farm.statistics)
+
+    @asyncio.coroutine
+    def _shutdown(self, id_):
+        self._farm.stop()
+        for _ in range(100):
+            if not any(client.running for client in self._farm):
+                break
+            yield from asyncio.sleep(0.01, loop=self._loop)
+        if id_ is not None:
+            self._reply(id_, True, None)
+        self._done.set_result(None)
+
+    def _on_readable(self):
+        try:
+            id_, command, *args = self._conn.recv()
+        except (EOFError, OSError):
+            # the front-end went away
+            self._loop.remove_reader(self._conn.fileno())
+            asyncio.async(self._shutdown(None), loop=self._loop)
+            return
+
+        if command == "shutdown":
+            self._loop.remove_reader(self._conn.fileno())
+            asyncio.async(self._shutdown(id_), loop=self._loop)
+            return
+
+        try:
+            result = self._handlers[command](*args)
+        except Exception as exc:
+            logger.debug("command %r failed", command, exc_info=True)
+            self._reply(id_, False, exc)
+        else:
+            self._reply(id_, True, result)
+
+    @asyncio.coroutine
+    def run(self):
+        self._loop.add_reader(self._conn.fileno(), self._on_readable)
+        yield from self._done
+
+
+def _worker_main(conn, client_factory, farm_kwargs, inherited_conns=()):
+    # with the fork start method, the worker inherits the front-end ends of
+    # the pipes; they would keep the pipes open if the front-end dies
+    for inherited in inherited_conns:
+        inherited.close()
+    # os.register_at_fork is not available everywhere; do not continue the
+    # stanza IDs of the front-end
+    stanza_._next_id.reseed()
+
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        loop.run_until_complete(
+            _Worker(conn, client_factory, farm_kwargs, loop).run()
+        )
+    finally:
+        conn.close()
+        loop.close()
+
+
+class _WorkerHandle:
+    def __init__(self, index, process, conn):
+        super().__init__()
+        self.index = index
+        self.process = process
+        self.conn = conn
+        self.pending = {}
+        self.accounts = set()
+
+
+class ShardedFarm:
+    """
+    Spread accounts over worker processes, each running a
+    :class:`~aioxmpp.farm.ClientFarm`.
+
+    :param client_factory: Callable creating the client for an account.
+    :param nworkers: Number of worker processes; defaults to the number of
+                     CPUs.
+    :type nworkers: :class:`int` or :data:`None`
+    :param replicas: Number of points per worker on the :class:`HashRing`.
+    :type replicas: :class:`int`
+    :param farm_kwargs: Keyword arguments for the
+                        :class:`~aioxmpp.farm.ClientFarm` of each worker.
+    :type farm_kwargs: :class:`dict` or :data:`None`
+    :param start_method: The :mod:`multiprocessing` start method to use, or
+                         :data:`None` for the platform default.
+    :type start_method: :class:`str` or :data:`None`
+    :param respawn: Initial value for :attr:`respawn`.
+    :type respawn: :class:`bool`
+    :param loop: The event loop to use.
+    :type loop: :class:`asyncio.BaseEventLoop` or :data:`None`
+    :param logger: Logger to use instead of the default logger.
+    :type logger: :class:`logging.Logger` or :data:`None`
+
+    The worker processes are started with :meth:`start` and stopped with
+    :meth:`stop`. Accounts are managed with :meth:`add_account` and
+    :meth:`remove_account`.
+
+    If a request is sent to a worker which dies before it replies,
+    :class:`ConnectionError` is raised. The accounts of the worker are started
+    again on the worker which is now responsible for them.
+
+    .. automethod:: start
+
+    .. automethod:: stop
+
+    .. automethod:: add_account
+
+    .. automethod:: remove_account
+
+    .. automethod:: send
+
+    .. automethod:: statistics
+
+    .. automethod:: worker_of
+
+    .. attribute:: respawn
+
+       If true, a worker which dies is replaced by a new worker process. Due to
+       the consistent hashing, the new worker takes over exactly the accounts
+       of the dead worker. Otherwise, the accounts are spread over the
+       remaining workers.
+
+    .. autoattribute:: workers
+
+    .. signal:: on_worker_died(index)
+
+       Emits when the worker process with the given `index` has died. The
+       accounts have already been re-assigned when the signal is emitted.
+    """
+
+    on_worker_died = callbacks.Signal()
+
+    def __init__(self, client_factory, *,
+                 nworkers=None,
+                 replicas=64,
+                 farm_kwargs=None,
+                 start_method=None,
+                 respawn=False,
+                 loop=None,
+                 logger=None):
+        super().__init__()
+        self._loop = loop or asyncio.get_event_loop()
+        self.logger = (logger or
+                       logging.getLogger(".".join([
+                           type(self).__module__,
+                           type(self).__qualname__,
+                       ])))
+        self._client_factory = client_factory
+        self._nworkers = nworkers or multiprocessing.cpu_count()
+        self._farm_kwargs = dict(farm_kwargs or {})
+        self._context = multiprocessing.get_context(start_method)
+        self.respawn = respawn
+
+        self._ring = HashRing(replicas=replicas)
+        self._workers = {}
+        self._accounts = {}
+        self._ids = itertools.count()
+        self._stopping = False
+
+    def __len__(self):
+        return len(self._accounts)
+
+    def __iter__(self):
+        return iter(self._accounts)
+
+    def __contains__(self, jid):
+        return jid in self._accounts
+
+    @property
+    def workers(self):
+        """
+        The indices of the worker processes which are currently alive.
+        """
+        return frozenset(self._workers)
+
+    def _spawn(self, index):
+        conn, child_conn = self._context.Pipe()
+        if self._context.get_start_method() == "fork":
+            inherited_conns = [conn] + [
+                worker.conn for worker in self._workers.values()
+            ]
+        else:
+            # nothing is inherited, and connections must not be pickled
+            inherited_conns = []
+        process = self._context.Process(
+            target=_worker_main,
+            args=(child_conn, self._client_factory, self._farm_kwargs,
+                  inherited_conns),
+            name="aioxmpp-worker-{}".format(index),
+            daemon=True,
+        )
+        process.start()
+        child_conn.close()
+
+        worker = _WorkerHandle(index, process, conn)
+        self._workers[index] = worker
+        self._ring.add(index)
+        self._loop.add_reader(
+            conn.fileno(),
+            functools.partial(self._on_readable, worker),
+        )
+        self.logger.debug("spawned worker %d (pid %d)", index, process.pid)
+
+    def _detach(self, worker):
+        self._loop.remove_reader(worker.conn.fileno())
+        worker.conn.close()
+        del self._workers[worker.index]
+        self._ring.remove(worker.index)
+
+        exc = ConnectionError("worker {} died".format(worker.index))
+        for fut in worker.pending.values():
+            if not fut.done():
+                fut.set_exception(exc)
+        worker.pending.clear()
+
+    def _on_readable(self, worker):
+        try:
+            id_, ok, value = worker.conn.recv()
+        except (EOFError, OSError):
+            self._worker_died(worker)
+            return
+
+        fut = worker.pending.pop(id_, None)
+        if fut is None or fut.done():
+            return
+        if ok:
+            fut.set_result(value)
+        else:
+            fut.set_exception(value)
+
+    def _worker_died(self, worker):
+        if worker.index not in self._workers:
+            return
+
+        self._detach(worker)
+        worker.process.join(0)
+        self.logger.warning("worker %d died (exit code %r)",
+                            worker.index, worker.process.exitcode)
+
+        if self._stopping:
+            return
+
+        if self.respawn:
+            self._spawn(worker.index)
+
+        if self._workers:
+            for jid in worker.accounts:
+                if jid in self._accounts:
+                    asyncio.async(self._restart_account(jid), loop=self._loop)
+        elif worker.accounts:
+            self.logger.error("no workers left to take over %d accounts",
+                              len(worker.accounts))
+
+        self.on_worker_died(worker.index)
+
+    def _request(self, worker, command, *args):
+        id_ = next(self._ids)
+        fut = asyncio.Future(loop=self._loop)
+        worker.pending[id_] = fut
+        try:
+            worker.conn.send((id_, command) + args)
+        except OSError:
+            self._worker_died(worker)
+        return fut
+
+    def _worker_for(self, jid):
+        return self._workers[self._ring.get(str(jid.bare()))]
+
+    @asyncio.coroutine
+    def _start_account(self, jid):
+        worker = self._worker_for(jid)
+        worker.accounts.add(jid)
+        yield from self._request(
+            worker,
+            "start",
+            str(jid),
+            self._accounts[jid],
+        )
+
+    @asyncio.coroutine
+    def _restart_account(self, jid):
+        try:
+            yield from self._start_account(jid)
+        except ConnectionError:
+            # the new worker died too; it will be handled there
+            pass
+        except Exception:
+            self.logger.exception("failed to move account %s", jid)
+
+    def worker_of(self, jid):
+        """
+        Return the index of the worker responsible for `jid`.
+
+        :param jid: The account JID.
+        :type jid: :class:`aioxmpp.JID`
+        :raises LookupError: if no worker is alive
+        """
+        return self._ring.get(str(jid.bare()))
+
+    def start(self):
+        """
+        Start the worker processes.
+
+        :raises RuntimeError: if the workers have already been started
+        """
+        if self._workers:
+            raise RuntimeError("workers already started")
+        self._stopping = False
+        for index in range(self._nworkers):
+            self._spawn(index)
+
+    @asyncio.coroutine
+    def stop(self, *, timeout=5):
+        """
+        Stop all clients and worker processes.
+
+        :param timeout: Time in seconds to wait for each worker to shut down
+                        cleanly before it is terminated.
+        :type timeout: :class:`numbers.Real`
+
+        All accounts are removed from the farm.
+        """
+        self._stopping = True
+        workers = list(self._workers.values())
+        futures = [
+            self._request(worker, "shutdown")
+            for worker in workers
+        ]
+        if futures:
+            yield from asyncio.wait(futures, timeout=timeout, loop=self._loop)
+
+        for worker in workers:
+            if worker.index in self._workers:
+                self._detach(worker)
+            worker.process.join(timeout)
+            if worker.process.is_alive():
+                self.logger.warning("terminating worker %d", worker.index)
+                worker.process.terminate()
+                worker.process.join()
+
+        self._accounts.clear()
+
+    @asyncio.coroutine
+    def add_account(self, jid, *args):
+        """
+        Start a client for an account.
+
+        :param jid: The account JID.
+        :type jid: :class:`aioxmpp.JID`
+        :param args: Additional arguments for the client factory.
+        :raises ValueError: if the account has already been added
+
+        The client is created by the client factory in the responsible worker,
+        added to its :class:`~aioxmpp.farm.ClientFarm` and started. If the
+        worker reports an error, the account is removed again and the error is
+        re-raised.
+        """
+        if jid in self._accounts:
+            raise ValueError("account is already part of the farm")
+
+        self._accounts[jid] = args
+        try:
+            yield from self._start_account(jid)
+        except ConnectionError:
+            # the account will be moved to the next worker
+            raise
+        except Exception:
+            self._accounts.pop(jid, None)
+            self._worker_for(jid).accounts.discard(jid)
+            raise
+
+    @asyncio.coroutine
+    def remove_account(self, jid):
+        """
+        Stop the client of an account and remove the account.
+
+        :param jid: The account JID.
+        :type jid: :class:`aioxmpp.JID`
+        :raises KeyError: if the account is not part of the farm
+        """
+        del self._accounts[jid]
+        worker = self._worker_for(jid)
+        worker.accounts.discard(jid)
+        yield from self._request(worker, "stop", str(jid))
+
+    @asyncio.coroutine
+    def send(self, jid, stanza):
+        """
+        Send a stanza via the client of an account.
+
+        :param jid: The account JID.
+        :type jid: :class:`aioxmpp.JID`
+        :param stanza: The stanza to send.
+        :type stanza: :class:`~.IQ`, :class:`~.Presence` or :class:`~.Message`
+        :raises KeyError: if the account is not part of the farm
+
+        The stanza is serialized and handed to
+        :meth:`~aioxmpp.stream.StanzaStream.enqueue` of the client in the
+        worker. This coroutine returns when the stanza has been enqueued; it
+        does not wait for a reply.
+        """
+        if jid not in self._accounts:
+            raise KeyError(jid)
+        stanza.autoset_id()
+        buf = io.BytesIO()
+        xml.write_single_xso(stanza, buf)
+        yield from self._request(
+            self._worker_for(jid),
+            "send",
+            str(jid),
+            type(stanza).TAG,
+            buf.getvalue(),
+        )
+
+    @asyncio.coroutine
+    def statistics(self):
+        """
+        Query the statistics of all workers.
+
+        :return: A mapping of worker index to the
+                 :class:`~aioxmpp.farm.FarmStatistics` of its
+                 :class:`~aioxmpp.farm.ClientFarm`.
+        :rtype: :class:`dict`
+        """
+        indices = list(self._workers)
+        results = yield from asyncio.gather(
+            *(self._request(self._workers[index], "statistics")
+              for index in indices),
+            loop=self._loop
+        )
+        return {
+            index: farm.FarmStatistics(*result)
+            for index, result in zip(indices, results)
+        }
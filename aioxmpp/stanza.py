@@ -81,13 +81,67 @@ Exceptions
 """
 import base64
 import enum
-import random
+import os
 
 from . import xso, errors, structs
 
 from .utils import namespaces
 
 RANDOM_ID_BYTES = 120 // 8
+RANDOM_ID_SUFFIX_BYTES = 72 // 8
+RANDOM_ID_BATCH = 512
+
+# multiples of three bytes encode to base64 without padding
+_RANDOM_ID_SUFFIX_CHARS = RANDOM_ID_SUFFIX_BYTES // 3 * 4
+
+
+class _IDGenerator:
+    """
+    Generate stanza IDs from a random prefix and a random suffix.
+
+    The prefix consists of :data:`RANDOM_ID_BYTES` random bytes and is fixed
+    per generator. The suffix consists of :data:`RANDOM_ID_SUFFIX_BYTES`
+    bytes from :func:`os.urandom` for each ID, so that an ID cannot be
+    predicted from the IDs seen before (which would allow a peer to spoof
+    responses to outstanding IQ requests).
+
+    To keep this cheap, the random data for the suffixes is read and encoded
+    in batches of :data:`RANDOM_ID_BATCH` IDs. The trade-off is that an ID
+    only carries :data:`RANDOM_ID_SUFFIX_BYTES` bytes of fresh randomness,
+    compared to :data:`RANDOM_ID_BYTES` bytes for fully random IDs, and that
+    up to a batch of future suffixes is held in memory.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.reseed()
+
+    def reseed(self):
+        """
+        Pick a new random prefix and discard the buffered suffixes.
+        """
+        self._prefix = "x" + base64.b64encode(
+            os.urandom(RANDOM_ID_BYTES)
+        ).decode("ascii")
+        self._suffixes = ""
+        self._pos = 0
+
+    def __call__(self):
+        pos = self._pos
+        if pos >= len(self._suffixes):
+            self._suffixes = base64.b64encode(os.urandom(
+                RANDOM_ID_SUFFIX_BYTES * RANDOM_ID_BATCH
+            )).decode("ascii")
+            pos = 0
+        end = pos + _RANDOM_ID_SUFFIX_CHARS
+        self._pos = end
+        return self._prefix + self._suffixes[pos:end]
+
+
+_next_id = _IDGenerator()
+if hasattr(os, "register_at_fork"):
+    # a forked child must not hand out the IDs of its parent again
+    os.register_at_fork(after_in_child=_next_id.reseed)
 
 STANZA_ERROR_TAGS = (
     "bad-request",
@@ -406,33 +460,36 @@ class StanzaBase(xso.XSO):
         if id_ is not None:
             self.id_ = id_
 
-    def autoset_id(self):
+    def autoset_id(self, *, id_generator=None):
         """
         If the :attr:`id_` already has a non-false (false is also the empty
         string!) value, this method is a no-op.
 
-        Otherwise, the :attr:`id_` attribute is filled with eight bytes of
-        random data, encoded as base64.
+        Otherwise, the :attr:`id_` attribute is filled with a fresh ID, which
+        consists of a random prefix (fifteen bytes of random data, encoded as
+        base64) and a random suffix (nine bytes of random data, encoded as
+        base64).
+
+        `id_generator` is used to create the ID if it is given. Each
+        :class:`~.StanzaStream` passes its own generator, so that the IDs of
+        different streams do not share a prefix. Otherwise, a generator with a
+        per-process prefix is used.
 
         .. note::
 
            This method only works on subclasses of :class:`StanzaBase` which
            define the :attr:`id_` attribute.
 
+        .. versionchanged:: 0.8
+
+           IDs now share a random prefix per generator and only the suffix
+           is drawn for each stanza. The `id_generator` argument was added.
+
         """
-        try:
-            self.id_
-        except AttributeError:
-            pass
-        else:
-            if self.id_:
-                return
-
-        self.id_ = "x"+base64.b64encode(random.getrandbits(
-            RANDOM_ID_BYTES * 8
-        ).to_bytes(
-            RANDOM_ID_BYTES, "little"
-        )).decode("ascii")
+        if getattr(self, "id_", None):
+            return
+
+        self.id_ = (id_generator or _next_id)()
 
     def _make_reply(self, type_):
         obj = type(self)(type_)
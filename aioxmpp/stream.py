@@ -70,6 +70,20 @@ classes:
 
 .. autoclass:: AppFilter
 
+.. autoclass:: FilterStatistics
+
+Handling IQ requests
+====================
+
+.. autoclass:: IQRequestExecutor
+
+.. autoclass:: IQRequestStatistics
+
+Stream management
+=================
+
+.. autoclass:: SMStatistics
+
 Exceptions
 ==========
 
@@ -78,12 +92,18 @@ Exceptions
 """
 
 import asyncio
+import bisect
+import collections
 import contextlib
 import functools
+import heapq
+import itertools
 import logging
+import math
+import time
 import warnings
 
-from datetime import datetime, timedelta
+from datetime import timedelta
 from enum import Enum
 
 from . import (
@@ -101,6 +121,53 @@ from .plugins import xep0199
 from .utils import namespaces
 
 
+class FilterStatistics(collections.namedtuple(
+        "FilterStatistics",
+        [
+            "func",
+            "order",
+            "calls",
+            "skipped",
+            "time",
+        ])):
+    """
+    Profiling information for a function registered at a :class:`Filter`.
+
+    .. attribute:: func
+
+       The filter function.
+
+    .. attribute:: order
+
+       The `order` it was registered with.
+
+    .. attribute:: calls
+
+       Number of calls of the function while :attr:`Filter.profiling` was
+       enabled.
+
+    .. attribute:: skipped
+
+       Number of stanzas for which the function was not called because its
+       `selector` did not match.
+
+    .. attribute:: time
+
+       Cumulative time in seconds spent in the function.
+
+    .. versionadded:: 0.8
+    """
+
+
+def _selector_matches(selector, stanza_obj):
+    try:
+        value = selector.__get__(stanza_obj, type(stanza_obj))
+    except AttributeError:
+        # unset member without default
+        return False
+    return value is not None
+
+
 class Filter:
     """
     A filter chain for stanzas. The idea is to process a stanza through a
@@ -118,6 +185,22 @@ class Filter:
     .. automethod:: filter
 
     .. automethod:: unregister
+
+    Profiling:
+
+    .. attribute:: profiling
+       :annotation: = False
+
+       If true, :meth:`filter` counts the calls of each function and measures
+       the time spent in it. The results are available via
+       :meth:`statistics`. Profiling adds overhead to every call and is thus
+       disabled by default.
+
+       .. versionadded:: 0.8
+
+    .. automethod:: statistics
+
+    .. automethod:: reset_statistics
     """
 
     class Token:
@@ -129,9 +212,62 @@ class Filter:
 
     def __init__(self):
         super().__init__()
-        self._filter_order = []
+        # three parallel lists, sorted by order; the orders are kept
+        # separately for bisect and the tokens for list.index
+        self._orders = []
+        self._tokens = []
+        self._entries = []
+        self._selectors = ()
+        self._chain = ()
+        self._selected_chains = {}
+        self.profiling = False
+
+    def _compile(self):
+        # filters are grouped by their selector: each entry of the chain
+        # refers to its selector by the index into the distinct selectors,
+        # so that each selector is evaluated only once per stanza
+        selectors = []
+        chain = []
+        for func, selector, stats in self._entries:
+            if selector is None:
+                index = None
+            else:
+                try:
+                    index = selectors.index(selector)
+                except ValueError:
+                    index = len(selectors)
+                    selectors.append(selector)
+            chain.append((func, index, stats))
+        self._selectors = tuple(selectors)
+        self._chain = tuple(chain)
+        # maps the selector results to the functions to call
+        self._selected_chains = {}
+
+    def _match_selectors(self, stanza_obj):
+        if not self._selectors:
+            return ()
+        return tuple(
+            _selector_matches(selector, stanza_obj)
+            for selector in self._selectors
+        )
+
+    def _select(self, matches, start):
+        if start == 0:
+            try:
+                return self._selected_chains[matches]
+            except KeyError:
+                pass
 
-    def register(self, func, order):
+        selected = tuple(
+            (position, func)
+            for position, (func, index, _) in enumerate(self._chain)
+            if position >= start and (index is None or matches[index])
+        )
+        if start == 0:
+            self._selected_chains[matches] = selected
+        return selected
+
+    def register(self, func, order, *, selector=None):
         """
         Register a function `func` as filter in the chain. `order` must be a
         value which will be used to order the registered functions relative to
@@ -144,37 +280,116 @@ class Filter:
         same time in the same :class:`Filter` need to be at least partially
         orderable with respect to each other.
 
+        If `selector` is not :data:`None`, it must be an XSO descriptor of the
+        stanza class, for example the :class:`~.xso.Child` descriptor
+        ``aioxmpp.Message.xep0060_event``. `func` is then only called for
+        stanzas for which the descriptor has a value other than :data:`None`,
+        and is skipped without being called otherwise. The functions are
+        grouped by selector, and each distinct selector is evaluated once per
+        stanza, before the first function is called (and again if a function
+        returns a different stanza object). A function which removes the
+        selected child from the stanza in place thus does not prevent the
+        functions after it with the same selector from being called.
+
         Return an opaque token which is needed to unregister a function.
+
+        .. versionchanged:: 0.8
+
+           The `selector` argument was added.
         """
+        if selector is not None:
+            # accept the bound descriptor obtained from the stanza class
+            selector = getattr(selector, "xq_descriptor", selector)
+
         token = self.Token()
-        self._filter_order.append((order, token, func))
-        self._filter_order.sort(key=lambda x: x[0])
+        index = bisect.bisect_right(self._orders, order)
+        self._orders.insert(index, order)
+        self._tokens.insert(index, token)
+        self._entries.insert(index, (func, selector, [0, 0, 0.0]))
+        self._compile()
         return token
 
+    def _filter_profiled(self, stanza_obj):
+        clock = time.perf_counter
+        matches = self._match_selectors(stanza_obj)
+        for func, index, stats in self._chain:
+            if index is not None and not matches[index]:
+                stats[1] += 1
+                continue
+            start = clock()
+            result = func(stanza_obj)
+            stats[2] += clock() - start
+            stats[0] += 1
+            if result is None:
+                return None
+            if result is not stanza_obj:
+                matches = self._match_selectors(result)
+                stanza_obj = result
+        return stanza_obj
+
     def filter(self, stanza_obj):
         """
         Pass the given `stanza_obj` through the filter chain and return the
         result of the chain. See :class:`Filter` for details on how the value
         is passed through the registered functions.
         """
-        for _, _, func in self._filter_order:
-            stanza_obj = func(stanza_obj)
-            if stanza_obj is None:
-                return None
-        return stanza_obj
+        if self.profiling:
+            return self._filter_profiled(stanza_obj)
+
+        start = 0
+        while True:
+            selected = self._select(self._match_selectors(stanza_obj), start)
+            for position, func in selected:
+                result = func(stanza_obj)
+                if result is None:
+                    return None
+                if result is not stanza_obj:
+                    # the selectors have to be evaluated for the new object
+                    stanza_obj = result
+                    start = position + 1
+                    break
+            else:
+                return stanza_obj
 
     def unregister(self, token_to_remove):
         """
         Unregister a function from the filter chain using the token returned by
         :meth:`register`.
         """
-        for i, (_, token, _) in enumerate(self._filter_order):
-            if token == token_to_remove:
-                break
-        else:
+        try:
+            i = self._tokens.index(token_to_remove)
+        except ValueError:
             raise ValueError("unregistered token: {!r}".format(
-                token_to_remove))
-        del self._filter_order[i]
+                token_to_remove)) from None
+        del self._orders[i]
+        del self._tokens[i]
+        del self._entries[i]
+        self._compile()
+
+    def statistics(self):
+        """
+        Return the profiling information of the registered functions.
+
+        :rtype: :class:`list` of :class:`FilterStatistics`
+
+        The list is in the order in which the functions are called. See
+        :attr:`profiling`.
+
+        .. versionadded:: 0.8
+        """
+        return [
+            FilterStatistics(func, order, *stats)
+            for order, (func, _, stats) in zip(self._orders, self._entries)
+        ]
+
+    def reset_statistics(self):
+        """
+        Reset the profiling information of all registered functions to zero.
+
+        .. versionadded:: 0.8
+        """
+        for _, _, stats in self._entries:
+            stats[:] = [0, 0, 0.0]
 
 
 class AppFilter(Filter):
@@ -185,12 +400,12 @@ class AppFilter(Filter):
     .. automethod:: register
     """
 
-    def register(self, func, order=0):
+    def register(self, func, order=0, *, selector=None):
         """
         This method works exactly like :meth:`Filter.register`, but `order` has
         a default value of ``0``.
         """
-        return super().register(func, order)
+        return super().register(func, order, selector=selector)
 
 
 class PingEventType(Enum):
@@ -283,6 +498,186 @@ class StanzaErrorAwareListener:
         return self._forward_to.is_valid()
 
 
+class _TimeoutWheel:
+    """
+    Hashed timing wheel which expires items after a timeout.
+
+    :param on_expire: Called with a list of the items which expired in one
+                      tick.
+    :param resolution: Length of a tick in seconds; timeouts are rounded up
+                       to full ticks.
+    :param slots: Number of slots of the wheel.
+    :param loop: The event loop to use.
+
+    Items are put into the slot of the tick at which they expire; items which
+    expire more than one revolution ahead share the slot and are skipped until
+    their tick has come. A single timer handle drives the wheel while it holds
+    items, regardless of their number. Items must be hashable and must not be
+    scheduled twice.
+    """
+
+    def __init__(self, on_expire, *, resolution=0.05, slots=256, loop=None):
+        super().__init__()
+        self._on_expire = on_expire
+        self._resolution = resolution
+        self._loop = loop or asyncio.get_event_loop()
+        self._slots = [dict() for i in range(slots)]
+        self._ticks = {}
+        self._tick = None
+        self._handle = None
+
+    def __len__(self):
+        return len(self._ticks)
+
+    def __contains__(self, item):
+        return item in self._ticks
+
+    def _current_tick(self):
+        return math.floor(self._loop.time() / self._resolution)
+
+    def _arm(self):
+        self._handle = self._loop.call_at(
+            (self._tick + 1) * self._resolution,
+            self._advance,
+        )
+
+    def schedule(self, item, timeout):
+        """
+        Expire `item` after `timeout` seconds.
+        """
+        if self._handle is None:
+            self._tick = self._current_tick()
+            self._arm()
+        tick = max(
+            math.ceil((self._loop.time() + timeout) / self._resolution),
+            self._tick + 1,
+        )
+        self._ticks[item] = tick
+        self._slots[tick % len(self._slots)][item] = tick
+
+    def cancel(self, item):
+        """
+        Remove `item` from the wheel. Unknown items are ignored.
+        """
+        try:
+            tick = self._ticks.pop(item)
+        except KeyError:
+            return
+        del self._slots[tick % len(self._slots)][item]
+        if not self._ticks and self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+
+    def clear(self):
+        """
+        Remove all items without expiring them.
+        """
+        for slot in self._slots:
+            slot.clear()
+        self._ticks.clear()
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+
+    def _advance(self):
+        self._handle = None
+        now = self._current_tick()
+        # if the loop lagged behind by more than a revolution, visiting each
+        # slot once is enough
+        first = max(self._tick + 1, now - len(self._slots) + 1)
+        expired = []
+        for tick in range(first, now + 1):
+            slot = self._slots[tick % len(self._slots)]
+            due = [item for item, item_tick in slot.items()
+                   if item_tick <= now]
+            for item in due:
+                del slot[item]
+                del self._ticks[item]
+            expired.extend(due)
+        self._tick = now
+
+        if self._ticks:
+            self._arm()
+
+        if expired:
+            self._on_expire(expired)
+
+
+class _DispatchIndex:
+    """
+    Map ``(type_, from_)`` pairs to callbacks.
+
+    The pairs are grouped by the bare part of `from_`, so that finding the
+    callback for a stanza takes one probe for the sender and a few probes in
+    small dicts, without constructing any :class:`~aioxmpp.JID` objects.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._by_bare = {}
+        self._wildcard = {}
+
+    def __contains__(self, key):
+        type_, from_ = key
+        if from_ is None:
+            return type_ in self._wildcard
+        entries = self._by_bare.get((from_.localpart, from_.domain), {})
+        return (type_, from_.resource) in entries
+
+    def add(self, type_, from_, cb):
+        if from_ is None:
+            self._wildcard[type_] = cb
+        else:
+            entries = self._by_bare.setdefault(
+                (from_.localpart, from_.domain),
+                {}
+            )
+            entries[type_, from_.resource] = cb
+
+    def remove(self, type_, from_):
+        if from_ is None:
+            del self._wildcard[type_]
+            return
+
+        bare = from_.localpart, from_.domain
+        try:
+            entries = self._by_bare[bare]
+            del entries[type_, from_.resource]
+        except KeyError:
+            raise KeyError((type_, from_)) from None
+        if not entries:
+            del self._by_bare[bare]
+
+    def lookup(self, type_, from_, *, wildcards=True):
+        """
+        Return the callback for a stanza with the given `type_` and `from_`,
+        or :data:`None`.
+
+        With `wildcards`, the order of
+        :meth:`StanzaStream.register_message_callback` applies. Otherwise, only
+        the exact `from_` and the `from_` wildcard are tried.
+        """
+        if from_ is not None:
+            entries = self._by_bare.get((from_.localpart, from_.domain))
+            if entries is not None:
+                resource = from_.resource
+                cb = entries.get((type_, resource))
+                if cb is not None:
+                    return cb
+                if wildcards:
+                    for key in ((type_, None),
+                                (None, resource),
+                                (None, None)):
+                        cb = entries.get(key)
+                        if cb is not None:
+                            return cb
+
+        cb = self._wildcard.get(type_)
+        if cb is None and wildcards:
+            cb = self._wildcard.get(None)
+        return cb
+
+
 class StanzaToken:
     """
     A token to follow the processing of a `stanza`.
@@ -395,6 +790,340 @@ class StanzaToken:
     __iter__ = __await__
 
 
+class SMStatistics(collections.namedtuple(
+        "SMStatistics",
+        [
+            "unacked",
+            "acked",
+            "resent",
+            "ack_latency",
+            "max_ack_latency",
+        ])):
+    """
+    Counters of the stream management session of a :class:`StanzaStream`.
+
+    .. attribute:: unacked
+
+       Number of stanzas which have been sent, but not acked yet.
+
+    .. attribute:: acked
+
+       Number of stanzas which have been acked.
+
+    .. attribute:: resent
+
+       Number of stanzas which have been sent again after resumption.
+
+    .. attribute:: ack_latency
+
+       Total time in seconds between sending the acked stanzas and receiving
+       the acks.
+
+    .. attribute:: max_ack_latency
+
+       Longest time in seconds between sending a stanza and receiving the ack.
+
+    .. versionadded:: 0.8
+    """
+
+
+class IQRequestStatistics(collections.namedtuple(
+        "IQRequestStatistics",
+        [
+            "submitted",
+            "rejected",
+            "completed",
+            "queue_time",
+            "max_queue_time",
+            "run_time",
+            "max_run_time",
+        ])):
+    """
+    Counters of an :class:`IQRequestExecutor`.
+
+    .. attribute:: submitted
+
+       Number of requests passed to :meth:`IQRequestExecutor.submit`.
+
+    .. attribute:: rejected
+
+       Number of requests which were rejected because the queue was full.
+
+    .. attribute:: completed
+
+       Number of handlers which have finished (successfully or not).
+
+    .. attribute:: queue_time
+
+       Total time in seconds requests spent waiting in the queue.
+
+    .. attribute:: max_queue_time
+
+       Longest time in seconds a request spent in the queue.
+
+    .. attribute:: run_time
+
+       Total time in seconds between the start and the end of the handlers.
+
+    .. attribute:: max_run_time
+
+       Longest time in seconds a handler took.
+
+    .. versionadded:: 0.8
+    """
+
+
+class _IQClassPolicy:
+    __slots__ = ("priority", "quota", "running", "queue", "scheduled")
+
+    def __init__(self, priority=0, quota=None):
+        self.priority = priority
+        self.quota = quota
+        self.running = 0
+        self.queue = collections.deque()
+        self.scheduled = False
+
+
+class IQRequestExecutor:
+    """
+    Run the coroutines handling inbound IQ requests with bounded concurrency.
+
+    :param max_in_flight: Maximum number of handlers running at the same time,
+                          or :data:`None` for no limit.
+    :type max_in_flight: :class:`int` or :data:`None`
+    :param max_queued: Maximum number of requests waiting for a free slot, or
+                       :data:`None` for no limit.
+    :type max_queued: :class:`int` or :data:`None`
+    :param loop: The event loop to use.
+    :type loop: :class:`asyncio.BaseEventLoop` or :data:`None`
+
+    Requests which cannot be started right away (because :attr:`max_in_flight`
+    handlers are running, or because the quota of their payload class is
+    exhausted) are queued. Requests with a higher priority are started first;
+    requests with the same priority are started in the order they arrived. If
+    the queue already holds :attr:`max_queued` requests, the request is
+    rejected and :class:`StanzaStream` replies with a ``resource-constraint``
+    error. With `max_queued` set to ``0``, requests are never queued.
+
+    The defaults impose no limits, so that every request is started right
+    away.
+
+    .. attribute:: max_in_flight
+
+       See the argument of the same name. Changes take effect the next time a
+       request is submitted or a handler finishes.
+
+    .. attribute:: max_queued
+
+       See the argument of the same name.
+
+    .. automethod:: set_class_policy
+
+    .. automethod:: submit
+
+    .. automethod:: cancel_all
+
+    .. autoattribute:: in_flight
+
+    .. autoattribute:: queue_depth
+
+    .. autoattribute:: statistics
+
+    .. automethod:: reset_statistics
+    """
+
+    def __init__(self, *, max_in_flight=None, max_queued=None, loop=None):
+        super().__init__()
+        self._loop = loop or asyncio.get_event_loop()
+        self.max_in_flight = max_in_flight
+        self.max_queued = max_queued
+        self._policies = {}
+        self._default_policy = _IQClassPolicy()
+        self._tasks = set()
+        # heap of (-priority, seq of queue head, policy) for the classes
+        # which have queued requests and are not blocked by their quota
+        self._ready = []
+        self._nqueued = 0
+        self._seq = itertools.count()
+        self.reset_statistics()
+
+    def set_class_policy(self, payload_cls, *, priority=0, quota=None):
+        """
+        Configure the handling of requests with a specific payload class.
+
+        :param payload_cls: The payload class of the IQ requests.
+        :param priority: Queued requests with higher priority are started
+                         first.
+        :type priority: :class:`int`
+        :param quota: Maximum number of handlers for this payload class which
+                      may run at the same time, or :data:`None` for no
+                      separate limit.
+        :type quota: :class:`int` or :data:`None`
+        """
+        try:
+            policy = self._policies[payload_cls]
+        except KeyError:
+            policy = _IQClassPolicy()
+            self._policies[payload_cls] = policy
+        policy.priority = priority
+        policy.quota = quota
+        if policy.scheduled:
+            # the heap key of the class may be stale now
+            self._ready = [
+                entry for entry in self._ready
+                if entry[2] is not policy
+            ]
+            heapq.heapify(self._ready)
+            policy.scheduled = False
+        self._schedule(policy)
+
+    @property
+    def in_flight(self):
+        """
+        Number of handlers currently running.
+        """
+        return len(self._tasks)
+
+    @property
+    def queue_depth(self):
+        """
+        Number of requests waiting to be started.
+        """
+        return self._nqueued
+
+    @property
+    def statistics(self):
+        """
+        An :class:`IQRequestStatistics` snapshot of the counters.
+        """
+        return IQRequestStatistics(*self._stats)
+
+    def reset_statistics(self):
+        """
+        Reset all counters of :attr:`statistics` to zero.
+        """
+        self._stats = [0, 0, 0, 0.0, 0.0, 0.0, 0.0]
+
+    def _policy(self, payload_cls):
+        return self._policies.get(payload_cls, self._default_policy)
+
+    def _can_start(self, policy):
+        if (self.max_in_flight is not None and
+                len(self._tasks) >= self.max_in_flight):
+            return False
+        return policy.quota is None or policy.running < policy.quota
+
+    def _schedule(self, policy):
+        if policy.scheduled or not policy.queue:
+            return
+        if policy.quota is not None and policy.running >= policy.quota:
+            # re-scheduled from _task_done once a handler of the class
+            # finishes
+            return
+        heapq.heappush(self._ready, (
+            -policy.priority,
+            policy.queue[0][0],
+            policy,
+        ))
+        policy.scheduled = True
+
+    def _start(self, policy, request, coro_fun, done_cb):
+        policy.running += 1
+        task = asyncio.async(coro_fun(request), loop=self._loop)
+        self._tasks.add(task)
+        task.add_done_callback(functools.partial(
+            self._task_done,
+            policy,
+            self._loop.time(),
+            request,
+            done_cb,
+        ))
+        return task
+
+    def _task_done(self, policy, started_at, request, done_cb, task):
+        self._tasks.discard(task)
+        policy.running -= 1
+        self._schedule(policy)
+
+        run_time = self._loop.time() - started_at
+        stats = self._stats
+        stats[2] += 1
+        stats[5] += run_time
+        stats[6] = max(stats[6], run_time)
+
+        try:
+            done_cb(request, task)
+        finally:
+            self._start_queued()
+
+    def _start_queued(self):
+        while self._ready:
+            if (self.max_in_flight is not None and
+                    len(self._tasks) >= self.max_in_flight):
+                break
+            _, _, policy = heapq.heappop(self._ready)
+            policy.scheduled = False
+            _, queued_at, request, coro_fun, done_cb = policy.queue.popleft()
+            self._nqueued -= 1
+            queue_time = self._loop.time() - queued_at
+            self._stats[3] += queue_time
+            self._stats[4] = max(self._stats[4], queue_time)
+            self._start(policy, request, coro_fun, done_cb)
+            self._schedule(policy)
+
+    def submit(self, request, coro_fun, done_cb):
+        """
+        Submit an IQ request for handling.
+
+        :param request: The IQ request.
+        :type request: :class:`~.IQ`
+        :param coro_fun: Coroutine function to handle the request.
+        :param done_cb: Function called with `request` and the task when
+                        the handler has finished.
+        :return: true if the request was started or queued, false if it was
+                 rejected.
+        :rtype: :class:`bool`
+        """
+        self._stats[0] += 1
+        policy = self._policy(type(request.payload))
+
+        if not self._nqueued and self._can_start(policy):
+            self._start(policy, request, coro_fun, done_cb)
+            return True
+
+        if self.max_queued is not None and self._nqueued >= self.max_queued:
+            self._stats[1] += 1
+            return False
+
+        policy.queue.append((
+            next(self._seq),
+            self._loop.time(),
+            request,
+            coro_fun,
+            done_cb,
+        ))
+        self._nqueued += 1
+        self._schedule(policy)
+        self._start_queued()
+        return True
+
+    def cancel_all(self):
+        """
+        Drop all queued requests and cancel all running handlers.
+
+        The `done_cb` is still called for the cancelled handlers, but not for
+        the dropped requests.
+        """
+        for policy in itertools.chain((self._default_policy,),
+                                      self._policies.values()):
+            policy.queue.clear()
+            policy.scheduled = False
+        self._ready.clear()
+        self._nqueued = 0
+        for task in list(self._tasks):
+            task.cancel()
+
+
 class StanzaStream:
     """
     A stanza stream. This is the next layer of abstraction above the XMPP XML
@@ -454,6 +1183,79 @@ class StanzaStream:
     response fails to arrive within that interval, the stream fails (see
     :attr:`on_failure`).
 
+    The stanza stream also applies flow control to outgoing stanzas. While the
+    transport of the XML stream has paused writing (see
+    :meth:`aioxmpp.protocol.XMLStream.pause_writing`), stanzas are kept in the
+    active queue instead of being serialised into the transport buffer. The
+    size of the active queue can be limited:
+
+    .. attribute:: max_queue_size = None
+
+       The maximum number of stanzas in the active queue, or :data:`None` for
+       no limit.
+
+       If the limit is reached, :meth:`enqueue` raises
+       :class:`asyncio.QueueFull`, while :meth:`enqueue_throttled` and
+       :meth:`send` wait until there is room in the queue. Replies which the
+       stream sends on its own, such as responses to IQ requests, are not
+       subject to the limit.
+
+       .. versionadded:: 0.8
+
+    Incoming stanzas are processed in batches:
+
+    .. attribute:: max_incoming_batch = 64
+
+       The maximum number of incoming stanzas which are processed in one
+       iteration of the broker task before outgoing stanzas and ping events
+       are handled again. Larger values reduce the per-stanza overhead when
+       many stanzas arrive at once (for example, the presence flood when
+       joining a large MUC), smaller values reduce the latency of outgoing
+       stanzas in that situation.
+
+       .. versionadded:: 0.8
+
+    With stream management enabled, an ack request is sent after each batch of
+    outgoing stanzas by default. Busy senders can request acks less often:
+
+    .. attribute:: sm_request_every = None
+
+       If not :data:`None`, an ack request is sent after a batch only once at
+       least this many stanzas have been sent since the last ack request.
+
+    .. attribute:: sm_request_interval = None
+
+       If not :data:`None`, a :class:`~datetime.timedelta`; an ack request is
+       sent after a batch only if stanzas have been sent since the last ack
+       request and at least this much time has passed since then.
+
+    .. attribute:: sm_max_unacked = None
+
+       If not :data:`None`, an ack request is sent after a batch whenever at
+       least this many stanzas are unacked, regardless of the other two
+       settings.
+
+    If neither :attr:`sm_request_every` nor :attr:`sm_request_interval` is
+    set, every batch is followed by an ack request. Otherwise, a batch is
+    followed by an ack request if any of the configured conditions holds.
+    Independent of these settings, the ping logic described above still
+    sends an ack request when the opportunistic interval ends, so unacked
+    stanzas do not stay unrequested for longer than that.
+
+    .. versionadded:: 0.8
+
+    Coroutines handling incoming IQ requests are run by an executor which can
+    bound their concurrency:
+
+    .. attribute:: iq_request_executor
+
+       The :class:`IQRequestExecutor` which runs the handlers registered with
+       :meth:`register_iq_request_coro`. By default, it imposes no limits.
+       Requests it rejects are answered with a ``resource-constraint`` error
+       of type ``wait``.
+
+       .. versionadded:: 0.8
+
     Starting/Stopping the stream:
 
     .. automethod:: start
@@ -472,8 +1274,12 @@ class StanzaStream:
 
     .. automethod:: send
 
+    .. automethod:: send_many
+
     .. automethod:: enqueue
 
+    .. automethod:: enqueue_throttled
+
     .. method:: enqueue_stanza
 
        Alias of :meth:`enqueue`.
@@ -652,6 +1458,8 @@ class StanzaStream:
 
     .. autoattribute:: sm_resumable
 
+    .. autoattribute:: sm_statistics
+
     Miscellaneous:
 
     .. autoattribute:: local_jid
@@ -726,24 +1534,36 @@ class StanzaStream:
         self._loop = loop or asyncio.get_event_loop()
         self._logger = base_logger.getChild("StanzaStream")
         self._task = None
+        self._stop_requested = False
 
         self._local_jid = local_jid
+        # a prefix of our own, so that the IDs do not link streams of the
+        # same process to each other
+        self._id_generator = stanza._IDGenerator()
 
         self._active_queue = custom_queue.AsyncDeque(loop=self._loop)
         self._incoming_queue = custom_queue.AsyncDeque(loop=self._loop)
 
         self._iq_response_map = callbacks.TagDispatcher()
+        self._iq_response_timeouts = _TimeoutWheel(
+            self._expire_iq_responses,
+            loop=self._loop,
+        )
         self._iq_request_map = {}
 
-        # list of running IQ request coroutines: used to cancel them when the
-        # stream is destroyed
-        self._iq_request_tasks = []
-        self._message_map = {}
-        self._presence_map = {}
+        # runs the IQ request coroutines and cancels them when the stream is
+        # destroyed
+        self.iq_request_executor = IQRequestExecutor(loop=self._loop)
+
+        self._message_map = _DispatchIndex()
+        self._presence_map = _DispatchIndex()
 
         self._ping_send_opportunistic = False
         self._next_ping_event_at = None
         self._next_ping_event_type = None
+        self._ping_timer = None
+        self._ping_timer_at = None
+        self._broker_wakeup = asyncio.Event(loop=self._loop)
 
         self._xmlstream_exception = None
 
@@ -753,6 +1573,15 @@ class StanzaStream:
         self.ping_interval = timedelta(seconds=15)
         self.ping_opportunistic_interval = timedelta(seconds=15)
 
+        self.max_queue_size = None
+        self.max_incoming_batch = 64
+
+        self.sm_request_every = None
+        self.sm_request_interval = None
+        self.sm_max_unacked = None
+        self._queue_space = asyncio.Event(loop=self._loop)
+        self._queue_space.set()
+
         self._sm_enabled = False
 
         self._broker_lock = asyncio.Lock(loop=loop)
@@ -833,18 +1662,27 @@ class StanzaStream:
         """
         self._logger.debug("destroying stream state (exc=%r)", exc)
         self._iq_response_map.close_all(exc)
-        for task in self._iq_request_tasks:
-            # we don’t need to remove, that’s handled by their
-            # add_done_callback
-            task.cancel()
+        self._iq_response_timeouts.clear()
+        self.iq_request_executor.cancel_all()
         while not self._active_queue.empty():
             token = self._active_queue.get_nowait()
             token._set_state(StanzaState.DISCONNECTED)
+        self._notify_queue_space()
 
         if self._established:
             self.on_stream_destroyed(exc)
             self._established = False
 
+    def _expire_iq_responses(self, futures):
+        """
+        Fail the response `futures` of IQ requests sent with :meth:`send`
+        whose timeout has elapsed.
+        """
+        self._logger.debug("%d IQ response(s) timed out", len(futures))
+        for fut in futures:
+            if not fut.done():
+                fut.set_exception(TimeoutError())
+
     def _iq_request_coro_done(self, request, task):
         """
         Called when an IQ request handler coroutine returns. `request` holds
@@ -853,7 +1691,6 @@ class StanzaStream:
 
         Compose a response and send that response.
         """
-        self._iq_request_tasks.remove(task)
         try:
             payload = task.result()
         except errors.XMPPError as err:
@@ -869,7 +1706,7 @@ class StanzaStream:
         else:
             response = request.make_reply(type_=structs.IQType.RESULT)
             response.payload = payload
-        self.enqueue(response)
+        self._enqueue(response)
 
     def _process_incoming_iq(self, stanza_obj):
         """
@@ -910,16 +1747,28 @@ class StanzaStream:
                     condition=(namespaces.stanzas,
                                "feature-not-implemented"),
                 )
-                self.enqueue(response)
+                self._enqueue(response)
+                return
+
+            if not self.iq_request_executor.submit(
+                    stanza_obj,
+                    coro,
+                    self._iq_request_coro_done):
+                self._logger.warning(
+                    "IQ request rejected, too many requests in flight: "
+                    "from=%r, payload=%r",
+                    stanza_obj.from_,
+                    stanza_obj.payload
+                )
+                response = stanza_obj.make_reply(type_=structs.IQType.ERROR)
+                response.error = stanza.Error(
+                    condition=(namespaces.stanzas, "resource-constraint"),
+                    type_=structs.ErrorType.WAIT,
+                )
+                self._enqueue(response)
                 return
 
-            task = asyncio.async(coro(stanza_obj))
-            task.add_done_callback(
-                functools.partial(
-                    self._iq_request_coro_done,
-                    stanza_obj))
-            self._iq_request_tasks.append(task)
-            self._logger.debug("started task to handle request: %r", task)
+            self._logger.debug("submitted request to handler: %r", coro)
 
     def _process_incoming_message(self, stanza_obj):
         """
@@ -939,22 +1788,10 @@ class StanzaStream:
                                "filter chain")
             return
 
-        keys = [(stanza_obj.type_, stanza_obj.from_),
-                (stanza_obj.type_, stanza_obj.from_.bare()),
-                (None, stanza_obj.from_),
-                (None, stanza_obj.from_.bare()),
-                (stanza_obj.type_, None),
-                (None, None)]
-
-        for key in keys:
-            try:
-                cb = self._message_map[key]
-            except KeyError:
-                continue
-            self._logger.debug("dispatching message using key %r to %r",
-                               key, cb)
+        cb = self._message_map.lookup(stanza_obj.type_, stanza_obj.from_)
+        if cb is not None:
+            self._logger.debug("dispatching message to %r", cb)
             self._loop.call_soon(cb, stanza_obj)
-            break
         else:
             self._logger.warning(
                 "unsolicited message dropped: from=%r, type=%r, id=%r",
@@ -981,16 +1818,11 @@ class StanzaStream:
                                "filter chain")
             return
 
-        keys = [(stanza_obj.type_, stanza_obj.from_),
-                (stanza_obj.type_, None)]
-        for key in keys:
-            try:
-                cb = self._presence_map[key]
-            except KeyError:
-                continue
-            self._logger.debug("dispatching presence using key: %r", key)
+        cb = self._presence_map.lookup(stanza_obj.type_, stanza_obj.from_,
+                                       wildcards=False)
+        if cb is not None:
+            self._logger.debug("dispatching presence to %r", cb)
             self._loop.call_soon(cb, stanza_obj)
-            break
         else:
             self._logger.warning(
                 "unhandled presence dropped: from=%r, type=%r, id=%r",
@@ -1027,13 +1859,13 @@ class StanzaStream:
                 namespaces.stanzas,
                 "feature-not-implemented")
             ))
-            self.enqueue(reply)
+            self._enqueue(reply)
         elif isinstance(exc, stanza.PayloadParsingError):
             reply = stanza_obj.make_error(error=stanza.Error(condition=(
                 namespaces.stanzas,
                 "bad-request")
             ))
-            self.enqueue(reply)
+            self._enqueue(reply)
 
     def _process_incoming(self, xmlstream, queue_entry):
         """
@@ -1055,8 +1887,10 @@ class StanzaStream:
             if self._next_ping_event_type == PingEventType.TIMEOUT:
                 self._logger.debug("resetting ping timeout")
                 self._next_ping_event_type = PingEventType.SEND_OPPORTUNISTIC
-                self._next_ping_event_at = (datetime.utcnow() +
-                                            self.ping_interval)
+                self._next_ping_event_at = (
+                    self._loop.time() +
+                    self.ping_interval.total_seconds()
+                )
             return
         elif isinstance(stanza_obj, nonza.SMRequest):
             self._logger.debug("received SM request: %r", stanza_obj)
@@ -1090,6 +1924,22 @@ class StanzaStream:
         elif isinstance(stanza_obj, stanza.Presence):
             self._process_incoming_presence(stanza_obj)
 
+    def _process_incoming_batch(self, xmlstream, limit):
+        """
+        Process up to `limit` further stanzas which are already waiting in the
+        incoming queue, without going through the event loop for each of them.
+        """
+        for _ in range(limit):
+            if self._stop_requested:
+                # stop() guarantees that nothing is sent over the xmlstream
+                # anymore; the remaining stanzas stay in the queue
+                break
+            try:
+                queue_entry = self._incoming_queue.get_nowait()
+            except asyncio.QueueEmpty:
+                break
+            self._process_incoming(xmlstream, queue_entry)
+
     def flush_incoming(self):
         """
         Flush all incoming queues to the respective processing methods. The
@@ -1151,6 +2001,8 @@ class StanzaStream:
         if self._sm_enabled:
             token._set_state(StanzaState.SENT)
             self._sm_unacked_list.append(token)
+            self._sm_sent_at.append(self._loop.time())
+            self._sm_sent_since_request += 1
         else:
             token._set_state(StanzaState.SENT_WITHOUT_SM)
 
@@ -1163,15 +2015,57 @@ class StanzaStream:
         """
 
         self._send_stanza(xmlstream, token)
-        # try to send a bulk
-        while True:
+        # try to send a bulk, but stop as soon as the transport asks us to
+        while not xmlstream.writing_paused:
             try:
                 token = self._active_queue.get_nowait()
             except asyncio.QueueEmpty:
                 break
             self._send_stanza(xmlstream, token)
 
-        self._send_ping(xmlstream)
+        self._notify_queue_space()
+        if not self._sm_enabled or self._sm_request_due():
+            self._send_ping(xmlstream)
+
+    def _sm_request_due(self):
+        """
+        Return whether an SM ack request should be sent after a batch of
+        outgoing stanzas, according to :attr:`sm_request_every`,
+        :attr:`sm_request_interval` and :attr:`sm_max_unacked`.
+        """
+        if     (self.sm_request_every is None and
+                self.sm_request_interval is None):
+            return True
+
+        if     (self.sm_max_unacked is not None and
+                len(self._sm_unacked_list) >= self.sm_max_unacked):
+            return True
+
+        sent = self._sm_sent_since_request
+        if     (self.sm_request_every is not None and
+                sent >= self.sm_request_every):
+            return True
+
+        if     (self.sm_request_interval is not None and sent and
+                self._loop.time() - self._sm_last_request_at >=
+                self.sm_request_interval.total_seconds()):
+            return True
+
+        return False
+
+    def _notify_queue_space(self):
+        if     (self.max_queue_size is None or
+                len(self._active_queue) < self.max_queue_size):
+            self._queue_space.set()
+
+    @asyncio.coroutine
+    def _wait_for_queue_space(self):
+        while  (self.max_queue_size is not None and
+                len(self._active_queue) >= self.max_queue_size):
+            if self._closed:
+                raise self._xmlstream_exception
+            self._queue_space.clear()
+            yield from self._queue_space.wait()
 
     def _recv_pong(self, stanza):
         """
@@ -1183,7 +2077,8 @@ class StanzaStream:
         if self._next_ping_event_type != PingEventType.TIMEOUT:
             return
         self._next_ping_event_type = PingEventType.SEND_OPPORTUNISTIC
-        self._next_ping_event_at = datetime.utcnow() + self.ping_interval
+        self._next_ping_event_at = (self._loop.time() +
+                                    self.ping_interval.total_seconds())
 
     def _send_ping(self, xmlstream):
         """
@@ -1203,10 +2098,12 @@ class StanzaStream:
         if self._sm_enabled:
             self._logger.debug("sending SM req")
             xmlstream.send_xso(nonza.SMRequest())
+            self._sm_sent_since_request = 0
+            self._sm_last_request_at = self._loop.time()
         else:
             request = stanza.IQ(type_=structs.IQType.GET)
             request.payload = xep0199.Ping()
-            request.autoset_id()
+            request.autoset_id(id_generator=self._id_generator)
             self.register_iq_response_callback(
                 None,
                 request.id_,
@@ -1218,7 +2115,8 @@ class StanzaStream:
 
         if self._next_ping_event_type != PingEventType.TIMEOUT:
             self._logger.debug("configuring ping timeout")
-            self._next_ping_event_at = datetime.utcnow() + self.ping_interval
+            self._next_ping_event_at = (self._loop.time() +
+                                        self.ping_interval.total_seconds())
             self._next_ping_event_type = PingEventType.TIMEOUT
 
     def _process_ping_event(self, xmlstream):
@@ -1227,7 +2125,8 @@ class StanzaStream:
         """
         if self._next_ping_event_type == PingEventType.SEND_OPPORTUNISTIC:
             self._logger.debug("ping: opportunistic interval started")
-            self._next_ping_event_at += self.ping_opportunistic_interval
+            self._next_ping_event_at += \
+                self.ping_opportunistic_interval.total_seconds()
             self._next_ping_event_type = PingEventType.SEND_NOW
             # ping send opportunistic is always true for sm
             if not self._sm_enabled:
@@ -1498,7 +2397,7 @@ class StanzaStream:
                 "only one listener is allowed per (type_, from_) pair"
             )
 
-        self._message_map[key] = cb
+        self._message_map.add(type_, from_, cb)
         self._logger.debug(
             "message callback registered: type=%r, from=%r",
             type_, from_)
@@ -1538,7 +2437,7 @@ class StanzaStream:
         """
         if type_ is not None:
             type_ = self._coerce_enum(type_, structs.MessageType)
-        del self._message_map[type_, from_]
+        self._message_map.remove(type_, from_)
         self._logger.debug(
             "message callback unregistered: type=%r, from=%r",
             type_, from_)
@@ -1585,7 +2484,7 @@ class StanzaStream:
             raise ValueError(
                 "only one listener is allowed per (type_, from_) pair"
             )
-        self._presence_map[key] = cb
+        self._presence_map.add(type_, from_, cb)
         self._logger.debug(
             "presence callback registered: type=%r, from=%r",
             type_, from_)
@@ -1626,7 +2525,7 @@ class StanzaStream:
 
         """
         type_ = self._coerce_enum(type_, structs.PresenceType)
-        del self._presence_map[type_, from_]
+        self._presence_map.remove(type_, from_)
         self._logger.debug(
             "presence callback unregistered: type=%r, from=%r",
             type_, from_)
@@ -1670,11 +2569,13 @@ class StanzaStream:
             self.on_stream_established()
             self._established = True
 
+        self._stop_requested = False
         self._task = asyncio.async(self._run(xmlstream), loop=self._loop)
         self._task.add_done_callback(self._done_handler)
         self._logger.debug("broker task started as %r", self._task)
 
-        self._next_ping_event_at = datetime.utcnow() + self.ping_interval
+        self._next_ping_event_at = (self._loop.time() +
+                                    self.ping_interval.total_seconds())
         self._next_ping_event_type = PingEventType.SEND_OPPORTUNISTIC
         self._ping_send_opportunistic = self._sm_enabled
 
@@ -1709,6 +2610,7 @@ class StanzaStream:
         if not self.running:
             return
         self._logger.debug("sending stop signal to task")
+        self._stop_requested = True
         self._task.cancel()
 
     @asyncio.coroutine
@@ -1781,57 +2683,73 @@ class StanzaStream:
     @asyncio.coroutine
     def _run(self, xmlstream):
         self._xmlstream = xmlstream
-        active_fut = asyncio.async(self._active_queue.get(),
-                                   loop=self._loop)
-        incoming_fut = asyncio.async(self._incoming_queue.get(),
-                                     loop=self._loop)
+        drain_fut = None
+        # process anything which has been queued before we were started
+        self._broker_wakeup.set()
+
+        def wakeup(_=None):
+            self._broker_wakeup.set()
 
         try:
             while True:
-                timeout = self._next_ping_event_at - datetime.utcnow()
-                if timeout.total_seconds() < 0:
-                    timeout = timedelta()
-
-                done, pending = yield from asyncio.wait(
-                    [
-                        active_fut,
-                        incoming_fut,
-                    ],
-                    return_when=asyncio.FIRST_COMPLETED,
-                    timeout=timeout.total_seconds())
+                yield from self._broker_wakeup.wait()
+                self._broker_wakeup.clear()
 
                 with (yield from self._broker_lock):
-                    if active_fut in done:
-                        self._process_outgoing(xmlstream, active_fut.result())
-                        active_fut = asyncio.async(
-                            self._active_queue.get(),
-                            loop=self._loop)
-
-                    if incoming_fut in done:
-                        self._process_incoming(xmlstream,
-                                               incoming_fut.result())
-                        incoming_fut = asyncio.async(
-                            self._incoming_queue.get(),
-                            loop=self._loop)
-
-                    timeout = self._next_ping_event_at - datetime.utcnow()
-                    if timeout.total_seconds() <= 0:
+                    paused = xmlstream.writing_paused
+                    if not paused and self._active_queue:
+                        self._process_outgoing(
+                            xmlstream,
+                            self._active_queue.get_nowait()
+                        )
+
+                    if self._incoming_queue:
+                        self._process_incoming_batch(
+                            xmlstream,
+                            self.max_incoming_batch
+                        )
+
+                    if self._loop.time() >= self._next_ping_event_at:
                         self._process_ping_event(xmlstream)
 
+                # (re-)arm the timer for the next ping event; this is a no-op
+                # if the event time has not changed
+                if self._ping_timer_at != self._next_ping_event_at:
+                    if self._ping_timer is not None:
+                        self._ping_timer.cancel()
+                    self._ping_timer_at = self._next_ping_event_at
+                    self._ping_timer = self._loop.call_at(
+                        self._ping_timer_at,
+                        wakeup,
+                    )
+
+                paused = xmlstream.writing_paused
+                if paused and drain_fut is None:
+                    # do not pick up outgoing stanzas until the transport
+                    # has drained its buffer
+                    drain_fut = asyncio.async(xmlstream.drain(),
+                                              loop=self._loop)
+                    drain_fut.add_done_callback(wakeup)
+                elif not paused and drain_fut is not None:
+                    drain_fut.cancel()
+                    drain_fut = None
+
+                if     (self._incoming_queue or
+                        (self._active_queue and not paused)):
+                    # more work is pending (batch limits were hit); give
+                    # other tasks a chance to run before continuing
+                    self._broker_wakeup.set()
+                    yield from asyncio.sleep(0, loop=self._loop)
+
         finally:
-            # make sure we rescue any stanzas which possibly have already been
-            # caught by the calls to get()
-            self._logger.debug("task terminating, rescuing stanzas and "
-                               "clearing handlers")
-            if incoming_fut.done() and not incoming_fut.exception():
-                self._incoming_queue.putleft_nowait(incoming_fut.result())
-            else:
-                incoming_fut.cancel()
+            self._logger.debug("task terminating, clearing handlers")
+            if drain_fut is not None:
+                drain_fut.cancel()
 
-            if active_fut.done() and not active_fut.exception():
-                self._active_queue.putleft_nowait(active_fut.result())
-            else:
-                active_fut.cancel()
+            if self._ping_timer is not None:
+                self._ping_timer.cancel()
+                self._ping_timer = None
+                self._ping_timer_at = None
 
             # we also lock shutdown, because the main race is among the SM
             # variables
@@ -1857,9 +2775,11 @@ class StanzaStream:
         Inject a `stanza` into the incoming queue.
         """
         self._incoming_queue.put_nowait((stanza, None))
+        self._broker_wakeup.set()
 
     def recv_erroneous_stanza(self, partial_obj, exc):
         self._incoming_queue.put_nowait((partial_obj, exc))
+        self._broker_wakeup.set()
 
     def enqueue(self, stanza, **kwargs):
         """
@@ -1883,23 +2803,65 @@ class StanzaStream:
         This method calls :meth:`~.stanza.StanzaBase.autoset_id` on the stanza
         automatically.
 
+        If the active queue already holds :attr:`max_queue_size` stanzas,
+        :class:`asyncio.QueueFull` is raised.
+
         .. seealso::
 
            :meth:`send`
               for a more high-level way to send stanzas.
+
+           :meth:`enqueue_throttled`
+              for a variant which waits for room in the queue.
         """
         if self._closed:
             raise self._xmlstream_exception
 
+        if     (self.max_queue_size is not None and
+                len(self._active_queue) >= self.max_queue_size):
+            raise asyncio.QueueFull()
+
+        return self._enqueue(stanza, **kwargs)
+
+    enqueue_stanza = enqueue
+
+    def _enqueue(self, stanza, **kwargs):
+        # replies sent on behalf of the broker bypass max_queue_size: raising
+        # QueueFull here would kill the broker task
+        if self._closed:
+            raise self._xmlstream_exception
+
         stanza.validate()
         token = StanzaToken(stanza, **kwargs)
         self._active_queue.put_nowait(token)
-        stanza.autoset_id()
+        self._broker_wakeup.set()
+        stanza.autoset_id(id_generator=self._id_generator)
         self._logger.debug("enqueued stanza %r with token %r",
                            stanza, token)
         return token
 
-    enqueue_stanza = enqueue
+    @asyncio.coroutine
+    def enqueue_throttled(self, stanza, **kwargs):
+        """
+        Wait until there is room in the active queue and put a `stanza` into
+        it.
+
+        :param stanza: Stanza to send
+        :type stanza: :class:`IQ`, :class:`Message` or :class:`Presence`
+        :param kwargs: see :class:`StanzaToken`
+        :return: token which tracks the stanza
+        :rtype: :class:`StanzaToken`
+
+        This works like :meth:`enqueue`, except that it waits instead of
+        raising :class:`asyncio.QueueFull` if the queue holds
+        :attr:`max_queue_size` stanzas. Producers of many stanzas should use
+        this coroutine (or :meth:`send`), so that they are slowed down to the
+        rate at which the stanzas can actually be sent.
+
+        .. versionadded:: 0.8
+        """
+        yield from self._wait_for_queue_space()
+        return self.enqueue(stanza, **kwargs)
 
     @property
     def running(self):
@@ -1965,7 +2927,13 @@ class StanzaStream:
 
             self._sm_outbound_base = 0
             self._sm_inbound_ctr = 0
-            self._sm_unacked_list = []
+            # the token sent with the counter value _sm_outbound_base + i is
+            # at index i of both deques
+            self._sm_unacked_list = collections.deque()
+            self._sm_sent_at = collections.deque()
+            self._sm_stats = [0, 0, 0.0, 0.0]
+            self._sm_sent_since_request = 0
+            self._sm_last_request_at = self._loop.time()
             self._sm_enabled = True
             self._sm_id = response.id_
             self._sm_resumable = response.resume
@@ -2048,13 +3016,17 @@ class StanzaStream:
 
         if not self.sm_enabled:
             raise RuntimeError("Stream Management not enabled")
-        return self._sm_unacked_list[:]
+        return list(self._sm_unacked_list)
 
     @property
     def sm_max(self):
         """
         The value of the ``max`` attribute of the
-        :class:`~.nonza.SMEnabled` response from the server.
+        :class:`~.nonza.SMEnabled` response from the server, i.e. the maximum
+        time in seconds the server keeps the session for resumption.
+
+        This does not bound the number of unacked stanzas; to request acks
+        based on that number, see :attr:`sm_max_unacked`.
 
         .. note::
 
@@ -2118,6 +3090,24 @@ class StanzaStream:
             raise RuntimeError("Stream Management not enabled")
         return self._sm_resumable
 
+    @property
+    def sm_statistics(self):
+        """
+        An :class:`SMStatistics` snapshot of the counters of the current
+        stream management session.
+
+        .. note::
+
+           Accessing this attribute when :attr:`sm_enabled` is :data:`False`
+           raises :class:`RuntimeError`.
+
+        .. versionadded:: 0.8
+        """
+
+        if not self.sm_enabled:
+            raise RuntimeError("Stream Management not enabled")
+        return SMStatistics(len(self._sm_unacked_list), *self._sm_stats)
+
     def _resume_sm(self, remote_ctr):
         """
         Version of :meth:`resume_sm` which can be used during slow start.
@@ -2125,10 +3115,13 @@ class StanzaStream:
         self._logger.info("resuming SM stream with remote_ctr=%d", remote_ctr)
         # remove any acked stanzas
         self.sm_ack(remote_ctr)
-        # reinsert the remaining stanzas
-        for token in self._sm_unacked_list:
-            self._active_queue.putleft_nowait(token)
+        # reinsert the remaining stanzas, in front of anything enqueued while
+        # the stream was down
+        self._sm_stats[1] += len(self._sm_unacked_list)
+        self._active_queue.extendleft_nowait(self._sm_unacked_list)
         self._sm_unacked_list.clear()
+        self._sm_sent_at.clear()
+        self._broker_wakeup.set()
 
     @asyncio.coroutine
     def resume_sm(self, xmlstream):
@@ -2204,6 +3197,10 @@ class StanzaStream:
         for token in self._sm_unacked_list:
             token._set_state(StanzaState.SENT_WITHOUT_SM)
         del self._sm_unacked_list
+        del self._sm_sent_at
+        del self._sm_stats
+        del self._sm_sent_since_request
+        del self._sm_last_request_at
 
         self._destroy_stream_state(ConnectionError(
             "stream management disabled"
@@ -2248,14 +3245,23 @@ class StanzaStream:
                 remote_ctr)
             return
 
-        acked = self._sm_unacked_list[:to_drop]
-        del self._sm_unacked_list[:to_drop]
+        to_drop = min(to_drop, len(self._sm_unacked_list))
         self._sm_outbound_base = remote_ctr
+        if not to_drop:
+            return
 
-        if acked:
-            self._logger.debug("%d stanzas acked by remote", len(acked))
-        for token in acked:
-            token._set_state(StanzaState.ACKED)
+        self._logger.debug("%d stanzas acked by remote", to_drop)
+        now = self._loop.time()
+        unacked = self._sm_unacked_list
+        sent_at = self._sm_sent_at
+        stats = self._sm_stats
+        stats[0] += to_drop
+        for i in range(to_drop):
+            latency = now - sent_at.popleft()
+            stats[2] += latency
+            if latency > stats[3]:
+                stats[3] = latency
+            unacked.popleft()._set_state(StanzaState.ACKED)
 
     @asyncio.coroutine
     def send_iq_and_wait_for_reply(self, iq, *,
@@ -2333,6 +3339,10 @@ class StanzaStream:
         request, the response is awaited and the :attr:`~.IQ.payload` of the
         response is returned.
 
+        If :attr:`max_queue_size` is set and the active queue is full, this
+        coroutine first waits for room in the queue, like
+        :meth:`enqueue_throttled`.
+
         The `timeout` as well as any of the exception cases referring to a
         "response" do not apply for IQ response stanzas, message stanzas or
         presence stanzas sent with this method, as this method only waits for
@@ -2340,7 +3350,9 @@ class StanzaStream:
 
         If `stanza` is an IQ request and the response is not received within
         `timeout` seconds, :class:`TimeoutError` (not
-        :class:`asyncio.TimeoutError`!) is raised.
+        :class:`asyncio.TimeoutError`!) is raised. The timeouts of all pending
+        IQ requests are tracked in a single timing wheel with a resolution of
+        50 ms; `timeout` is rounded up to that resolution.
 
         .. warning::
 
@@ -2353,10 +3365,12 @@ class StanzaStream:
 
         .. versionadded:: 0.8
         """
-        stanza.autoset_id()
+        stanza.autoset_id(id_generator=self._id_generator)
         self._logger.debug("sending %r and waiting for it to be sent",
                            stanza)
 
+        yield from self._wait_for_queue_space()
+
         if not isinstance(stanza, stanza_.IQ) or stanza.type_.is_response:
             yield from self.enqueue(stanza)
             return
@@ -2377,16 +3391,130 @@ class StanzaStream:
         if not timeout:
             reply = yield from fut
         else:
+            self._iq_response_timeouts.schedule(fut, timeout)
             try:
-                reply = yield from asyncio.wait_for(
-                    fut,
-                    timeout=timeout
-                )
-            except asyncio.TimeoutError:
-                raise TimeoutError
+                reply = yield from fut
+            finally:
+                self._iq_response_timeouts.cancel(fut)
 
         return reply.payload
 
+    @asyncio.coroutine
+    def send_many(self, stanzas, *, timeout=None, window=None,
+                  return_exceptions=False):
+        """
+        Send many IQ requests and collect their responses.
+
+        :param stanzas: IQ requests to send
+        :type stanzas: iterable of :class:`~.IQ`
+        :param timeout: Maximum time in seconds to wait for all responses, or
+                        :data:`None` to disable the timeout.
+        :type timeout: :class:`~numbers.Real` or :data:`None`
+        :param window: Maximum number of requests awaiting a response at the
+                       same time, or :data:`None` for no limit.
+        :type window: :class:`int` or :data:`None`
+        :param return_exceptions: If true, exceptions are returned in place
+                                  of the payload instead of being raised.
+        :type return_exceptions: :class:`bool`
+        :raise ValueError: if one of the `stanzas` is not an IQ request.
+        :return: IQ response :attr:`~.IQ.payload` objects, in the order of
+                 `stanzas`
+        :rtype: :class:`list`
+
+        The requests are put into the active queue without suspending in
+        between (unless :attr:`max_queue_size` is reached), so that they are
+        written to the XML stream in one go. If `window` is given, only that
+        many requests are sent at first; whenever a response arrives, the
+        next request is sent.
+
+        If `timeout` elapses before all responses have arrived, the pending
+        requests fail with :class:`TimeoutError` and requests which have not
+        been sent yet are not sent anymore.
+
+        Unless `return_exceptions` is true, the first exception (such as an
+        :class:`~.errors.XMPPError` from an error response) is raised and the
+        remaining requests are abandoned; their responses are ignored.
+
+        .. versionadded:: 0.8
+        """
+        stanzas = list(stanzas)
+        for iq in stanzas:
+            if (not isinstance(iq, stanza_.IQ) or
+                    iq.type_.is_response):
+                raise ValueError("send_many only sends IQ requests")
+        if window is not None and window < 1:
+            raise ValueError("window must be positive")
+
+        results = [None] * len(stanzas)
+        deadline = None if not timeout else self._loop.time() + timeout
+        queued = collections.deque(enumerate(stanzas))
+        pending = {}
+        completed = collections.deque()
+        wakeup = asyncio.Event(loop=self._loop)
+
+        def on_done(fut):
+            completed.append(fut)
+            wakeup.set()
+
+        try:
+            while queued or pending:
+                while queued and (window is None or len(pending) < window):
+                    yield from self._wait_for_queue_space()
+
+                    if (deadline is not None and
+                            self._loop.time() >= deadline):
+                        if not return_exceptions:
+                            raise TimeoutError()
+                        for index, _ in queued:
+                            results[index] = TimeoutError()
+                        queued.clear()
+                        break
+
+                    index, iq = queued[0]
+                    iq.autoset_id(id_generator=self._id_generator)
+                    fut = asyncio.Future(loop=self._loop)
+                    self.register_iq_response_future(
+                        iq.to,
+                        iq.id_,
+                        fut,
+                    )
+                    try:
+                        self.enqueue(iq)
+                    except:
+                        fut.cancel()
+                        raise
+                    queued.popleft()
+
+                    pending[fut] = index
+                    if deadline is not None:
+                        self._iq_response_timeouts.schedule(
+                            fut,
+                            deadline - self._loop.time(),
+                        )
+                    fut.add_done_callback(on_done)
+
+                if not pending:
+                    break
+
+                yield from wakeup.wait()
+                wakeup.clear()
+                while completed:
+                    fut = completed.popleft()
+                    index = pending.pop(fut)
+                    self._iq_response_timeouts.cancel(fut)
+                    try:
+                        results[index] = fut.result().payload
+                    except Exception as exc:
+                        if not return_exceptions:
+                            raise
+                        results[index] = exc
+        finally:
+            for fut in pending:
+                self._iq_response_timeouts.cancel(fut)
+                fut.cancel()
+
+        return results
+
 
 @contextlib.contextmanager
 def iq_handler(stream, type_, payload_cls, coro):
@@ -2496,7 +3624,7 @@ _Undefined = object()
 
 
 @contextlib.contextmanager
-def stanza_filter(filter_, func, order=_Undefined):
+def stanza_filter(filter_, func, order=_Undefined, *, selector=None):
     """
     Context manager to temporarily register a filter function on a
     :class:`Filter`.
@@ -2505,6 +3633,7 @@ def stanza_filter(filter_, func, order=_Undefined):
     :type filter_: :class:`Filter`
     :param func: Filter function to register
     :param order: Order parameter to pass to :meth:`.Filter.register`
+    :param selector: Selector to pass to :meth:`.Filter.register`
 
     The type of `order` is specific to the :class:`Filter` instance used, see
     the documentation of :meth:`Filter.register` and :meth:`AppFilter.register`
@@ -2516,10 +3645,14 @@ def stanza_filter(filter_, func, order=_Undefined):
     .. versionadded:: 0.8
     """
 
+    kwargs = {}
+    if selector is not None:
+        kwargs["selector"] = selector
+
     if order is _Undefined:
-        token = filter_.register(func)
+        token = filter_.register(func, **kwargs)
     else:
-        token = filter_.register(func, order)
+        token = filter_.register(func, order, **kwargs)
     try:
         yield
     finally:
@@ -36,12 +36,32 @@ This module implements the Nodeprep (`RFC 6122`_) and Resourceprep (`RFC 6122`_)
 
 """
 
+import re
 import stringprep
 import unicodedata
 
 _nodeprep_prohibited = frozenset("\"&'/:<>@")
 
 
+def _ascii_class(chars):
+    return re.compile(
+        "[{}]*".format("".join(re.escape(c) for c in sorted(chars)))
+    ).fullmatch
+
+
+# Pure-ASCII strings which only consist of the characters below pass the
+# respective profile unchanged except for the case mapping: ASCII has no
+# characters which are mapped to nothing (B.1), which change under NFKC, which
+# are R/AL or which are unassigned. The remaining ASCII characters (space,
+# controls and the Nodeprep specials) are left to the full implementation so
+# that the error messages stay the same.
+_nodeprep_ascii_match = _ascii_class(
+    frozenset(map(chr, range(0x21, 0x7f))) - _nodeprep_prohibited
+)
+_resourceprep_ascii_match = _ascii_class(map(chr, range(0x20, 0x7f)))
+_nameprep_ascii_match = _ascii_class(map(chr, range(0x00, 0x80)))
+
+
 def is_RandALCat(c):
     return unicodedata.bidirectional(c) in ("R", "AL")
 
@@ -144,13 +164,9 @@ def _nodeprep_do_mapping(chars):
             i += len(replacement)
 
 
-def nodeprep(string, allow_unassigned=False):
-    """
-    Process the given `string` using the Nodeprep (`RFC 6122`_) profile. In the
-    error cases defined in `RFC 3454`_ (stringprep), a :class:`ValueError` is
-    raised.
-    """
-
+def _nodeprep_reference(string, allow_unassigned=False):
+    # straightforward implementation of the Nodeprep profile, kept to
+    # test the table-driven implementation against
     chars = list(string)
     _nodeprep_do_mapping(chars)
     do_normalization(chars)
@@ -193,13 +209,9 @@ def _resourceprep_do_mapping(chars):
         i += 1
 
 
-def resourceprep(string, allow_unassigned=False):
-    """
-    Process the given `string` using the Resourceprep (`RFC 6122`_) profile. In
-    the error cases defined in `RFC 3454`_ (stringprep), a :class:`ValueError`
-    is raised.
-    """
-
+def _resourceprep_reference(string, allow_unassigned=False):
+    # straightforward implementation of the Resourceprep profile, kept to
+    # test the table-driven implementation against
     chars = list(string)
     _resourceprep_do_mapping(chars)
     do_normalization(chars)
@@ -230,13 +242,9 @@ def resourceprep(string, allow_unassigned=False):
     return "".join(chars)
 
 
-def nameprep(string, allow_unassigned=False):
-    """
-    Process the given `string` using the Nameprep (`RFC 3491`_) profile. In the
-    error cases defined in `RFC 3454`_ (stringprep), a :class:`ValueError` is
-    raised.
-    """
-
+def _nameprep_reference(string, allow_unassigned=False):
+    # straightforward implementation of the Nameprep profile, kept to
+    # test the table-driven implementation against
     chars = list(string)
     _nodeprep_do_mapping(chars)
     do_normalization(chars)
@@ -264,3 +272,159 @@ def nameprep(string, allow_unassigned=False):
         )
 
     return "".join(chars)
+
+
+# Table-driven implementation
+#
+# Computing the tables for all of Unicode at import time would take seconds,
+# so they are filled lazily: each table is a dict which computes and stores
+# the entry for a code point on first use. The tables are then applied to
+# whole strings with str.translate, which runs in C for all known code points.
+# The number of entries is bounded, so that input with many distinct code
+# points cannot grow the tables without limit; code points beyond the bound
+# are computed on every use.
+
+_TABLE_LIMIT = 0x10000
+
+_NODEPREP_PROHIBITED = 0x01
+_RESOURCEPREP_PROHIBITED = 0x02
+_NAMEPREP_PROHIBITED = 0x04
+_UNASSIGNED = 0x08
+_RANDAL = 0x10
+_L = 0x20
+
+_COMMON_PROHIBITED_TABLES = (
+    stringprep.in_table_c12,
+    stringprep.in_table_c22,
+    stringprep.in_table_c3,
+    stringprep.in_table_c4,
+    stringprep.in_table_c5,
+    stringprep.in_table_c6,
+    stringprep.in_table_c7,
+    stringprep.in_table_c8,
+    stringprep.in_table_c9,
+)
+
+
+class _CodepointTable(dict):
+    def __init__(self, func):
+        super().__init__()
+        self._func = func
+
+    def __missing__(self, cp):
+        value = self._func(cp)
+        if len(self) < _TABLE_LIMIT:
+            self[cp] = value
+        return value
+
+
+def _map_b1(cp):
+    c = chr(cp)
+    if stringprep.in_table_b1(c):
+        return None
+    return cp
+
+
+def _map_b1_b2(cp):
+    c = chr(cp)
+    if stringprep.in_table_b1(c):
+        return None
+    return stringprep.map_table_b2(c)
+
+
+def _classify(cp):
+    c = chr(cp)
+    flags = 0
+    if any(in_table(c) for in_table in _COMMON_PROHIBITED_TABLES):
+        flags |= (_NODEPREP_PROHIBITED |
+                  _RESOURCEPREP_PROHIBITED |
+                  _NAMEPREP_PROHIBITED)
+    elif stringprep.in_table_c21(c):
+        flags |= _NODEPREP_PROHIBITED | _RESOURCEPREP_PROHIBITED
+    elif stringprep.in_table_c11(c) or c in _nodeprep_prohibited:
+        flags |= _NODEPREP_PROHIBITED
+    if stringprep.in_table_a1(c):
+        flags |= _UNASSIGNED
+    if is_RandALCat(c):
+        flags |= _RANDAL
+    elif is_LCat(c):
+        flags |= _L
+    return chr(flags)
+
+
+_B1_MAP = _CodepointTable(_map_b1)
+_B1_B2_MAP = _CodepointTable(_map_b1_b2)
+_CLASSES = _CodepointTable(_classify)
+
+
+def _prepare(string, mapping, prohibited, allow_unassigned):
+    string = unicodedata.normalize("NFKC", string.translate(mapping))
+    classes = string.translate(_CLASSES)
+
+    flags = 0
+    for cls in set(classes):
+        flags |= ord(cls)
+
+    if flags & prohibited:
+        for c, cls in zip(string, classes):
+            if ord(cls) & prohibited:
+                raise ValueError("Input contains invalid unicode codepoint: "
+                                 "U+{:04x}".format(ord(c)))
+
+    if flags & _RANDAL:
+        if flags & _L:
+            raise ValueError("L and R/AL characters must not occur in the "
+                             "same string")
+        if not ord(classes[0]) & _RANDAL or not ord(classes[-1]) & _RANDAL:
+            raise ValueError("R/AL string must start and end with R/AL "
+                             "character.")
+
+    if not allow_unassigned and flags & _UNASSIGNED:
+        for c, cls in zip(string, classes):
+            if ord(cls) & _UNASSIGNED:
+                raise ValueError("Input contains unassigned code point: "
+                                 "U+{:04x}".format(ord(c)))
+
+    return string
+
+
+def nodeprep(string, allow_unassigned=False):
+    """
+    Process the given `string` using the Nodeprep (`RFC 6122`_) profile. In the
+    error cases defined in `RFC 3454`_ (stringprep), a :class:`ValueError` is
+    raised.
+    """
+
+    if _nodeprep_ascii_match(string):
+        return string.lower()
+
+    return _prepare(string, _B1_B2_MAP, _NODEPREP_PROHIBITED,
+                    allow_unassigned)
+
+
+def resourceprep(string, allow_unassigned=False):
+    """
+    Process the given `string` using the Resourceprep (`RFC 6122`_) profile. In
+    the error cases defined in `RFC 3454`_ (stringprep), a :class:`ValueError`
+    is raised.
+    """
+
+    if _resourceprep_ascii_match(string):
+        return string
+
+    return _prepare(string, _B1_MAP, _RESOURCEPREP_PROHIBITED,
+                    allow_unassigned)
+
+
+def nameprep(string, allow_unassigned=False):
+    """
+    Process the given `string` using the Nameprep (`RFC 3491`_) profile. In the
+    error cases defined in `RFC 3454`_ (stringprep), a :class:`ValueError` is
+    raised.
+    """
+
+    if _nameprep_ascii_match(string):
+        return string.lower()
+
+    return _prepare(string, _B1_B2_MAP, _NAMEPREP_PROHIBITED,
+                    allow_unassigned)
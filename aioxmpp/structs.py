@@ -77,6 +77,25 @@ import warnings
 from .stringprep import nodeprep, resourceprep, nameprep
 
 
+#: Maximum number of entries in each of the caches used by :class:`JID`.
+JID_CACHE_SIZE = 4096
+
+
+@functools.lru_cache(maxsize=JID_CACHE_SIZE)
+def _nodeprep_cached(string, allow_unassigned):
+    return nodeprep(string, allow_unassigned=allow_unassigned)
+
+
+@functools.lru_cache(maxsize=JID_CACHE_SIZE)
+def _nameprep_cached(string, allow_unassigned):
+    return nameprep(string, allow_unassigned=allow_unassigned)
+
+
+@functools.lru_cache(maxsize=JID_CACHE_SIZE)
+def _resourceprep_cached(string, allow_unassigned):
+    return resourceprep(string, allow_unassigned=allow_unassigned)
+
+
 _USE_COMPAT_ENUM = True
 
 
@@ -601,6 +620,11 @@ class JID(collections.namedtuple("JID", ["localpart", "domain", "resource"])):
     you send and liberal in what you receive". Otherwise, strict checking
     should be enabled. This brings maximum interoperability.
 
+    The results of stringprep and of :meth:`fromstr` are kept in bounded LRU
+    caches of :data:`~aioxmpp.structs.JID_CACHE_SIZE` entries each, since the
+    same JIDs tend to
+    occur over and over in a stream.
+
     .. automethod:: fromstr
 
     Information about a JID:
@@ -633,20 +657,11 @@ class JID(collections.namedtuple("JID", ["localpart", "domain", "resource"])):
 
     def __new__(cls, localpart, domain, resource, *, strict=True):
         if localpart:
-            localpart = nodeprep(
-                localpart,
-                allow_unassigned=not strict
-            )
+            localpart = _nodeprep_cached(localpart, not strict)
         if domain is not None:
-            domain = nameprep(
-                domain,
-                allow_unassigned=not strict
-            )
+            domain = _nameprep_cached(domain, not strict)
         if resource:
-            resource = resourceprep(
-                resource,
-                allow_unassigned=not strict
-            )
+            resource = _resourceprep_cached(resource, not strict)
 
         if not domain:
             raise ValueError("domain must not be empty or None")
@@ -682,10 +697,7 @@ class JID(collections.namedtuple("JID", ["localpart", "domain", "resource"])):
             pass
         else:
             if localpart:
-                localpart = nodeprep(
-                    localpart,
-                    allow_unassigned=not strict
-                )
+                localpart = _nodeprep_cached(localpart, not strict)
             new_kwargs["localpart"] = localpart
 
         try:
@@ -695,10 +707,7 @@ class JID(collections.namedtuple("JID", ["localpart", "domain", "resource"])):
         else:
             if not domain:
                 raise ValueError("domain must not be empty or None")
-            new_kwargs["domain"] = nameprep(
-                domain,
-                allow_unassigned=not strict
-            )
+            new_kwargs["domain"] = _nameprep_cached(domain, not strict)
 
         try:
             resource = kwargs.pop("resource")
@@ -706,10 +715,7 @@ class JID(collections.namedtuple("JID", ["localpart", "domain", "resource"])):
             pass
         else:
             if resource:
-                resource = resourceprep(
-                    resource,
-                    allow_unassigned=not strict
-                )
+                resource = _resourceprep_cached(resource, not strict)
             new_kwargs["resource"] = resource
 
         if kwargs:
@@ -729,9 +735,17 @@ class JID(collections.namedtuple("JID", ["localpart", "domain", "resource"])):
 
     def bare(self):
         """
-        Return the bare version of this JID as new :class:`JID` object.
+        Return the bare version of this JID as :class:`JID` object.
+
+        .. versionchanged:: 0.8
+
+           If the JID is already bare, it is returned unchanged. Otherwise,
+           the bare JID is taken from a bounded cache; the same bare JID
+           object may thus be returned for different full JIDs.
         """
-        return self.replace(resource=None)
+        if self.resource is None:
+            return self
+        return _bare_jid(type(self), self.localpart, self.domain)
 
     @property
     def is_bare(self):
@@ -754,7 +768,16 @@ class JID(collections.namedtuple("JID", ["localpart", "domain", "resource"])):
         """
         Obtain a :class:`JID` object by parsing a JID from the given string
         `s`.
+
+        .. versionchanged:: 0.8
+
+           Parsed JIDs are kept in a bounded cache, so that parsing the same
+           string again returns the same object without running stringprep.
         """
+        return _jid_fromstr(cls, s, strict)
+
+    @classmethod
+    def _fromstr(cls, s, strict):
         localpart, sep, domain = s.partition("@")
         if not sep:
             domain = localpart
@@ -766,6 +789,17 @@ class JID(collections.namedtuple("JID", ["localpart", "domain", "resource"])):
         return cls(localpart, domain, resource, strict=strict)
 
 
+@functools.lru_cache(maxsize=JID_CACHE_SIZE)
+def _jid_fromstr(cls, s, strict):
+    return cls._fromstr(s, strict)
+
+
+@functools.lru_cache(maxsize=JID_CACHE_SIZE)
+def _bare_jid(cls, localpart, domain):
+    # the parts have been prepared already when the full JID was created
+    return tuple.__new__(cls, (localpart, domain, None))
+
+
 @functools.total_ordering
 class PresenceState:
     """
@@ -556,6 +556,8 @@ class XMLStreamMock(InteractivityMock):
         self.stanza_parser = xso.XSOParser()
         self.can_starttls_value = False
         self._error_futures = []
+        self._writable = asyncio.Event(loop=self._loop)
+        self._writable.set()
 
     def _execute_single(self, do):
         do(self)
@@ -730,3 +732,17 @@ class XMLStreamMock(InteractivityMock):
         fut = asyncio.Future()
         self._error_futures.append(fut)
         return fut
+
+    def pause_writing(self):
+        self._writable.clear()
+
+    def resume_writing(self):
+        self._writable.set()
+
+    @property
+    def writing_paused(self):
+        return not self._writable.is_set()
+
+    @asyncio.coroutine
+    def drain(self):
+        yield from self._writable.wait()
@@ -33,6 +33,10 @@ The most useful class here is the :class:`XMPPXMLGenerator`:
 
 .. autoclass:: XMPPXMLGenerator
 
+For sending many :class:`~.xso.XSO` instances, a faster variant exists:
+
+.. autoclass:: XMPPXMLSerializer
+
 The following generator function can be used to send several
 :class:`~.stanza_model.XSO` instances along an XMPP stream without
 bothering with any cleanup.
@@ -55,6 +59,11 @@ instances, the following classes and functions can be used:
 
 .. autofunction:: make_parser
 
+Instead of a SAX parser, the following processor can be used, which drives
+:mod:`xml.parsers.expat` directly and is considerably faster:
+
+.. autoclass:: XMPPXMLExpatProcessor
+
 Utility functions
 =================
 
@@ -70,8 +79,11 @@ Utility functions
 
 import ctypes
 import ctypes.util
+import functools
 import io
+import re
 
+import xml.parsers.expat as pyexpat
 import xml.sax
 import xml.sax.saxutils
 
@@ -97,6 +109,27 @@ def xmlValidateNameValue_buf(b):
     return bool(libxml2.xmlValidateNameValue(b))
 
 
+@functools.lru_cache(maxsize=1024)
+def _validate_name(s):
+    return xmlValidateNameValue_str(s)
+
+
+@functools.lru_cache(maxsize=1024)
+def _quoteattr_bytes(value):
+    return xml.sax.saxutils.quoteattr(value).encode("utf-8")
+
+
+@functools.lru_cache(maxsize=1024)
+def _split_expat_name(name):
+    namespace_uri, sep, localname = name.partition(" ")
+    if not sep:
+        return None, name
+    return namespace_uri, localname
+
+
+_CONTROL_CHARACTERS = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+
 class AbortStream(Exception):
     """
     This is a signal exception which causes :func:`write_xmlstream` to stop
@@ -206,7 +239,7 @@ class XMPPXMLGenerator:
         if not isinstance(name, tuple):
             raise ValueError("names must be tuples")
 
-        if ":" in name[1] or not xmlValidateNameValue_str(name[1]):
+        if ":" in name[1] or not _validate_name(name[1]):
             raise ValueError("invalid name: {!r}".format(name[1]))
 
         if name[0]:
@@ -361,7 +394,7 @@ class XMPPXMLGenerator:
         if None in pending_prefixes:
             uri = pending_prefixes.pop(None)
             self._write(b" xmlns=")
-            self._write(xml.sax.saxutils.quoteattr(uri).encode("utf-8"))
+            self._write(_quoteattr_bytes(uri))
 
         for prefix, uri in sorted(pending_prefixes.items()):
             self._write(b" xmlns")
@@ -369,9 +402,7 @@ class XMPPXMLGenerator:
                 self._write(b":")
                 self._write(prefix.encode("utf-8"))
             self._write(b"=")
-            self._write(
-                xml.sax.saxutils.quoteattr(uri).encode("utf-8")
-            )
+            self._write(_quoteattr_bytes(uri))
 
         if self._sorted_attributes:
             attrib.sort()
@@ -380,9 +411,7 @@ class XMPPXMLGenerator:
             self._write(b" ")
             self._write(attrname.encode("utf-8"))
             self._write(b"=")
-            self._write(
-                xml.sax.saxutils.quoteattr(value).encode("utf-8")
-            )
+            self._write(_quoteattr_bytes(value))
 
         if self._short_empty_elements:
             self._pending_start_element = name
@@ -432,10 +461,7 @@ class XMPPXMLGenerator:
         raised.
         """
         self._finish_pending_start_element()
-        if any(0 <= ord(c) <= 8 or
-               11 <= ord(c) <= 12 or
-               14 <= ord(c) <= 31
-               for c in chars):
+        if _CONTROL_CHARACTERS.search(chars):
             raise ValueError("control characters are not allowed in "
                              "well-formed XML")
         self._write(xml.sax.saxutils.escape(chars).encode("utf-8"))
@@ -492,6 +518,361 @@ class XMPPXMLGenerator:
             self._flush()
 
 
+class _XSOUnparsePlan:
+    """
+    Precomputed serialisation data of an XSO class in a given namespace
+    context of an :class:`XMPPXMLSerializer`. See
+    :meth:`XMPPXMLSerializer._compile_plan`.
+    """
+
+    __slots__ = (
+        "start",
+        "end",
+        "attr_props",
+        "attr_names",
+        "attr_sort_keys",
+        "text_prop",
+        "children",
+        "collector_prop",
+        "ns_map",
+        "ns_counter",
+        "ns_context",
+    )
+
+
+_CHILD_SINGLE = 0
+_CHILD_SEQUENCE = 1
+_CHILD_NESTED_SEQUENCE = 2
+_CHILD_VALUES = 3
+_CHILD_ITEMS = 4
+_CHILD_GENERIC = 5
+
+
+def _classify_child_prop(prop):
+    to_sax = type(prop).to_sax
+    if to_sax is xso.Child.to_sax:
+        return _CHILD_SINGLE
+    if to_sax is xso.ChildList.to_sax:
+        return _CHILD_SEQUENCE
+    if to_sax is xso.ChildMap.to_sax:
+        return _CHILD_NESTED_SEQUENCE
+    if to_sax is xso.ChildValueList.to_sax:
+        return _CHILD_VALUES
+    if (to_sax is xso.ChildValueMap.to_sax or
+            to_sax is xso.ChildValueMultiMap.to_sax):
+        return _CHILD_ITEMS
+    return _CHILD_GENERIC
+
+
+class XMPPXMLSerializer(XMPPXMLGenerator):
+    """
+    :class:`XMPPXMLSerializer` is a :class:`XMPPXMLGenerator` which is
+    optimised for serialising :class:`~.xso.XSO` instances with
+    :meth:`write_xso`. The output is byte-for-byte identical to what
+    :class:`XMPPXMLGenerator` generates when the objects are serialised using
+    :meth:`~.xso.XSO.unparse_to_sax`.
+
+    The differences to :class:`XMPPXMLGenerator` are:
+
+    * All output is collected in a buffer and written to `out` as a single
+      :class:`bytes` object on :meth:`flush`.
+    * For each XSO class and namespace context, the start tag (including
+      the namespace declarations), the end tag and the qualified attribute
+      names are computed once and cached on the class. The escaped forms of
+      frequently used attribute values are cached, too.
+    * Child XSOs of the common descriptors (such as :class:`~.xso.Child`,
+      :class:`~.xso.ChildList` and :class:`~.xso.ChildTextMap`) are
+      serialised directly, without going through the SAX interface.
+
+    Classes which cannot be handled by the fast path (for example because they
+    override :meth:`~.xso.XSO.unparse_to_sax` or use namespaced attributes)
+    are transparently serialised using the SAX interface, which is still
+    fully supported.
+
+    The arguments are the same as for :class:`XMPPXMLGenerator`.
+
+    .. automethod:: write_xso
+
+    .. automethod:: flush
+
+    .. versionadded:: 0.8
+    """
+
+    def __init__(self, out,
+                 short_empty_elements=True,
+                 sorted_attributes=False):
+        super().__init__(out,
+                         short_empty_elements=short_empty_elements,
+                         sorted_attributes=sorted_attributes)
+        self._out_write = out.write
+        self._buf = []
+        self._write = self._buf.append
+        self._ns_map_stack = [({}, set(), 0, None)]
+        self._ns_context = None
+
+    def _pin_floating_ns_decls(self, old_counter):
+        if self._ns_prefixes_floating_out:
+            raise RuntimeError("namespace prefix has not been closed")
+
+        new_decls = self._ns_decls_floating_in
+        new_prefixes = self._ns_prefixes_floating_in
+        curr_ns_map = self._curr_ns_map
+        self._ns_map_stack.append(
+            (
+                curr_ns_map,
+                set(new_prefixes) - self._ns_auto_prefixes_floating_in,
+                old_counter,
+                self._ns_context,
+            )
+        )
+
+        if not new_prefixes:
+            return {}
+
+        cleared_new_prefixes = dict(new_prefixes)
+        for uri, prefix in curr_ns_map.items():
+            try:
+                new_uri = cleared_new_prefixes[prefix]
+            except KeyError:
+                pass
+            else:
+                if new_uri == uri:
+                    del cleared_new_prefixes[prefix]
+
+        # the namespace maps are never modified in-place, so that they can be
+        # shared with the stack and the cached plans
+        curr_ns_map = curr_ns_map.copy()
+        curr_ns_map.update(new_decls)
+        self._curr_ns_map = curr_ns_map
+        self._ns_context = None
+        self._ns_decls_floating_in = {}
+        self._ns_prefixes_floating_in = {}
+
+        return cleared_new_prefixes
+
+    def endElementNS(self, name, qname):
+        if self._ns_prefixes_floating_out:
+            raise RuntimeError("namespace prefix has not been closed")
+
+        if self._pending_start_element == name:
+            self._pending_start_element = False
+            self._write(b"/>")
+        else:
+            self._write(b"</")
+            self._write(self._qname(name).encode("utf-8"))
+            self._write(b">")
+
+        (self._curr_ns_map, self._ns_prefixes_floating_out,
+         self._ns_counter, self._ns_context) = self._ns_map_stack.pop()
+
+    def _compile_plan(self, cls):
+        if cls.unparse_to_sax is not xso.XSO.unparse_to_sax:
+            return None
+
+        attr_props = []
+        attr_names = {}
+        attr_sort_keys = {}
+        for tag, prop in cls.ATTR_MAP.items():
+            if type(prop).to_dict is not xso.Attr.to_dict:
+                return None
+            if tag[0] == namespaces.xml:
+                attrqname = "xml:" + tag[1]
+            elif tag[0]:
+                # namespaced attributes may require a prefix to be declared
+                # depending on which attributes are present
+                return None
+            else:
+                attrqname = tag[1]
+            if (attrqname == "xmlns" or ":" in tag[1] or
+                    not _validate_name(tag[1])):
+                return None
+            attr_props.append(prop)
+            attr_names[tag] = " {}=".format(attrqname).encode("utf-8")
+            attr_sort_keys[tag] = attrqname
+
+        # obtain start and end tag by running the SAX implementation on a
+        # scratch buffer; this guarantees identical namespace handling
+        buf = self._buf
+        short_empty_elements = self._short_empty_elements
+        self._buf = []
+        self._write = self._buf.append
+        self._short_empty_elements = True
+        try:
+            if cls.DECLARE_NS:
+                for prefix, uri in cls.DECLARE_NS.items():
+                    self.startPrefixMapping(prefix, uri)
+            self.startElementNS(cls.TAG, None, {})
+            start = b"".join(self._buf)
+            del self._buf[:]
+            ns_map = self._curr_ns_map
+            ns_counter = self._ns_counter
+            self._pending_start_element = False
+            self.endElementNS(cls.TAG, None)
+            end = b"".join(self._buf)
+            if cls.DECLARE_NS:
+                for prefix in cls.DECLARE_NS:
+                    self.endPrefixMapping(prefix)
+        except (ValueError, RuntimeError, KeyError):
+            # let the SAX implementation raise the error again in context
+            return None
+        finally:
+            self._buf = buf
+            self._write = buf.append
+            self._short_empty_elements = short_empty_elements
+            self._ns_prefixes_floating_in = {}
+            self._ns_decls_floating_in = {}
+
+        plan = _XSOUnparsePlan()
+        plan.start = start
+        plan.end = end
+        plan.attr_props = attr_props
+        plan.attr_names = attr_names
+        plan.attr_sort_keys = attr_sort_keys
+        plan.text_prop = (cls.TEXT_PROPERTY.xq_descriptor
+                          if cls.TEXT_PROPERTY else None)
+        plan.children = [
+            (_classify_child_prop(prop), prop)
+            for prop in cls.CHILD_PROPS
+        ]
+        plan.collector_prop = (cls.COLLECTOR_PROPERTY.xq_descriptor
+                               if cls.COLLECTOR_PROPERTY else None)
+        plan.ns_map = ns_map
+        plan.ns_counter = ns_counter
+        plan.ns_context = (frozenset(ns_map.items()), ns_counter)
+        return plan
+
+    def _get_plan(self, cls):
+        context = self._ns_context
+        if context is None:
+            context = (frozenset(self._curr_ns_map.items()),
+                       self._ns_counter)
+            self._ns_context = context
+
+        try:
+            plans = cls.__dict__["_xso_unparse_plans"]
+        except KeyError:
+            plans = {}
+            type.__setattr__(cls, "_xso_unparse_plans", plans)
+
+        try:
+            return plans[context]
+        except KeyError:
+            pass
+
+        plan = self._compile_plan(cls)
+        plans[context] = plan
+        return plan
+
+    def write_xso(self, obj):
+        """
+        Serialise the :class:`~.xso.XSO` `obj` into the buffer.
+
+        This is equivalent to ``obj.unparse_to_sax(serializer)``, but faster.
+        """
+        cls = type(obj)
+        if (not isinstance(cls, xso.model.XMLStreamClass) or
+                self._ns_prefixes_floating_in or
+                self._ns_prefixes_floating_out):
+            obj.unparse_to_sax(self)
+            return
+
+        self._finish_pending_start_element()
+        plan = self._get_plan(cls)
+        if plan is None:
+            obj.unparse_to_sax(self)
+            return
+
+        write = self._write
+        attrib = {}
+        for prop in plan.attr_props:
+            prop.to_dict(obj, attrib)
+
+        write(plan.start)
+        attr_names = plan.attr_names
+        if self._sorted_attributes:
+            attr_sort_keys = plan.attr_sort_keys
+            attrib = sorted(
+                attrib.items(),
+                key=lambda item: (attr_sort_keys[item[0]], item[1])
+            )
+        else:
+            attrib = attrib.items()
+        for tag, value in attrib:
+            write(attr_names[tag])
+            write(_quoteattr_bytes(value))
+
+        tag = cls.TAG
+        self._ns_map_stack.append(
+            (
+                self._curr_ns_map,
+                self._ns_prefixes_floating_out,
+                self._ns_counter,
+                self._ns_context,
+            )
+        )
+        self._curr_ns_map = plan.ns_map
+        self._ns_counter = plan.ns_counter
+        self._ns_context = plan.ns_context
+        if self._short_empty_elements:
+            self._pending_start_element = tag
+        else:
+            write(b">")
+
+        try:
+            if plan.text_prop is not None:
+                plan.text_prop.to_sax(obj, self)
+            for kind, prop in plan.children:
+                if kind == _CHILD_SINGLE:
+                    child = prop.__get__(obj, cls)
+                    if child is not None:
+                        self.write_xso(child)
+                elif kind == _CHILD_SEQUENCE:
+                    for child in prop.__get__(obj, cls):
+                        self.write_xso(child)
+                elif kind == _CHILD_NESTED_SEQUENCE:
+                    for children in prop.__get__(obj, cls).values():
+                        for child in children:
+                            self.write_xso(child)
+                elif kind == _CHILD_VALUES:
+                    for value in prop.__get__(obj, cls):
+                        self.write_xso(prop.type_.format(value))
+                elif kind == _CHILD_ITEMS:
+                    for item in prop.__get__(obj, cls).items():
+                        self.write_xso(prop.type_.format(item))
+                else:
+                    prop.to_sax(obj, self)
+            if plan.collector_prop is not None:
+                plan.collector_prop.to_sax(obj, self)
+        finally:
+            if self._ns_prefixes_floating_out:
+                raise RuntimeError("namespace prefix has not been closed")
+
+            if self._pending_start_element == tag:
+                self._pending_start_element = False
+                write(b"/>")
+            else:
+                write(plan.end)
+
+            (self._curr_ns_map, self._ns_prefixes_floating_out,
+             self._ns_counter, self._ns_context) = self._ns_map_stack.pop()
+
+    def flush(self):
+        """
+        Write the buffered output to the object passed as `out` to the
+        constructor and call its :meth:`flush` method, if it has any.
+
+        As with :class:`XMPPXMLGenerator`, any unfinished opening tag is
+        finished before flushing.
+        """
+        self._finish_pending_start_element()
+        if self._buf:
+            data = b"".join(self._buf)
+            del self._buf[:]
+            self._out_write(data)
+        if self._flush:
+            self._flush()
+
+
 def write_objects(writer, *, autoflush=False):
     """
     Return a generator. All :class:`.xso.XSO` objects sent into the generator
@@ -518,7 +899,8 @@ def write_xmlstream(f,
                     from_=None,
                     version=(1, 0),
                     nsmap={},
-                    sorted_attributes=False):
+                    sorted_attributes=False,
+                    use_serializer=False):
     """
     Return a generator, which writes an XMPP XML stream on the file-like object
     `f`.
@@ -535,6 +917,10 @@ def write_xmlstream(f,
     `sorted_attributes` is passed to the :class:`XMPPXMLGenerator` which is
     used by this function.
 
+    If `use_serializer` is true, a :class:`XMPPXMLSerializer` is used instead
+    of a :class:`XMPPXMLGenerator`. The output is the same, but it is
+    generated faster and written to `f` with a single call per object.
+
     Now, user code can send :class:`~.xso.XSO` objects to the
     generator using its :meth:`send` method. These objects get serialized to
     the XML stream. Any exception raised during that is re-raised and the
@@ -557,7 +943,7 @@ def write_xmlstream(f,
     if from_:
         attrs[None, "from"] = str(from_)
 
-    writer = XMPPXMLGenerator(
+    writer = (XMPPXMLSerializer if use_serializer else XMPPXMLGenerator)(
         out=f,
         short_empty_elements=True,
         sorted_attributes=sorted_attributes)
@@ -580,7 +966,10 @@ def write_xmlstream(f,
             except AbortStream:
                 abort = True
                 return
-            obj.unparse_to_sax(writer)
+            if use_serializer:
+                writer.write_xso(obj)
+            else:
+                obj.unparse_to_sax(writer)
             writer.flush()
     finally:
         if not abort:
@@ -883,6 +1272,177 @@ def make_parser():
     return p
 
 
+class XMPPXMLExpatProcessor(XMPPXMLProcessor):
+    """
+    This is a :class:`XMPPXMLProcessor` which drives an
+    :mod:`xml.parsers.expat` parser directly instead of being used as content
+    handler of a SAX :class:`~xml.sax.xmlreader.XMLReader`.
+
+    Data is passed to the processor using :meth:`feed`. The expat callbacks
+    are translated directly into the events used by :mod:`aioxmpp.xso`, which
+    avoids the overhead of the :mod:`xml.sax` expat reader and the
+    :class:`~.xso.SAXDriver`. The splitting of namespace-qualified names is
+    cached in a bounded LRU cache shared by all processors.
+
+    The checks for restricted XML which are otherwise implemented by
+    :class:`XMPPLexicalHandler` are applied to the expat parser directly:
+    comments, processing instructions, DTD declarations and non-predefined
+    entities lead to a :class:`~.errors.StreamError` with the
+    ``restricted-xml`` condition. Any other malformed XML leads to a
+    :class:`~.errors.StreamError` with the ``bad-format`` condition.
+
+    Exception handling and the callbacks work exactly like for
+    :class:`XMPPXMLProcessor`.
+
+    .. automethod:: feed
+
+    .. versionadded:: 0.8
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._parser = None
+        self._dest = None
+
+    def _make_parser(self):
+        parser = pyexpat.ParserCreate(namespace_separator=" ")
+        parser.buffer_text = True
+        parser.StartElementHandler = self._start_element
+        parser.EndElementHandler = self._end_element
+        parser.CharacterDataHandler = self.characters
+        parser.ProcessingInstructionHandler = self.processingInstruction
+        parser.CommentHandler = XMPPLexicalHandler.comment
+        parser.StartDoctypeDeclHandler = self._start_doctype_decl
+        parser.SetParamEntityParsing(pyexpat.XML_PARAM_ENTITY_PARSING_NEVER)
+        return parser
+
+    def _start_doctype_decl(self, name, system_id, public_id,
+                            has_internal_subset):
+        XMPPLexicalHandler.startDTD(name, public_id, system_id)
+
+    def _send(self, value):
+        if self._dest is None:
+            self._dest = self._stanza_parser()
+            self._dest.send(None)
+        try:
+            self._dest.send(value)
+        except StopIteration:
+            self._dest = None
+        except:
+            self._dest = None
+            raise
+
+    def _start_element(self, name, attributes):
+        tag = _split_expat_name(name)
+        if attributes:
+            attributes = {
+                _split_expat_name(attrname): value
+                for attrname, value in attributes.items()
+            }
+
+        if self._state != ProcessorState.STREAM_HEADER_PROCESSED:
+            self.startElementNS(tag, None, attributes)
+            return
+
+        # this is the hot path of startElementNS, inlined
+        self._depth += 1
+        try:
+            self._send(("start", tag[0], tag[1], attributes))
+        except Exception as exc:
+            self._stored_exception = exc
+            self._state = ProcessorState.EXCEPTION_BACKOFF
+
+    def _end_element(self, name):
+        if (self._state != ProcessorState.STREAM_HEADER_PROCESSED or
+                self._depth <= 1):
+            self.endElementNS(_split_expat_name(name), None)
+            return
+
+        # this is the hot path of endElementNS, inlined
+        self._depth -= 1
+        try:
+            self._send(("end",))
+        except Exception as exc:
+            self._stored_exception = exc
+            self._state = ProcessorState.EXCEPTION_BACKOFF
+            if self._depth == 1:
+                self._end_element_exception_handling()
+
+    def feed(self, data):
+        """
+        Feed the bytes object `data` to the parser.
+
+        If the data contains restricted or malformed XML, an appropriate
+        :class:`~.errors.StreamError` is raised.
+        """
+        if self._state == ProcessorState.CLEAN:
+            self.startDocument()
+
+        try:
+            self._parser.Parse(data, False)
+        except pyexpat.ExpatError as exc:
+            if exc.code == pyexpat.errors.codes[
+                    pyexpat.errors.XML_ERROR_UNDEFINED_ENTITY]:
+                # this will raise an appropriate stream error
+                XMPPLexicalHandler.startEntity("foo")
+            raise errors.StreamError(
+                (namespaces.streams, "bad-format"),
+                "<unknown>:{}:{}: {}".format(
+                    exc.lineno,
+                    exc.offset,
+                    pyexpat.ErrorString(exc.code)
+                )
+            )
+
+    def characters(self, characters):
+        if self._state == ProcessorState.EXCEPTION_BACKOFF:
+            pass
+        elif self._state != ProcessorState.STREAM_HEADER_PROCESSED:
+            raise RuntimeError("invalid state: {}".format(self._state))
+        else:
+            self._send(("text", characters))
+
+    def startDocument(self):
+        if self._state != ProcessorState.CLEAN:
+            raise RuntimeError("invalid state: {}".format(self._state))
+        self._state = ProcessorState.STARTED
+        self._depth = 0
+        self._dest = None
+        self._parser = self._make_parser()
+
+    def endDocument(self):
+        if self._state != ProcessorState.STREAM_FOOTER_PROCESSED:
+            raise RuntimeError("invalid state: {}".format(self._state))
+        self._state = ProcessorState.CLEAN
+        self._dest = None
+        self._parser = None
+
+    def startElementNS(self, name, qname, attributes):
+        if self._state == ProcessorState.STREAM_HEADER_PROCESSED:
+            try:
+                self._send(("start", name[0], name[1], attributes))
+            except Exception as exc:
+                self._stored_exception = exc
+                self._state = ProcessorState.EXCEPTION_BACKOFF
+            self._depth += 1
+            return
+        super().startElementNS(name, qname, attributes)
+
+    def endElementNS(self, name, qname):
+        if (self._state == ProcessorState.STREAM_HEADER_PROCESSED and
+                self._depth > 1):
+            self._depth -= 1
+            try:
+                self._send(("end",))
+            except Exception as exc:
+                self._stored_exception = exc
+                self._state = ProcessorState.EXCEPTION_BACKOFF
+                if self._depth == 1:
+                    self._end_element_exception_handling()
+            return
+        super().endElementNS(name, qname)
+
+
 def serialize_single_xso(x):
     """
     Serialize a single XSO `x` to a string. This is potentially very slow and
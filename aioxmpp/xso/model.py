@@ -1689,6 +1689,7 @@ class XMLStreamClass(xso_query.Class, abc.ABCMeta):
             super().__setattr__("COLLECTOR_PROPERTY", value)
 
         super().__setattr__(name, value)
+        cls._invalidate_plans()
 
     def __delattr__(cls, name):
         try:
@@ -1700,10 +1701,171 @@ class XMLStreamClass(xso_query.Class, abc.ABCMeta):
                 raise AttributeError("cannot unbind XSO descriptors")
 
         super().__delattr__(name)
+        cls._invalidate_plans()
 
     def __prepare__(name, bases, **kwargs):
         return collections.OrderedDict()
 
+    def _compile_parse_events(cls):
+        """
+        Build the parse plan for this class.
+
+        The parse plan is a suspendable function which behaves exactly like
+        the generic algorithm described in :meth:`parse_events`, but has all
+        the class-level lookups (descriptor maps, text and collector
+        descriptors, unknown attribute and child policies) resolved once in
+        advance. Attributes which need no handling when they are absent
+        (those without `missing` callback and with a default) are not visited
+        at all in that case.
+
+        The plan is cached on the class and dropped whenever the class is
+        modified (see :meth:`_invalidate_plans`).
+        """
+        attr_map = cls.ATTR_MAP
+        child_map = cls.CHILD_MAP
+        missing_attrs = [
+            (key, prop)
+            for key, prop in attr_map.items()
+            if not (type(prop).handle_missing is Attr.handle_missing and
+                    prop.missing is None and
+                    prop.default is not _PropBase.NO_DEFAULT)
+        ]
+        lang_prop = attr_map.get((namespaces.xml, "lang"))
+        text_prop = cls.TEXT_PROPERTY
+        if text_prop:
+            text_prop = text_prop.xq_descriptor
+        else:
+            text_prop = None
+        collector_prop = cls.COLLECTOR_PROPERTY
+        if collector_prop:
+            collector_prop = collector_prop.xq_descriptor
+        else:
+            collector_prop = None
+        drop_unknown_attrs = (
+            getattr(cls, "UNKNOWN_ATTR_POLICY", None) ==
+            UnknownAttrPolicy.DROP
+        )
+        unknown_child_policy = getattr(cls, "UNKNOWN_CHILD_POLICY", None)
+        new = cls.__new__
+
+        def parse_events(ev_args, parent_ctx):
+            with parent_ctx as ctx:
+                obj = new(cls)
+                attrs = ev_args[2]
+                for key, value in attrs.items():
+                    prop = attr_map.get(key)
+                    if prop is None:
+                        if drop_unknown_attrs:
+                            continue
+                        raise ValueError(
+                            "unexpected attribute {!r} on {}".format(
+                                key,
+                                tag_to_str((ev_args[0], ev_args[1]))
+                            ))
+                    try:
+                        prop.from_value(obj, value)
+                    except:
+                        logger.debug("while parsing XSO", exc_info=True)
+                        # true means suppress
+                        if not obj.xso_error_handler(
+                                prop,
+                                value,
+                                sys.exc_info()):
+                            raise
+
+                for key, prop in missing_attrs:
+                    if key in attrs:
+                        continue
+                    try:
+                        prop.handle_missing(obj, ctx)
+                    except:
+                        logger.debug("while parsing XSO", exc_info=True)
+                        # true means suppress
+                        if not obj.xso_error_handler(
+                                prop,
+                                None,
+                                sys.exc_info()):
+                            raise
+
+                if lang_prop is not None:
+                    lang = lang_prop.__get__(obj, cls)
+                    if lang is not None:
+                        ctx.lang = lang
+
+                collected_text = []
+                while True:
+                    ev_type, *ev_args = yield
+                    if ev_type == "end":
+                        break
+                    elif ev_type == "text":
+                        if text_prop is None:
+                            if ev_args[0].strip():
+                                # true means suppress
+                                if not obj.xso_error_handler(
+                                        None,
+                                        ev_args[0],
+                                        None):
+                                    raise ValueError("unexpected text")
+                        else:
+                            collected_text.append(ev_args[0])
+                    elif ev_type == "start":
+                        handler = child_map.get((ev_args[0], ev_args[1]))
+                        if handler is None:
+                            if collector_prop is None:
+                                yield from enforce_unknown_child_policy(
+                                    unknown_child_policy,
+                                    ev_args,
+                                    obj.xso_error_handler)
+                                continue
+                            handler = collector_prop
+                        try:
+                            yield from guard(
+                                handler.from_events(obj, ev_args, ctx),
+                                ev_args
+                            )
+                        except:
+                            logger.debug("while parsing XSO", exc_info=True)
+                            # true means suppress
+                            if not obj.xso_error_handler(
+                                    handler,
+                                    ev_args,
+                                    sys.exc_info()):
+                                raise
+
+                if collected_text:
+                    collected_text = "".join(collected_text)
+                    try:
+                        text_prop.from_value(obj, collected_text)
+                    except:
+                        logger.debug("while parsing XSO", exc_info=True)
+                        # true means suppress
+                        if not obj.xso_error_handler(
+                                text_prop,
+                                collected_text,
+                                sys.exc_info()):
+                            raise
+
+            obj.validate()
+
+            obj.xso_after_load()
+
+            return obj
+
+        return parse_events
+
+    def _invalidate_plans(cls):
+        """
+        Drop the cached parse plan and the cached serialisation plans (see
+        :class:`aioxmpp.xml.XMPPXMLSerializer`) of this class and all of its
+        subclasses.
+        """
+        for name in ("_xso_parse_plan", "_xso_unparse_plans"):
+            if name in cls.__dict__:
+                type.__delattr__(cls, name)
+        for subclass in cls.__subclasses__():
+            if isinstance(subclass, XMLStreamClass):
+                subclass._invalidate_plans()
+
     def parse_events(cls, ev_args, parent_ctx):
         """
         Create an instance of this class, using the events sent into this
@@ -1721,118 +1883,23 @@ class XMLStreamClass(xso_query.Class, abc.ABCMeta):
            not called. See the documentation of :meth:`.xso.XSO` for details.
 
         This method is suspendable.
-        """
-        with parent_ctx as ctx:
-            obj = cls.__new__(cls)
-            attrs = ev_args[2]
-            attr_map = cls.ATTR_MAP.copy()
-            for key, value in attrs.items():
-                try:
-                    prop = attr_map.pop(key)
-                except KeyError:
-                    if cls.UNKNOWN_ATTR_POLICY == UnknownAttrPolicy.DROP:
-                        continue
-                    else:
-                        raise ValueError(
-                            "unexpected attribute {!r} on {}".format(
-                                key,
-                                tag_to_str((ev_args[0], ev_args[1]))
-                            )) from None
-                try:
-                    prop.from_value(obj, value)
-                except:
-                    logger.debug("while parsing XSO", exc_info=True)
-                    # true means suppress
-                    if not obj.xso_error_handler(
-                            prop,
-                            value,
-                            sys.exc_info()):
-                        raise
-
-            for key, prop in attr_map.items():
-                try:
-                    prop.handle_missing(obj, ctx)
-                except:
-                    logger.debug("while parsing XSO", exc_info=True)
-                    # true means suppress
-                    if not obj.xso_error_handler(
-                            prop,
-                            None,
-                            sys.exc_info()):
-                        raise
 
-            try:
-                prop = cls.ATTR_MAP[namespaces.xml, "lang"]
-            except KeyError:
-                pass
-            else:
-                lang = prop.__get__(obj, cls)
-                if lang is not None:
-                    ctx.lang = lang
-
-            collected_text = []
-            while True:
-                ev_type, *ev_args = yield
-                if ev_type == "end":
-                    break
-                elif ev_type == "text":
-                    if not cls.TEXT_PROPERTY:
-                        if ev_args[0].strip():
-                            # true means suppress
-                            if not obj.xso_error_handler(
-                                    None,
-                                    ev_args[0],
-                                    None):
-                                raise ValueError("unexpected text")
-                    else:
-                        collected_text.append(ev_args[0])
-                elif ev_type == "start":
-                    try:
-                        handler = cls.CHILD_MAP[ev_args[0], ev_args[1]]
-                    except KeyError:
-                        if cls.COLLECTOR_PROPERTY:
-                            handler = cls.COLLECTOR_PROPERTY.xq_descriptor
-                        else:
-                            yield from enforce_unknown_child_policy(
-                                cls.UNKNOWN_CHILD_POLICY,
-                                ev_args,
-                                obj.xso_error_handler)
-                            continue
-                    try:
-                        yield from guard(
-                            handler.from_events(obj, ev_args, ctx),
-                            ev_args
-                        )
-                    except:
-                        logger.debug("while parsing XSO", exc_info=True)
-                        # true means suppress
-                        if not obj.xso_error_handler(
-                                handler,
-                                ev_args,
-                                sys.exc_info()):
-                            raise
+        Parsing is delegated to a parse plan which is specialised for this
+        class and built on first use from :attr:`ATTR_MAP`, :attr:`CHILD_MAP`,
+        :attr:`TEXT_PROPERTY`, :attr:`COLLECTOR_PROPERTY` and the unknown
+        attribute and child policies. Modifying the class (for example using
+        :meth:`register_child` or by assigning attributes) discards the plan.
 
-            if collected_text:
-                collected_text = "".join(collected_text)
-                try:
-                    cls.TEXT_PROPERTY.xq_descriptor.from_value(
-                        obj,
-                        collected_text
-                    )
-                except:
-                    logger.debug("while parsing XSO", exc_info=True)
-                    # true means suppress
-                    if not obj.xso_error_handler(
-                            cls.TEXT_PROPERTY.xq_descriptor,
-                            collected_text,
-                            sys.exc_info()):
-                        raise
-
-        obj.validate()
-
-        obj.xso_after_load()
+        .. versionchanged:: 0.8
 
-        return obj
+           Parsing uses a per-class parse plan.
+        """
+        try:
+            plan = cls.__dict__["_xso_parse_plan"]
+        except KeyError:
+            plan = cls._compile_parse_events()
+            type.__setattr__(cls, "_xso_parse_plan", plan)
+        return plan(ev_args, parent_ctx)
 
     def register_child(cls, prop, child_cls):
         """
@@ -1879,6 +1946,7 @@ class XMLStreamClass(xso_query.Class, abc.ABCMeta):
 
         prop.xq_descriptor._register(child_cls)
         cls.CHILD_MAP[child_cls.TAG] = prop.xq_descriptor
+        cls._invalidate_plans()
 
 
 # I know it makes only partially sense to have a separate metasubclass for
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+########################################################################
+# File name: bench_broker.py
+# This file is part of: aioxmpp
+#
+# LICENSE
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program.  If not, see
+# <http://www.gnu.org/licenses/>.
+#
+########################################################################
+"""
+Measure the overhead of the :class:`aioxmpp.stream.StanzaStream` broker task.
+
+Two scenarios are measured against a stub XML stream which discards
+everything sent to it:
+
+* *busy*: one stream which receives and sends stanzas, one of each per event
+  loop iteration. Reported in stanzas per second.
+* *idle*: many started streams which have nothing to do. Reported as the CPU
+  time spent per stream and second.
+"""
+import argparse
+import asyncio
+import time
+
+import aioxmpp.callbacks as callbacks
+import aioxmpp.stanza as stanza
+import aioxmpp.stream as stream
+import aioxmpp.structs as structs
+import aioxmpp.xso as xso
+
+from aioxmpp.structs import JID
+
+
+class StubXMLStream:
+    on_closing = callbacks.AdHocSignal()
+    writing_paused = False
+
+    def __init__(self):
+        self.stanza_parser = xso.XSOParser()
+        self.error_handler = None
+        self.nsent = 0
+
+    def send_xso(self, obj):
+        self.nsent += 1
+
+    @asyncio.coroutine
+    def drain(self):
+        pass
+
+    def close(self):
+        pass
+
+    def abort(self):
+        pass
+
+
+def make_stream(loop):
+    s = stream.StanzaStream(JID.fromstr("foo@example.test"), loop=loop)
+    s.register_presence_callback(
+        structs.PresenceType.AVAILABLE,
+        None,
+        lambda pres: None,
+    )
+    xmlstream = StubXMLStream()
+    s.start(xmlstream)
+    return s, xmlstream
+
+
+@asyncio.coroutine
+def run_busy(loop, count):
+    s, xmlstream = make_stream(loop)
+    incoming = stanza.Presence(
+        type_=structs.PresenceType.AVAILABLE,
+        from_=JID.fromstr("bar@example.test/x"),
+    )
+    outgoing = stanza.Message(
+        type_=structs.MessageType.CHAT,
+        to=JID.fromstr("bar@example.test/x"),
+    )
+
+    start = time.perf_counter()
+    for i in range(count):
+        s.recv_stanza(incoming)
+        s.enqueue(outgoing)
+        yield from asyncio.sleep(0)
+    while xmlstream.nsent < count:
+        yield from asyncio.sleep(0)
+    elapsed = time.perf_counter() - start
+
+    yield from s.wait_stop()
+    return elapsed
+
+
+@asyncio.coroutine
+def run_idle(loop, nstreams, duration):
+    streams = [make_stream(loop)[0] for _ in range(nstreams)]
+    yield from asyncio.sleep(0)
+
+    start = time.process_time()
+    yield from asyncio.sleep(duration)
+    elapsed = time.process_time() - start
+
+    for s in streams:
+        yield from s.wait_stop()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "-n", "--stanzas",
+        type=int,
+        default=20000,
+        help="Number of stanzas for the busy scenario (default: %(default)s)"
+    )
+    parser.add_argument(
+        "-s", "--streams",
+        type=int,
+        default=1000,
+        help="Number of streams for the idle scenario (default: %(default)s)"
+    )
+    parser.add_argument(
+        "-d", "--duration",
+        type=float,
+        default=5,
+        help="Duration of the idle scenario in seconds "
+        "(default: %(default)s)"
+    )
+
+    args = parser.parse_args()
+
+    loop = asyncio.get_event_loop()
+
+    elapsed = loop.run_until_complete(run_busy(loop, args.stanzas))
+    print("busy: {:10.0f} stanzas/s".format(args.stanzas / elapsed))
+
+    elapsed = loop.run_until_complete(
+        run_idle(loop, args.streams, args.duration)
+    )
+    print("idle: {:10.1f} us CPU per stream and second".format(
+        elapsed / args.streams / args.duration * 1e6
+    ))
+
+
+if __name__ == "__main__":
+    main()
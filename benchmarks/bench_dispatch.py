@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+########################################################################
+# File name: bench_dispatch.py
+# This file is part of: aioxmpp
+#
+# LICENSE
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program.  If not, see
+# <http://www.gnu.org/licenses/>.
+#
+########################################################################
+"""
+Measure the throughput of the message and presence dispatch of
+:class:`aioxmpp.stream.StanzaStream`.
+
+The stream has callbacks registered for many MUC rooms (groupchat messages
+from the bare room JID) and for many peers (chat messages from full JIDs),
+plus the wildcard fallbacks. Incoming stanzas are distributed over rooms,
+peers and unknown senders and passed through the dispatch of the stream,
+without the broker task.
+"""
+import argparse
+import asyncio
+import itertools
+import time
+
+import aioxmpp.stanza as stanza
+import aioxmpp.stream as stream
+import aioxmpp.structs as structs
+
+from aioxmpp.structs import JID
+
+
+def noop(stanza_obj):
+    pass
+
+
+def make_stanzas(nrooms, npeers, count):
+    senders = []
+    for i in range(nrooms):
+        senders.append((
+            structs.MessageType.GROUPCHAT,
+            JID.fromstr("room{}@muc.example.test/nick{}".format(i, i % 7)),
+        ))
+    for i in range(npeers):
+        senders.append((
+            structs.MessageType.CHAT,
+            JID.fromstr("peer{}@example.test/res".format(i)),
+        ))
+    for i in range(max(1, (nrooms + npeers) // 10)):
+        senders.append((
+            structs.MessageType.CHAT,
+            JID.fromstr("stranger{}@example.test/res".format(i)),
+        ))
+
+    messages = [
+        stanza.Message(type_=type_, from_=from_)
+        for type_, from_ in itertools.islice(itertools.cycle(senders), count)
+    ]
+    presences = [
+        stanza.Presence(type_=structs.PresenceType.AVAILABLE, from_=from_)
+        for _, from_ in itertools.islice(itertools.cycle(senders), count)
+    ]
+    return messages, presences
+
+
+def make_stream(loop, nrooms, npeers):
+    s = stream.StanzaStream(JID.fromstr("foo@example.test"), loop=loop)
+    for i in range(nrooms):
+        room = JID.fromstr("room{}@muc.example.test".format(i))
+        s.register_message_callback(
+            structs.MessageType.GROUPCHAT, room, noop,
+        )
+        s.register_presence_callback(
+            structs.PresenceType.AVAILABLE, room, noop,
+        )
+    for i in range(npeers):
+        peer = JID.fromstr("peer{}@example.test/res".format(i))
+        s.register_message_callback(
+            structs.MessageType.CHAT, peer, noop,
+        )
+        s.register_presence_callback(
+            structs.PresenceType.AVAILABLE, peer, noop,
+        )
+    s.register_message_callback(structs.MessageType.CHAT, None, noop)
+    s.register_message_callback(None, None, noop)
+    s.register_presence_callback(structs.PresenceType.AVAILABLE, None, noop)
+    return s
+
+
+def run(loop, process, stanzas):
+    start = time.perf_counter()
+    for i, stanza_obj in enumerate(stanzas, 1):
+        process(stanza_obj)
+        if i % 1000 == 0:
+            # run the scheduled callbacks
+            loop.run_until_complete(asyncio.sleep(0))
+    loop.run_until_complete(asyncio.sleep(0))
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "-n", "--stanzas",
+        type=int,
+        default=100000,
+        help="Number of stanzas of each kind (default: %(default)s)"
+    )
+    parser.add_argument(
+        "-r", "--rooms",
+        type=int,
+        default=1000,
+        help="Number of MUC rooms (default: %(default)s)"
+    )
+    parser.add_argument(
+        "-p", "--peers",
+        type=int,
+        default=1000,
+        help="Number of peers (default: %(default)s)"
+    )
+
+    args = parser.parse_args()
+
+    loop = asyncio.get_event_loop()
+    s = make_stream(loop, args.rooms, args.peers)
+    messages, presences = make_stanzas(args.rooms, args.peers, args.stanzas)
+
+    elapsed = run(loop, s._process_incoming_message, messages)
+    print("messages:  {:10.0f} stanzas/s".format(args.stanzas / elapsed))
+
+    elapsed = run(loop, s._process_incoming_presence, presences)
+    print("presences: {:10.0f} stanzas/s".format(args.stanzas / elapsed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+########################################################################
+# File name: bench_iq_timeouts.py
+# This file is part of: aioxmpp
+#
+# LICENSE
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program.  If not, see
+# <http://www.gnu.org/licenses/>.
+#
+########################################################################
+"""
+Measure the cost of tracking the timeouts of many pending IQ requests.
+
+A number of response futures is registered with the IQ response dispatcher of
+:class:`aioxmpp.stream.StanzaStream`, each with a timeout. Half of the
+requests receive a response, the others time out. This is done once with one
+:func:`asyncio.wait_for` task per request, as :meth:`StanzaStream.send` used
+to do, and once with the timing wheel of the stream.
+
+For each variant, the time to set up the timeouts, the time until all futures
+are done and the peak number of timer handles on the loop are printed.
+"""
+import argparse
+import asyncio
+import time
+
+import aioxmpp.stanza as stanza
+import aioxmpp.stream as stream
+import aioxmpp.structs as structs
+
+from aioxmpp.structs import JID
+
+
+PEER = JID.fromstr("pubsub.example.test")
+
+
+def make_responses(count):
+    responses = []
+    for i in range(count):
+        iq = stanza.IQ(type_=structs.IQType.RESULT, from_=PEER)
+        iq.id_ = "iq{}".format(i)
+        responses.append(iq)
+    return responses
+
+
+def register(s, count):
+    futures = []
+    for i in range(count):
+        fut = asyncio.Future()
+        s.register_iq_response_future(PEER, "iq{}".format(i), fut)
+        futures.append(fut)
+    return futures
+
+
+@asyncio.coroutine
+def wait_for_one(fut, timeout):
+    try:
+        yield from asyncio.wait_for(fut, timeout=timeout)
+    except asyncio.TimeoutError:
+        pass
+
+
+def run_wait_for(loop, s, responses, timeout):
+    futures = register(s, len(responses))
+    start = time.perf_counter()
+    tasks = [
+        asyncio.async(wait_for_one(fut, timeout), loop=loop)
+        for fut in futures
+    ]
+    loop.run_until_complete(asyncio.sleep(0))
+    setup = time.perf_counter() - start
+    handles = len(loop._scheduled)
+
+    for response in responses[::2]:
+        s._process_incoming_iq(response)
+    loop.run_until_complete(asyncio.wait(tasks))
+    return setup, time.perf_counter() - start, handles
+
+
+def run_wheel(loop, s, responses, timeout):
+    futures = register(s, len(responses))
+    wheel = s._iq_response_timeouts
+    start = time.perf_counter()
+    for fut in futures:
+        wheel.schedule(fut, timeout)
+    setup = time.perf_counter() - start
+    handles = len(loop._scheduled)
+
+    for response in responses[::2]:
+        s._process_incoming_iq(response)
+    for fut in futures[::2]:
+        wheel.cancel(fut)
+    loop.run_until_complete(asyncio.wait(futures))
+    return setup, time.perf_counter() - start, handles
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "-n", "--requests",
+        type=int,
+        default=100000,
+        help="Number of pending IQ requests (default: %(default)s)"
+    )
+    parser.add_argument(
+        "-t", "--timeout",
+        type=float,
+        default=2.0,
+        help="Timeout of the requests in seconds (default: %(default)s)"
+    )
+
+    args = parser.parse_args()
+
+    loop = asyncio.get_event_loop()
+    s = stream.StanzaStream(JID.fromstr("foo@example.test"), loop=loop)
+    responses = make_responses(args.requests)
+
+    for name, run in [("wait_for", run_wait_for), ("wheel", run_wheel)]:
+        setup, total, handles = run(loop, s, responses, args.timeout)
+        print("{:8s}  setup: {:7.3f} s  total: {:7.3f} s  "
+              "timer handles: {:6d}".format(name, setup, total, handles))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+########################################################################
+# File name: bench_jid.py
+# This file is part of: aioxmpp
+#
+# LICENSE
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program.  If not, see
+# <http://www.gnu.org/licenses/>.
+#
+########################################################################
+"""
+Measure the cost of constructing :class:`aioxmpp.JID` objects.
+
+The following operations are timed, each in microseconds per call:
+
+* *fromstr (hot)*: parsing a small set of JIDs over and over, as it happens
+  for the ``from`` and ``to`` attributes of a busy stream.
+* *fromstr (cold)*: parsing JIDs with all caches cleared before each call, i.e.
+  the cost of the stringprep profiles themselves.
+* *bare*: obtaining the bare JID of a full JID.
+* *nodeprep*: running Nodeprep on an ASCII and on a non-ASCII localpart.
+"""
+import argparse
+import itertools
+import timeit
+
+import aioxmpp.structs as structs
+
+from aioxmpp.stringprep import nodeprep
+from aioxmpp.structs import JID
+
+
+def clear_caches():
+    structs._jid_fromstr.cache_clear()
+    structs._bare_jid.cache_clear()
+    structs._nodeprep_cached.cache_clear()
+    structs._nameprep_cached.cache_clear()
+    structs._resourceprep_cached.cache_clear()
+
+
+def bench(stmt, number, setup=None):
+    timer = timeit.Timer(stmt, setup=setup or "pass")
+    return min(timer.repeat(repeat=5, number=number)) / number * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "-n", "--number",
+        type=int,
+        default=20000,
+        help="Number of calls per measurement (default: %(default)s)"
+    )
+    parser.add_argument(
+        "-j", "--jids",
+        type=int,
+        default=100,
+        help="Number of distinct JIDs in the hot set (default: %(default)s)"
+    )
+
+    args = parser.parse_args()
+
+    jids = [
+        "user{}@Example.test/Resource{}".format(i, i)
+        for i in range(args.jids)
+    ]
+    full = JID.fromstr(jids[0])
+    hot = itertools.cycle(jids)
+
+    def fromstr_hot():
+        JID.fromstr(next(hot))
+
+    def fromstr_cold():
+        clear_caches()
+        JID.fromstr(jids[0])
+
+    print("fromstr (hot):  {:8.2f} us".format(
+        bench(fromstr_hot, args.number)
+    ))
+    print("fromstr (cold): {:8.2f} us".format(
+        bench(fromstr_cold, args.number // 10)
+    ))
+    print("bare:           {:8.2f} us".format(
+        bench(full.bare, args.number)
+    ))
+    print("nodeprep ascii: {:8.2f} us".format(
+        bench(lambda: nodeprep("SomeUser.Name"), args.number)
+    ))
+    print("nodeprep other: {:8.2f} us".format(
+        bench(lambda: nodeprep("SomeUser.Nämé"), args.number)
+    ))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+########################################################################
+# File name: bench_parser_backends.py
+# This file is part of: aioxmpp
+#
+# LICENSE
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program.  If not, see
+# <http://www.gnu.org/licenses/>.
+#
+########################################################################
+"""
+Compare the throughput of the SAX and the expat XML parser backends of
+:class:`aioxmpp.protocol.XMLStream` in stanzas per second.
+
+By default, only hollow XSO classes without any descriptors are registered
+at the XSO parser, so that all stanza contents are dropped and the cost of the
+parser backend dominates. With ``--with-xso``, the stanzas are fully converted
+into :class:`~aioxmpp.Message`, :class:`~aioxmpp.Presence` and
+:class:`~aioxmpp.IQ` objects.
+"""
+import argparse
+import time
+
+import aioxmpp.stanza as stanza
+import aioxmpp.xml as xml
+import aioxmpp.xso as xso
+
+from aioxmpp.utils import namespaces
+
+
+STREAM_HEADER = (
+    "<stream:stream xmlns='jabber:client' xmlns:stream='{}' version='1.0' "
+    "from='example.test' to='foo@example.test/res' id='abc'>".format(
+        namespaces.xmlstream
+    )
+).encode("utf-8")
+
+STANZAS = [
+    b"<message from='bar@example.test/x' to='foo@example.test/res' "
+    b"type='chat' id='m{}'><body>Hello World &amp; Co.</body>"
+    b"<thread>t1</thread></message>",
+    b"<presence from='baz@example.test/y' to='foo@example.test/res' "
+    b"id='p{}'><show>away</show><status xml:lang='en'>Lunch</status>"
+    b"<priority>5</priority></presence>",
+    b"<iq from='example.test' to='foo@example.test/res' type='result' "
+    b"id='i{}'/>",
+]
+
+
+def make_chunks(count, chunk_size):
+    data = b"".join(
+        STANZAS[i % len(STANZAS)].replace(b"{}", str(i).encode("ascii"))
+        for i in range(count)
+    )
+    return [
+        data[i:i+chunk_size]
+        for i in range(0, len(data), chunk_size)
+    ]
+
+
+class HollowMessage(xso.XSO):
+    TAG = (namespaces.client, "message")
+
+
+class HollowPresence(xso.XSO):
+    TAG = (namespaces.client, "presence")
+
+
+class HollowIQ(xso.XSO):
+    TAG = (namespaces.client, "iq")
+
+
+def make_stanza_parser(received, with_xso):
+    if with_xso:
+        classes = [stanza.Message, stanza.Presence, stanza.IQ]
+    else:
+        classes = [HollowMessage, HollowPresence, HollowIQ]
+
+    parser = xso.XSOParser()
+    for cls in classes:
+        parser.add_class(cls, received.append)
+    return parser
+
+
+def make_sax(stanza_parser):
+    processor = xml.XMPPXMLProcessor()
+    processor.stanza_parser = stanza_parser
+    parser = xml.make_parser()
+    parser.setContentHandler(processor)
+    return parser
+
+
+def make_expat(stanza_parser):
+    processor = xml.XMPPXMLExpatProcessor()
+    processor.stanza_parser = stanza_parser
+    return processor
+
+
+def run(factory, chunks, count, with_xso):
+    received = []
+    parser = factory(make_stanza_parser(received, with_xso))
+    parser.feed(STREAM_HEADER)
+    start = time.perf_counter()
+    for chunk in chunks:
+        parser.feed(chunk)
+    elapsed = time.perf_counter() - start
+    assert len(received) == count, (len(received), count)
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "-n", "--stanzas",
+        type=int,
+        default=30000,
+        help="Number of stanzas to parse per run (default: %(default)s)"
+    )
+    parser.add_argument(
+        "-c", "--chunk-size",
+        type=int,
+        default=4096,
+        help="Size of the chunks fed to the parser (default: %(default)s)"
+    )
+    parser.add_argument(
+        "-r", "--repeat",
+        type=int,
+        default=3,
+        help="Number of runs per backend; the best run is reported "
+        "(default: %(default)s)"
+    )
+    parser.add_argument(
+        "--with-xso",
+        action="store_true",
+        default=False,
+        help="Register stanza classes and build the XSO objects, too"
+    )
+
+    args = parser.parse_args()
+
+    chunks = make_chunks(args.stanzas, args.chunk_size)
+
+    results = {}
+    for name, factory in [("sax", make_sax), ("expat", make_expat)]:
+        elapsed = min(
+            run(factory, chunks, args.stanzas, args.with_xso)
+            for _ in range(args.repeat)
+        )
+        results[name] = elapsed
+        print("{:>6s}: {:10.0f} stanzas/s".format(
+            name,
+            args.stanzas / elapsed,
+        ))
+
+    print("speedup: {:.2f}x".format(results["sax"] / results["expat"]))
+
+
+if __name__ == "__main__":
+    main()
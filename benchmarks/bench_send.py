@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+########################################################################
+# File name: bench_send.py
+# This file is part of: aioxmpp
+#
+# LICENSE
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program.  If not, see
+# <http://www.gnu.org/licenses/>.
+#
+########################################################################
+"""
+Measure the cost of sending many messages through
+:class:`aioxmpp.stream.StanzaStream`.
+
+Messages without ID are put into the active queue with
+:meth:`~aioxmpp.stream.StanzaStream.enqueue` and handed to an XML stream which
+discards them, without the broker task. This is done once with the stanza ID
+generator and once with the previous scheme, which drew fresh random data for
+every stanza.
+"""
+import argparse
+import base64
+import random
+import time
+import unittest.mock
+
+import aioxmpp.stanza as stanza
+import aioxmpp.stream as stream
+import aioxmpp.structs as structs
+
+from aioxmpp.structs import JID
+
+
+PEER = JID.fromstr("peer@example.test")
+
+
+def legacy_id():
+    return "x" + base64.b64encode(random.getrandbits(
+        stanza.RANDOM_ID_BYTES * 8
+    ).to_bytes(
+        stanza.RANDOM_ID_BYTES, "little"
+    )).decode("ascii")
+
+
+def make_messages(count):
+    messages = []
+    for i in range(count):
+        msg = stanza.Message(type_=structs.MessageType.CHAT, to=PEER)
+        msg.body[None] = "message {}".format(i)
+        messages.append(msg)
+    return messages
+
+
+def run(count, next_id):
+    xmlstream = unittest.mock.Mock(["send_xso", "writing_paused"])
+    xmlstream.send_xso = lambda obj: None
+    xmlstream.writing_paused = False
+    s = stream.StanzaStream(JID.fromstr("foo@example.test"))
+    s._id_generator = next_id
+    messages = make_messages(count)
+
+    start = time.perf_counter()
+    for msg in messages:
+        s.enqueue(msg)
+    enqueued = time.perf_counter()
+    s._process_outgoing(xmlstream, s._active_queue.get_nowait())
+    end = time.perf_counter()
+
+    return count / (enqueued - start), count / (end - start)
+
+
+def bench_ids(number):
+    msg = stanza.Message(type_=structs.MessageType.CHAT)
+    start = time.perf_counter()
+    for i in range(number):
+        msg.id_ = None
+        msg.autoset_id()
+    return (time.perf_counter() - start) / number * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "-n", "--messages",
+        type=int,
+        default=100000,
+        help="Number of messages to send (default: %(default)s)"
+    )
+
+    args = parser.parse_args()
+
+    for name, next_id in [("batched", stanza._IDGenerator()),
+                          ("random", legacy_id)]:
+        with unittest.mock.patch("aioxmpp.stanza._next_id", new=next_id):
+            id_cost = bench_ids(args.messages)
+        enqueue_rate, total_rate = run(args.messages, next_id)
+        print("{:8s}  autoset_id: {:6.2f} us  enqueue: {:9.0f} stanzas/s  "
+              "enqueue+send: {:9.0f} stanzas/s".format(
+                  name, id_cost, enqueue_rate, total_rate))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+########################################################################
+# File name: bench_serializer.py
+# This file is part of: aioxmpp
+#
+# LICENSE
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program.  If not, see
+# <http://www.gnu.org/licenses/>.
+#
+########################################################################
+"""
+Compare the throughput of :func:`aioxmpp.xml.write_xmlstream` with the SAX
+based :class:`aioxmpp.xml.XMPPXMLGenerator` and with the direct-to-bytes
+:class:`aioxmpp.xml.XMPPXMLSerializer`, in stanzas per second.
+
+The number of writes issued to the transport per stanza is reported, too.
+"""
+import argparse
+import time
+
+import aioxmpp.stanza as stanza
+import aioxmpp.xml as xml
+
+from aioxmpp.structs import JID
+
+
+class CountingSink:
+    def __init__(self):
+        self.nbytes = 0
+        self.nwrites = 0
+
+    def write(self, data):
+        self.nbytes += len(data)
+        self.nwrites += 1
+
+    def flush(self):
+        pass
+
+
+def make_stanzas(count):
+    to = JID.fromstr("foo@example.test/res")
+    from_ = JID.fromstr("bar@example.test/x")
+
+    result = []
+    for i in range(count):
+        if i % 3 == 0:
+            obj = stanza.Message(type_="chat", to=to, from_=from_)
+            obj.body[None] = "Hello <World> & Co. {}".format(i)
+        elif i % 3 == 1:
+            obj = stanza.Presence(to=to, from_=from_)
+            obj.status[None] = "Lunch"
+            obj.priority = 5
+        else:
+            obj = stanza.IQ(type_="result", to=to, from_=from_)
+        obj.id_ = "id{}".format(i)
+        result.append(obj)
+    return result
+
+
+def run(stanzas, use_serializer):
+    sink = CountingSink()
+    writer = xml.write_xmlstream(
+        sink,
+        JID.fromstr("example.test"),
+        nsmap={None: "jabber:client"},
+        use_serializer=use_serializer,
+    )
+    next(writer)
+    nwrites = sink.nwrites
+    start = time.perf_counter()
+    for obj in stanzas:
+        writer.send(obj)
+    elapsed = time.perf_counter() - start
+    return elapsed, sink.nwrites - nwrites
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "-n", "--stanzas",
+        type=int,
+        default=20000,
+        help="Number of stanzas to serialize per run (default: %(default)s)"
+    )
+    parser.add_argument(
+        "-r", "--repeat",
+        type=int,
+        default=3,
+        help="Number of runs per backend; the best run is reported "
+        "(default: %(default)s)"
+    )
+
+    args = parser.parse_args()
+
+    stanzas = make_stanzas(args.stanzas)
+
+    results = {}
+    for name, use_serializer in [("sax", False), ("direct", True)]:
+        runs = [run(stanzas, use_serializer) for _ in range(args.repeat)]
+        elapsed, nwrites = min(runs)
+        results[name] = elapsed
+        print("{:>6s}: {:10.0f} stanzas/s, {:5.1f} writes/stanza".format(
+            name,
+            args.stanzas / elapsed,
+            nwrites / args.stanzas,
+        ))
+
+    print("speedup: {:.2f}x".format(results["sax"] / results["direct"]))
+
+
+if __name__ == "__main__":
+    main()
@@ -21,6 +21,9 @@
 ########################################################################
 import asyncio
 import unittest
+import unittest.mock
+
+from datetime import timedelta
 
 import aioxmpp.service as service
 import aioxmpp.disco.service as disco_service
@@ -338,6 +341,52 @@ class TestNode(unittest.TestCase):
             set(n.iter_identities())
         )
 
+    def test_as_info_xso(self):
+        n = disco_service.Node()
+        n.register_feature("uri:foo")
+        n.register_identity(
+            "client", "pc",
+            names={
+                structs.LanguageTag.fromstr("en"): "test identity",
+            }
+        )
+
+        info = n.as_info_xso()
+        self.assertIsInstance(info, disco_xso.InfoQuery)
+        self.assertSetEqual(
+            {"uri:foo", namespaces.xep0030_info},
+            info.features,
+        )
+        self.assertSetEqual(
+            {
+                ("client", "pc",
+                 structs.LanguageTag.fromstr("en"), "test identity"),
+            },
+            set((item.category, item.type_, item.lang, item.name)
+                for item in info.identities)
+        )
+
+    def test_as_info_xso_is_reused_until_info_changes(self):
+        n = disco_service.Node()
+        n.register_identity("client", "pc")
+
+        info = n.as_info_xso()
+        self.assertIs(n.as_info_xso(), info)
+
+        n.register_feature("uri:foo")
+        new_info = n.as_info_xso()
+        self.assertIsNot(new_info, info)
+        self.assertIn("uri:foo", new_info.features)
+
+        n.unregister_feature("uri:foo")
+        self.assertNotIn("uri:foo", n.as_info_xso().features)
+
+        n.register_identity("client", "bot")
+        info = n.as_info_xso()
+        n.unregister_identity("client", "bot")
+        self.assertIsNot(n.as_info_xso(), info)
+        self.assertEqual(len(n.as_info_xso().identities), 1)
+
 
 class TestStaticNode(unittest.TestCase):
     def setUp(self):
@@ -460,6 +509,17 @@ class TestDiscoServer(unittest.TestCase):
 
         self.assertFalse(response.node)
 
+    def test_response_is_reused_until_info_changes(self):
+        response1 = run_coroutine(self.s.handle_info_request(self.request_iq))
+        response2 = run_coroutine(self.s.handle_info_request(self.request_iq))
+        self.assertIs(response1, response2)
+
+        self.s.register_feature("uri:foo")
+
+        response3 = run_coroutine(self.s.handle_info_request(self.request_iq))
+        self.assertIsNot(response3, response1)
+        self.assertIn("uri:foo", response3.features)
+
     def test_nonexistant_node_response(self):
         self.request_iq.payload.node = "foobar"
         with self.assertRaises(errors.XMPPModifyError) as ctx:
@@ -1371,3 +1431,122 @@ class TestDiscoClient(unittest.TestCase):
             run_coroutine(request)
 
         self.assertIs(ctx.exception, exc)
+
+    def test_statistics_count_hits_and_misses(self):
+        to = structs.JID.fromstr("user@foo.example/res1")
+
+        with unittest.mock.patch.object(
+                self.s,
+                "send_and_decode_info_query",
+                new=CoroutineMock()) as send_and_decode:
+            send_and_decode.return_value = disco_xso.InfoQuery()
+
+            run_coroutine(self.s.query_info(to))
+            run_coroutine(self.s.query_info(to))
+
+        stats = self.s.statistics
+        self.assertIsInstance(stats, disco_service.CacheStatistics)
+        self.assertEqual(stats.info_entries, 1)
+        self.assertEqual(stats.items_entries, 0)
+        self.assertEqual(stats.hits, 1)
+        self.assertEqual(stats.misses, 1)
+
+        self.s.reset_statistics()
+        stats = self.s.statistics
+        self.assertEqual(stats.hits, 0)
+        self.assertEqual(stats.misses, 0)
+        self.assertEqual(stats.info_entries, 1)
+
+    def test_cache_size_evicts_least_recently_used(self):
+        self.s.cache_size = 2
+        jids = [
+            structs.JID.fromstr("user@foo.example/res{}".format(i))
+            for i in range(3)
+        ]
+
+        with unittest.mock.patch.object(
+                self.s,
+                "send_and_decode_info_query",
+                new=CoroutineMock()) as send_and_decode:
+            send_and_decode.return_value = disco_xso.InfoQuery()
+
+            run_coroutine(self.s.query_info(jids[0]))
+            run_coroutine(self.s.query_info(jids[1]))
+            # touch the first entry so that the second one is evicted
+            run_coroutine(self.s.query_info(jids[0]))
+            run_coroutine(self.s.query_info(jids[2]))
+
+            self.assertEqual(len(send_and_decode.mock_calls), 3)
+            self.assertEqual(self.s.statistics.evictions, 1)
+            self.assertEqual(self.s.statistics.info_entries, 2)
+
+            run_coroutine(self.s.query_info(jids[0]))
+            self.assertEqual(len(send_and_decode.mock_calls), 3)
+
+            run_coroutine(self.s.query_info(jids[1]))
+            self.assertEqual(len(send_and_decode.mock_calls), 4)
+
+    def test_cache_size_applies_to_items(self):
+        self.s.cache_size = 1
+        self.cc.stream.send = CoroutineMock()
+        self.cc.stream.send.return_value = disco_xso.ItemsQuery()
+
+        run_coroutine(self.s.query_items(TEST_JID))
+        run_coroutine(self.s.query_items(TEST_JID, node="foo"))
+        run_coroutine(self.s.query_items(TEST_JID))
+
+        self.assertEqual(len(self.cc.stream.send.mock_calls), 3)
+        self.assertEqual(self.s.statistics.items_entries, 1)
+        self.assertEqual(self.s.statistics.evictions, 2)
+
+    def test_cache_ttl_expires_entries(self):
+        self.s.cache_ttl = timedelta(seconds=10)
+        to = structs.JID.fromstr("user@foo.example/res1")
+
+        with unittest.mock.patch.object(
+                self.s,
+                "send_and_decode_info_query",
+                new=CoroutineMock()) as send_and_decode, \
+                unittest.mock.patch("time.monotonic") as monotonic:
+            send_and_decode.return_value = disco_xso.InfoQuery()
+            monotonic.return_value = 100
+
+            run_coroutine(self.s.query_info(to))
+
+            monotonic.return_value = 109
+            run_coroutine(self.s.query_info(to))
+            self.assertEqual(len(send_and_decode.mock_calls), 1)
+
+            monotonic.return_value = 110
+            run_coroutine(self.s.query_info(to))
+            self.assertEqual(len(send_and_decode.mock_calls), 2)
+
+        self.assertEqual(self.s.statistics.expirations, 1)
+
+    def test_equal_info_results_are_shared(self):
+        jid1 = structs.JID.fromstr("user@foo.example/res1")
+        jid2 = structs.JID.fromstr("user@foo.example/res2")
+        info1 = disco_xso.InfoQuery(features={"urn:foo", "urn:bar"})
+        info2 = disco_xso.InfoQuery(features={"urn:bar", "urn:foo"})
+
+        self.s.set_info_cache(jid1, None, info1)
+        self.s.set_info_cache(jid2, None, info2)
+        run_coroutine(asyncio.sleep(0))
+
+        self.assertIs(run_coroutine(self.s.query_info(jid1)), info1)
+        self.assertIs(run_coroutine(self.s.query_info(jid2)), info1)
+        self.assertEqual(self.s.statistics.shared_infos, 1)
+
+    def test_different_info_results_are_not_shared(self):
+        jid1 = structs.JID.fromstr("user@foo.example/res1")
+        jid2 = structs.JID.fromstr("user@foo.example/res2")
+        info1 = disco_xso.InfoQuery(features={"urn:foo"})
+        info2 = disco_xso.InfoQuery(features={"urn:bar"})
+
+        self.s.set_info_cache(jid1, None, info1)
+        self.s.set_info_cache(jid2, None, info2)
+        run_coroutine(asyncio.sleep(0))
+
+        self.assertIs(run_coroutine(self.s.query_info(jid1)), info1)
+        self.assertIs(run_coroutine(self.s.query_info(jid2)), info2)
+        self.assertEqual(self.s.statistics.shared_infos, 2)
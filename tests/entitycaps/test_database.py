@@ -0,0 +1,161 @@
+########################################################################
+# File name: test_database.py
+# This file is part of: aioxmpp
+#
+# LICENSE
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program.  If not, see
+# <http://www.gnu.org/licenses/>.
+#
+########################################################################
+import asyncio
+import pathlib
+import tempfile
+import unittest
+import urllib.parse
+
+import aioxmpp.disco as disco
+import aioxmpp.entitycaps.database as database
+import aioxmpp.entitycaps.service as entitycaps_service
+
+from aioxmpp.testutils import run_coroutine
+
+
+TEST_DATA = (
+    b'<query xmlns="http://jabber.org/protocol/disco#info">'
+    b'<feature var="urn:example:foo"/>'
+    b'</query>'
+)
+
+TEST_NODE = "http://example.test/#ver"
+
+
+class TestDatabase(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.get_event_loop()
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = pathlib.Path(self.tmpdir.name) / "caps.sqlite"
+        self.db = database.Database(self.path, loop=self.loop)
+
+    def tearDown(self):
+        run_coroutine(self.db.flush())
+        self.tmpdir.cleanup()
+
+    def test_empty(self):
+        self.assertEqual(len(self.db), 0)
+        self.assertNotIn(("sha-1", TEST_NODE), self.db)
+        with self.assertRaises(KeyError):
+            self.db.get("sha-1", TEST_NODE)
+
+    def test_add_is_visible_immediately(self):
+        self.db.add("sha-1", TEST_NODE, TEST_DATA)
+
+        self.assertIn(("sha-1", TEST_NODE), self.db)
+        result = self.db.get("sha-1", TEST_NODE)
+        self.assertIsInstance(result, disco.xso.InfoQuery)
+        self.assertIn("urn:example:foo", result.features)
+
+    def test_add_does_not_write_synchronously(self):
+        self.db.add("sha-1", TEST_NODE, TEST_DATA)
+        self.assertEqual(
+            len(database.Database(self.path, loop=self.loop)),
+            0
+        )
+
+    def test_flush_persists_entries(self):
+        self.db.add("sha-1", TEST_NODE, TEST_DATA)
+        self.db.add("sha-1", TEST_NODE + "2", TEST_DATA)
+        run_coroutine(self.db.flush())
+
+        reopened = database.Database(self.path, loop=self.loop)
+        self.assertEqual(len(reopened), 2)
+        self.assertIn(
+            "urn:example:foo",
+            reopened.get("sha-1", TEST_NODE).features,
+        )
+
+    def test_writeback_happens_in_background(self):
+        self.db.writeback_delay = 0.01
+        self.db.add("sha-1", TEST_NODE, TEST_DATA)
+        run_coroutine(asyncio.sleep(0.2))
+
+        self.assertEqual(
+            len(database.Database(self.path, loop=self.loop)),
+            1
+        )
+
+    def test_import_directory(self):
+        xmldir = pathlib.Path(self.tmpdir.name) / "xml"
+        xmldir.mkdir()
+        quoted = urllib.parse.quote(TEST_NODE, safe="")
+        with (xmldir / "sha-1_{}.xml".format(quoted)).open("wb") as f:
+            f.write(TEST_DATA)
+        with (xmldir / "garbage.xml").open("wb") as f:
+            f.write(b"")
+
+        self.assertEqual(self.db.import_directory(xmldir), 1)
+        self.assertIn(("sha-1", TEST_NODE), self.db)
+
+        reopened = database.Database(self.path, loop=self.loop)
+        self.assertIn(
+            "urn:example:foo",
+            reopened.get("sha-1", TEST_NODE).features,
+        )
+
+
+class TestCacheWithDatabase(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.get_event_loop()
+        self.tmpdir = tempfile.TemporaryDirectory()
+        base = pathlib.Path(self.tmpdir.name)
+        self.system_db = database.Database(base / "system.sqlite",
+                                           loop=self.loop)
+        self.user_db = database.Database(base / "user.sqlite",
+                                         loop=self.loop)
+        self.c = entitycaps_service.Cache()
+        self.c.set_system_db(self.system_db)
+        self.c.set_user_db(self.user_db)
+
+    def tearDown(self):
+        run_coroutine(self.user_db.flush())
+        self.tmpdir.cleanup()
+
+    def test_lookup_uses_system_db_first(self):
+        self.system_db.add("sha-1", TEST_NODE, TEST_DATA)
+        self.user_db.add("sha-1", TEST_NODE, b"invalid")
+
+        result = self.c.lookup_in_database("sha-1", TEST_NODE)
+        self.assertIn("urn:example:foo", result.features)
+        self.assertEqual(self.c.statistics.system_db_hits, 1)
+
+        self.assertIs(self.c.lookup_in_database("sha-1", TEST_NODE), result)
+        self.assertEqual(self.c.statistics.memory_hits, 1)
+
+    def test_lookup_falls_back_to_user_db(self):
+        self.user_db.add("sha-1", TEST_NODE, TEST_DATA)
+
+        result = self.c.lookup_in_database("sha-1", TEST_NODE)
+        self.assertIn("urn:example:foo", result.features)
+        self.assertEqual(self.c.statistics.user_db_hits, 1)
+
+    def test_add_cache_entry_writes_to_user_db(self):
+        self.system_db.add("sha-1", TEST_NODE, TEST_DATA)
+        entry = self.system_db.get("sha-1", TEST_NODE)
+
+        self.c.add_cache_entry("sha-1", TEST_NODE + "2", entry)
+
+        self.assertIn(
+            "urn:example:foo",
+            self.user_db.get("sha-1", TEST_NODE + "2").features,
+        )
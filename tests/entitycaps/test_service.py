@@ -1008,6 +1008,101 @@ class TestCache(unittest.TestCase):
         self.assertEqual(result, copy())
         self.assertEqual(result.node, node)
 
+    def test_lookup_in_memory(self):
+        q = disco.xso.InfoQuery()
+        self.c.add_cache_entry("sha-1", "http://foobar/#baz", q)
+
+        result = self.c.lookup_in_memory("sha-1", "http://foobar/#baz")
+        self.assertEqual(result.node, "http://foobar/#baz")
+
+        with self.assertRaises(KeyError):
+            self.c.lookup_in_memory("sha-1", "http://foobar/#other")
+
+    def test_statistics(self):
+        self.assertEqual(
+            self.c.statistics,
+            entitycaps_service.CacheStatistics(0, 0, 0, 0, 0),
+        )
+
+        self.c.add_cache_entry("sha-1", "http://foobar/#baz",
+                               disco.xso.InfoQuery())
+        self.c.lookup_in_database("sha-1", "http://foobar/#baz")
+        self.c.lookup_in_memory("sha-1", "http://foobar/#baz")
+        with self.assertRaises(KeyError):
+            self.c.lookup_in_database("sha-1", "http://foobar/#other")
+
+        self.assertEqual(
+            self.c.statistics,
+            entitycaps_service.CacheStatistics(2, 0, 0, 0, 1),
+        )
+
+        self.c.reset_statistics()
+        self.assertEqual(
+            self.c.statistics,
+            entitycaps_service.CacheStatistics(0, 0, 0, 0, 0),
+        )
+
+    def test_database_hits_are_kept_in_memory(self):
+        p = unittest.mock.MagicMock()
+        self.c.set_system_db_path(p)
+
+        with unittest.mock.patch(
+                "aioxmpp.xml.read_single_xso") as read_single_xso:
+            result = self.c.lookup_in_database("sha-1", "http://foobar/#baz")
+
+        self.assertEqual(result, read_single_xso())
+        self.assertIs(
+            self.c.lookup_in_memory("sha-1", "http://foobar/#baz"),
+            result,
+        )
+        self.assertEqual(self.c.statistics.system_db_hits, 1)
+        self.assertEqual(self.c.statistics.memory_hits, 1)
+
+    def test_lookup_entry(self):
+        q = disco.xso.InfoQuery(features={"urn:foo", "urn:bar"})
+        self.c.add_cache_entry("sha-1", "http://foobar/#baz", q)
+
+        entry = self.c.lookup_entry("sha-1", "http://foobar/#baz")
+        self.assertIsInstance(entry, entitycaps_service.CapsEntry)
+        self.assertIs(
+            entry.info,
+            self.c.lookup_in_memory("sha-1", "http://foobar/#baz"),
+        )
+        self.assertEqual(entry.features, frozenset({"urn:foo", "urn:bar"}))
+        self.assertIsInstance(entry.features, frozenset)
+        self.assertEqual(entry.info_dict, entry.info.to_dict())
+
+        self.assertIs(
+            self.c.lookup_entry("sha-1", "http://foobar/#baz"),
+            entry,
+        )
+        self.assertEqual(self.c.statistics.memory_hits, 1)
+
+        with self.assertRaises(KeyError):
+            self.c.lookup_entry("sha-1", "http://foobar/#other")
+
+    def test_add_cache_entry_replaces_entry(self):
+        self.c.add_cache_entry("sha-1", "http://foobar/#baz",
+                               disco.xso.InfoQuery(features={"urn:foo"}))
+        self.c.lookup_entry("sha-1", "http://foobar/#baz")
+        self.c.add_cache_entry("sha-1", "http://foobar/#baz",
+                               disco.xso.InfoQuery(features={"urn:bar"}))
+
+        self.assertEqual(
+            self.c.lookup_entry("sha-1", "http://foobar/#baz").features,
+            {"urn:bar"},
+        )
+
+    def test_lookup_counts_pending_hits(self):
+        fut = self.c.create_query_future("sha-1", "http://foobar/#baz")
+        task = asyncio.async(self.c.lookup("sha-1", "http://foobar/#baz"))
+        run_coroutine(asyncio.sleep(0))
+        fut.set_result(unittest.mock.sentinel.result)
+
+        self.assertIs(run_coroutine(task), unittest.mock.sentinel.result)
+        self.assertEqual(self.c.statistics.pending_hits, 1)
+        self.assertEqual(self.c.statistics.misses, 1)
+
     def tearDown(self):
         del self.c
 
@@ -1033,15 +1128,18 @@ class TestService(unittest.TestCase):
         self.disco_server.mock_calls.clear()
         self.cc.mock_calls.clear()
 
-        self.disco_server.iter_features.return_value = [
-            "http://jabber.org/protocol/disco#items",
-            "http://jabber.org/protocol/disco#info",
-        ]
-
-        self.disco_server.iter_identities.return_value = [
-            ("client", "pc", None, None),
-            ("client", "pc", structs.LanguageTag.fromstr("en"), "foo"),
-        ]
+        self.disco_server.as_info_xso.return_value = disco.xso.InfoQuery(
+            identities=[
+                disco.xso.Identity(category="client", type_="pc"),
+                disco.xso.Identity(category="client", type_="pc",
+                                   lang=structs.LanguageTag.fromstr("en"),
+                                   name="foo"),
+            ],
+            features=[
+                "http://jabber.org/protocol/disco#items",
+                "http://jabber.org/protocol/disco#info",
+            ],
+        )
 
     def test_is_Service_subclass(self):
         self.assertTrue(issubclass(
@@ -1219,6 +1317,135 @@ class TestService(unittest.TestCase):
 
         self.assertIsNone(presence.xep0115_caps)
 
+    def test_handle_inbound_presence_resolves_known_hash_inline(self):
+        caps = entitycaps_xso.Caps(
+            TEST_DB_ENTRY_NODE_BARE,
+            TEST_DB_ENTRY_VER,
+            TEST_DB_ENTRY_HASH,
+        )
+        self.s.cache.add_cache_entry(
+            caps.hash_,
+            caps.node + "#" + caps.ver,
+            disco.xso.InfoQuery(),
+        )
+
+        presence = stanza.Presence()
+        presence.from_ = TEST_FROM
+        presence.xep0115_caps = caps
+
+        with contextlib.ExitStack() as stack:
+            async = stack.enter_context(
+                unittest.mock.patch("asyncio.async")
+            )
+
+            lookup_info = stack.enter_context(
+                unittest.mock.patch.object(self.s, "lookup_info")
+            )
+
+            result = self.s.handle_inbound_presence(presence)
+
+        self.assertFalse(lookup_info.mock_calls)
+        self.assertFalse(async.mock_calls)
+
+        (_, (jid, node, fut), _), = \
+            self.disco_client.set_info_future.mock_calls
+        self.assertEqual(jid, TEST_FROM)
+        self.assertIsNone(node)
+        self.assertTrue(fut.done())
+        self.assertIs(
+            fut.result(),
+            self.s.cache.lookup_in_memory(caps.hash_,
+                                          caps.node + "#" + caps.ver),
+        )
+        self.assertEqual(self.s.cache.statistics.memory_hits, 2)
+
+        self.assertIs(result, presence)
+        self.assertIsNone(presence.xep0115_caps)
+
+    def test_has_feature(self):
+        caps = entitycaps_xso.Caps(
+            TEST_DB_ENTRY_NODE_BARE,
+            TEST_DB_ENTRY_VER,
+            TEST_DB_ENTRY_HASH,
+        )
+        self.s.cache.add_cache_entry(
+            caps.hash_,
+            caps.node + "#" + caps.ver,
+            disco.xso.InfoQuery(features={"urn:xmpp:receipts"}),
+        )
+
+        with self.assertRaises(KeyError):
+            self.s.has_feature(TEST_FROM, "urn:xmpp:receipts")
+
+        presence = stanza.Presence()
+        presence.from_ = TEST_FROM
+        presence.xep0115_caps = caps
+        self.s.handle_inbound_presence(presence)
+
+        self.assertTrue(self.s.has_feature(TEST_FROM, "urn:xmpp:receipts"))
+        self.assertFalse(
+            self.s.has_feature(TEST_FROM, "urn:xmpp:chat-markers:0")
+        )
+
+        presence = stanza.Presence(type_=structs.PresenceType.UNAVAILABLE)
+        presence.from_ = TEST_FROM
+        self.s.handle_inbound_presence(presence)
+
+        with self.assertRaises(KeyError):
+            self.s.has_feature(TEST_FROM, "urn:xmpp:receipts")
+
+    def test_has_feature_forgets_peers_when_stream_is_destroyed(self):
+        caps = entitycaps_xso.Caps(
+            TEST_DB_ENTRY_NODE_BARE,
+            TEST_DB_ENTRY_VER,
+            TEST_DB_ENTRY_HASH,
+        )
+        self.s.cache.add_cache_entry(
+            caps.hash_,
+            caps.node + "#" + caps.ver,
+            disco.xso.InfoQuery(features={"urn:xmpp:receipts"}),
+        )
+
+        presence = stanza.Presence()
+        presence.from_ = TEST_FROM
+        presence.xep0115_caps = caps
+        self.s.handle_inbound_presence(presence)
+        self.assertTrue(self.s.has_feature(TEST_FROM, "urn:xmpp:receipts"))
+
+        self.cc.on_stream_destroyed()
+
+        with self.assertRaises(KeyError):
+            self.s.has_feature(TEST_FROM, "urn:xmpp:receipts")
+
+    def test_has_feature_raises_until_caps_are_resolved(self):
+        caps = entitycaps_xso.Caps(
+            TEST_DB_ENTRY_NODE_BARE,
+            TEST_DB_ENTRY_VER,
+            TEST_DB_ENTRY_HASH,
+        )
+
+        presence = stanza.Presence()
+        presence.from_ = TEST_FROM
+        presence.xep0115_caps = caps
+
+        with contextlib.ExitStack() as stack:
+            stack.enter_context(unittest.mock.patch("asyncio.async"))
+            stack.enter_context(
+                unittest.mock.patch.object(self.s, "lookup_info")
+            )
+            self.s.handle_inbound_presence(presence)
+
+        with self.assertRaises(KeyError):
+            self.s.has_feature(TEST_FROM, "urn:xmpp:receipts")
+
+        self.s.cache.add_cache_entry(
+            caps.hash_,
+            caps.node + "#" + caps.ver,
+            disco.xso.InfoQuery(features={"urn:xmpp:receipts"}),
+        )
+
+        self.assertTrue(self.s.has_feature(TEST_FROM, "urn:xmpp:receipts"))
+
     def test_handle_inbound_presence_deals_with_None(self):
         presence = stanza.Presence()
         presence.from_ = TEST_FROM
@@ -1531,19 +1758,6 @@ class TestService(unittest.TestCase):
         self.assertIs(result, query_result)
 
     def test_update_hash(self):
-        iter_features_result = iter([
-            "http://jabber.org/protocol/caps",
-            "http://jabber.org/protocol/disco#items",
-            "http://jabber.org/protocol/disco#info",
-        ])
-
-        self.disco_server.iter_features.return_value = iter_features_result
-
-        self.disco_server.iter_identities.return_value = iter([
-            ("client", "pc", None, None),
-            ("client", "pc", structs.LanguageTag.fromstr("en"), "foo"),
-        ])
-
         self.s.ver = "old_ver"
         old_ver = self.s.ver
 
@@ -1554,29 +1768,12 @@ class TestService(unittest.TestCase):
                 new=base.hash_query
             ))
 
-            stack.enter_context(unittest.mock.patch(
-                "aioxmpp.disco.xso.InfoQuery",
-                new=base.InfoQuery
-            ))
-
             base.hash_query.return_value = "hash_query_result"
 
             self.s.update_hash()
 
-        base.InfoQuery.assert_called_with(
-            identities=[
-                disco.xso.Identity(category="client",
-                                   type_="pc"),
-                disco.xso.Identity(category="client",
-                                   type_="pc",
-                                   lang=structs.LanguageTag.fromstr("en"),
-                                   name="foo"),
-            ],
-            features=iter_features_result
-        )
-
         base.hash_query.assert_called_with(
-            base.InfoQuery(),
+            self.disco_server.as_info_xso.return_value,
             "sha1",
         )
 
@@ -1584,8 +1781,7 @@ class TestService(unittest.TestCase):
         self.assertSequenceEqual(
             calls,
             [
-                unittest.mock.call.iter_identities(),
-                unittest.mock.call.iter_features(),
+                unittest.mock.call.as_info_xso(),
                 unittest.mock.call.unmount_node(
                     "http://aioxmpp.zombofant.net/#"+old_ver
                 ),
@@ -1601,18 +1797,38 @@ class TestService(unittest.TestCase):
             base.hash_query()
         )
 
-    def test_update_hash_emits_on_ver_changed(self):
-        self.disco_server.iter_features.return_value = iter([
-            "http://jabber.org/protocol/caps",
-            "http://jabber.org/protocol/disco#items",
-            "http://jabber.org/protocol/disco#info",
-        ])
+    def test_update_hash_matches_hash_query_of_info(self):
+        self.s.update_hash()
 
-        self.disco_server.iter_identities.return_value = iter([
-            ("client", "pc", None, None),
-            ("client", "pc", structs.LanguageTag.fromstr("en"), "foo"),
-        ])
+        self.assertEqual(
+            self.s.ver,
+            entitycaps_service.hash_query(
+                self.disco_server.as_info_xso.return_value,
+                "sha1",
+            )
+        )
+
+    def test_update_hash_skips_hashing_if_info_is_unchanged(self):
+        base = unittest.mock.Mock()
+        with contextlib.ExitStack() as stack:
+            stack.enter_context(unittest.mock.patch(
+                "aioxmpp.entitycaps.service.hash_query",
+                new=base.hash_query
+            ))
+            base.hash_query.return_value = "hash_query_result"
 
+            self.s.update_hash()
+            self.s.update_hash()
+
+            self.assertEqual(len(base.hash_query.mock_calls), 1)
+
+            self.disco_server.as_info_xso.return_value = \
+                disco.xso.InfoQuery()
+            self.s.update_hash()
+
+            self.assertEqual(len(base.hash_query.mock_calls), 2)
+
+    def test_update_hash_emits_on_ver_changed(self):
         self.s.ver = "old_ver"
 
         cb = unittest.mock.Mock()
@@ -1645,8 +1861,7 @@ class TestService(unittest.TestCase):
         self.assertSequenceEqual(
             calls,
             [
-                unittest.mock.call.iter_identities(),
-                unittest.mock.call.iter_features(),
+                unittest.mock.call.as_info_xso(),
             ]
         )
 
@@ -1667,8 +1882,7 @@ class TestService(unittest.TestCase):
         self.assertSequenceEqual(
             calls,
             [
-                unittest.mock.call.iter_identities(),
-                unittest.mock.call.iter_features(),
+                unittest.mock.call.as_info_xso(),
                 unittest.mock.call.mount_node(
                     "http://aioxmpp.zombofant.net/#"+base.hash_query(),
                     self.disco_server
@@ -1693,8 +1907,7 @@ class TestService(unittest.TestCase):
         self.assertSequenceEqual(
             calls,
             [
-                unittest.mock.call.iter_identities(),
-                unittest.mock.call.iter_features(),
+                unittest.mock.call.as_info_xso(),
                 unittest.mock.call.mount_node(
                     "http://aioxmpp.zombofant.net/#"+base.hash_query(),
                     self.disco_server
@@ -1727,6 +1940,29 @@ class TestService(unittest.TestCase):
             self.s.update_hash
         )
 
+    def test__info_changed_coalesces_until_update_hash_runs(self):
+        with contextlib.ExitStack() as stack:
+            get_event_loop = stack.enter_context(unittest.mock.patch(
+                "asyncio.get_event_loop"
+            ))
+
+            self.s._info_changed()
+            self.s._info_changed()
+            self.s._info_changed()
+
+            self.assertEqual(
+                len(get_event_loop().call_soon.mock_calls),
+                1
+            )
+
+            self.s.update_hash()
+            self.s._info_changed()
+
+            self.assertEqual(
+                len(get_event_loop().call_soon.mock_calls),
+                2
+            )
+
     def test_handle_outbound_presence_does_not_attach_caps_if_ver_is_None(
             self):
         self.s.ver = None
@@ -68,6 +68,20 @@ class TestAsyncDeque(unittest.TestCase):
             self.q.getright_nowait()
         )
 
+    def test_extendleft_keeps_order(self):
+        self.q.put_nowait(4)
+        self.q.extendleft_nowait([1, 2, 3])
+
+        self.assertFalse(self.q.empty())
+        self.assertSequenceEqual(
+            [self.q.get_nowait() for i in range(4)],
+            [1, 2, 3, 4],
+        )
+
+    def test_extendleft_with_empty_sequence(self):
+        self.q.extendleft_nowait([])
+        self.assertTrue(self.q.empty())
+
     def test_len(self):
         self.assertEqual(0, len(self.q))
         self.q.put_nowait(1)
@@ -0,0 +1,376 @@
+########################################################################
+# File name: test_farm.py
+# This file is part of: aioxmpp
+#
+# LICENSE
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program.  If not, see
+# <http://www.gnu.org/licenses/>.
+#
+########################################################################
+import asyncio
+import unittest
+import unittest.mock
+
+from datetime import timedelta
+
+import aioxmpp.callbacks as callbacks
+import aioxmpp.entitycaps as entitycaps
+import aioxmpp.farm as farm
+import aioxmpp.node as node
+import aioxmpp.service as service
+
+from aioxmpp.testutils import (
+    run_coroutine,
+    CoroutineMock,
+)
+
+
+def make_client():
+    client = unittest.mock.Mock([
+        "start",
+        "stop",
+        "summon",
+        "running",
+        "established",
+        "discovery",
+        "backoff_jitter",
+    ])
+    client.running = False
+    client.established = False
+    client.discovery = None
+    client.backoff_jitter = 0.0
+    client.on_stream_established = callbacks.AdHocSignal()
+    client.on_stream_suspended = callbacks.AdHocSignal()
+    client.on_stream_destroyed = callbacks.AdHocSignal()
+    client.on_failure = callbacks.AdHocSignal()
+
+    services = {}
+
+    def summon(class_):
+        try:
+            return services[class_]
+        except KeyError:
+            dependencies = {
+                depclass: summon(depclass)
+                for depclass in class_.ORDER_AFTER
+            }
+            instance = unittest.mock.Mock(spec=class_)
+            instance.cache = None
+            instance.dependencies = dependencies
+            services[class_] = instance
+            return instance
+
+    client.summon.side_effect = summon
+    return client
+
+
+class TestConnectorCache(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.get_event_loop()
+        self.discover_connectors = CoroutineMock()
+        self.discover_connectors.return_value = [
+            unittest.mock.sentinel.option1,
+            unittest.mock.sentinel.option2,
+        ]
+        self.patch = unittest.mock.patch(
+            "aioxmpp.node.discover_connectors",
+            new=self.discover_connectors,
+        )
+        self.patch.start()
+        self.cache = farm.ConnectorCache(
+            ttl=timedelta(seconds=60),
+            loop=self.loop,
+        )
+
+    def tearDown(self):
+        self.patch.stop()
+
+    def test_init(self):
+        self.assertEqual(self.cache.ttl, timedelta(seconds=60))
+        self.assertEqual(self.cache.hits, 0)
+        self.assertEqual(self.cache.misses, 0)
+        self.assertEqual(len(self.cache), 0)
+
+    def test_first_call_uses_discover_connectors(self):
+        result = run_coroutine(self.cache(
+            b"example.com",
+            loop=self.loop,
+            logger=unittest.mock.sentinel.logger,
+        ))
+
+        self.discover_connectors.assert_called_once_with(
+            b"example.com",
+            loop=self.loop,
+            logger=unittest.mock.sentinel.logger,
+        )
+        self.assertEqual(result, self.discover_connectors.return_value)
+        self.assertEqual(self.cache.misses, 1)
+        self.assertEqual(self.cache.hits, 0)
+        self.assertEqual(len(self.cache), 1)
+
+    def test_second_call_is_answered_from_cache(self):
+        run_coroutine(self.cache(b"example.com", loop=self.loop))
+        result = run_coroutine(self.cache(b"example.com", loop=self.loop))
+
+        self.assertEqual(len(self.discover_connectors.mock_calls), 1)
+        self.assertEqual(result, self.discover_connectors.return_value)
+        self.assertEqual(self.cache.misses, 1)
+        self.assertEqual(self.cache.hits, 1)
+
+    def test_returns_copies(self):
+        result = run_coroutine(self.cache(b"example.com", loop=self.loop))
+        result.clear()
+        result = run_coroutine(self.cache(b"example.com", loop=self.loop))
+        self.assertEqual(result, self.discover_connectors.return_value)
+
+    def test_domains_are_cached_separately(self):
+        run_coroutine(self.cache(b"a.example", loop=self.loop))
+        run_coroutine(self.cache(b"b.example", loop=self.loop))
+
+        self.assertSequenceEqual(
+            [call[1][0] for call in self.discover_connectors.mock_calls],
+            [b"a.example", b"b.example"],
+        )
+        self.assertEqual(self.cache.misses, 2)
+
+    def test_concurrent_calls_are_coalesced(self):
+        results = run_coroutine(asyncio.gather(
+            self.cache(b"example.com", loop=self.loop),
+            self.cache(b"example.com", loop=self.loop),
+            self.cache(b"example.com", loop=self.loop),
+        ))
+
+        self.assertEqual(len(self.discover_connectors.mock_calls), 1)
+        for result in results:
+            self.assertEqual(result, self.discover_connectors.return_value)
+        self.assertEqual(self.cache.misses, 1)
+        self.assertEqual(self.cache.hits, 2)
+
+    def test_expired_entries_are_refreshed(self):
+        self.cache.ttl = timedelta(seconds=0.01)
+        run_coroutine(self.cache(b"example.com", loop=self.loop))
+        run_coroutine(asyncio.sleep(0.02))
+        run_coroutine(self.cache(b"example.com", loop=self.loop))
+
+        self.assertEqual(len(self.discover_connectors.mock_calls), 2)
+        self.assertEqual(self.cache.misses, 2)
+
+    def test_errors_are_not_cached(self):
+        exc = OSError()
+        self.discover_connectors.side_effect = exc
+
+        with self.assertRaises(OSError) as ctx:
+            run_coroutine(self.cache(b"example.com", loop=self.loop))
+        self.assertIs(ctx.exception, exc)
+        self.assertEqual(len(self.cache), 0)
+
+        self.discover_connectors.side_effect = None
+        result = run_coroutine(self.cache(b"example.com", loop=self.loop))
+        self.assertEqual(result, self.discover_connectors.return_value)
+        self.assertEqual(len(self.discover_connectors.mock_calls), 2)
+
+    def test_clear(self):
+        run_coroutine(self.cache(b"example.com", loop=self.loop))
+        self.cache.clear()
+        self.assertEqual(len(self.cache), 0)
+        run_coroutine(self.cache(b"example.com", loop=self.loop))
+        self.assertEqual(len(self.discover_connectors.mock_calls), 2)
+
+
+class TestClientFarm(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.get_event_loop()
+        self.farm = farm.ClientFarm(loop=self.loop)
+
+    def tearDown(self):
+        self.farm.stop()
+
+    def test_init(self):
+        self.assertEqual(self.farm.start_interval, timedelta(0))
+        self.assertEqual(self.farm.reconnect_jitter, 0.5)
+        self.assertIsInstance(self.farm.discovery, farm.ConnectorCache)
+        self.assertEqual(self.farm.discovery.ttl, timedelta(minutes=5))
+        self.assertIsInstance(self.farm.caps_cache, entitycaps.Cache)
+        self.assertEqual(len(self.farm), 0)
+
+    def test_add_configures_client(self):
+        client = make_client()
+        self.assertIs(self.farm.add(client), client)
+
+        self.assertIs(client.discovery, self.farm.discovery)
+        self.assertEqual(client.backoff_jitter, 0.5)
+        self.assertIn(client, self.farm)
+        self.assertSequenceEqual(list(self.farm), [client])
+        client.start.assert_not_called()
+
+    def test_add_rejects_duplicate(self):
+        client = make_client()
+        self.farm.add(client)
+        with self.assertRaises(ValueError):
+            self.farm.add(client)
+
+    def test_remove(self):
+        client = make_client()
+        self.farm.add(client)
+        self.farm.remove(client)
+
+        self.assertNotIn(client, self.farm)
+        self.assertIsNone(client.discovery)
+
+        client.on_failure(unittest.mock.sentinel.err)
+        self.assertEqual(self.farm.statistics.failures, 0)
+
+    def test_remove_unknown(self):
+        with self.assertRaises(KeyError):
+            self.farm.remove(make_client())
+
+    def test_summon_into_existing_and_new_clients(self):
+        class Foo(service.Service):
+            pass
+
+        c1 = self.farm.add(make_client())
+        instances = self.farm.summon(Foo)
+        c1.summon.assert_called_once_with(Foo)
+        self.assertSequenceEqual(instances, [c1.summon(Foo)])
+
+        c2 = self.farm.add(make_client())
+        c2.summon.assert_called_once_with(Foo)
+
+    def test_summon_shares_caps_cache(self):
+        class Foo(service.Service):
+            ORDER_AFTER = [entitycaps.EntityCapsService]
+
+        c1 = self.farm.add(make_client())
+        self.farm.summon(Foo)
+        c2 = self.farm.add(make_client())
+
+        for client in [c1, c2]:
+            self.assertIs(
+                client.summon(entitycaps.EntityCapsService).cache,
+                self.farm.caps_cache,
+            )
+            self.assertIsNone(client.summon(Foo).cache)
+
+    def test_summon_shares_caps_cache_with_transitive_dependency(self):
+        class Bar(service.Service):
+            ORDER_AFTER = [entitycaps.EntityCapsService]
+
+        class Foo(service.Service):
+            ORDER_AFTER = [Bar]
+
+        client = self.farm.add(make_client())
+        self.farm.summon(Foo)
+
+        client.summon.assert_called_once_with(Foo)
+        self.assertIs(
+            client.summon(entitycaps.EntityCapsService).cache,
+            self.farm.caps_cache,
+        )
+        self.assertIsNone(client.summon(Bar).cache)
+        self.assertIsNone(client.summon(Foo).cache)
+
+    def test_start_without_interval_starts_all(self):
+        clients = [self.farm.add(make_client()) for i in range(3)]
+        clients[1].running = True
+        self.farm.start()
+
+        clients[0].start.assert_called_once_with()
+        clients[1].start.assert_not_called()
+        clients[2].start.assert_called_once_with()
+
+    def test_start_staggers_clients(self):
+        self.farm.start_interval = timedelta(seconds=0.02)
+        clients = [self.farm.add(make_client()) for i in range(3)]
+        self.farm.start()
+
+        clients[0].start.assert_called_once_with()
+        clients[1].start.assert_not_called()
+        clients[2].start.assert_not_called()
+
+        run_coroutine(asyncio.sleep(0.03))
+        clients[1].start.assert_called_once_with()
+        clients[2].start.assert_not_called()
+
+        run_coroutine(asyncio.sleep(0.02))
+        clients[2].start.assert_called_once_with()
+
+    def test_start_twice_does_not_reschedule(self):
+        self.farm.start_interval = timedelta(seconds=0.01)
+        clients = [self.farm.add(make_client()) for i in range(2)]
+        self.farm.start()
+        self.farm.start()
+
+        run_coroutine(asyncio.sleep(0.02))
+        clients[1].start.assert_called_once_with()
+
+    def test_stop_cancels_pending_starts(self):
+        self.farm.start_interval = timedelta(seconds=0.01)
+        clients = [self.farm.add(make_client()) for i in range(2)]
+        self.farm.start()
+        self.farm.stop()
+
+        run_coroutine(asyncio.sleep(0.02))
+        clients[1].start.assert_not_called()
+        for client in clients:
+            client.stop.assert_called_once_with()
+
+    def test_remove_cancels_pending_start(self):
+        self.farm.start_interval = timedelta(seconds=0.01)
+        clients = [self.farm.add(make_client()) for i in range(2)]
+        self.farm.start()
+        self.farm.remove(clients[1])
+
+        run_coroutine(asyncio.sleep(0.02))
+        clients[1].start.assert_not_called()
+
+    def test_statistics(self):
+        c1 = self.farm.add(make_client())
+        c2 = self.farm.add(make_client())
+        c1.running = True
+        c1.established = True
+        c2.running = True
+
+        c1.on_stream_established()
+        c2.on_stream_established()
+        c2.on_stream_suspended(unittest.mock.sentinel.reason)
+        c2.on_stream_destroyed()
+        c2.on_failure(unittest.mock.sentinel.err)
+        self.farm.discovery.hits = 3
+        self.farm.discovery.misses = 1
+
+        self.assertEqual(
+            self.farm.statistics,
+            farm.FarmStatistics(
+                clients=2,
+                running=2,
+                established=1,
+                streams_established=2,
+                streams_suspended=1,
+                streams_destroyed=1,
+                failures=1,
+                discovery_hits=3,
+                discovery_misses=1,
+            )
+        )
+
+    def test_works_with_real_client(self):
+        client = node.Client(
+            unittest.mock.Mock(),
+            unittest.mock.sentinel.security_layer,
+            loop=self.loop,
+        )
+        self.farm.add(client)
+        self.assertIs(client.discovery, self.farm.discovery)
+        self.assertEqual(self.farm.statistics.clients, 1)
@@ -1278,6 +1278,49 @@ class Testconnect_xmlstream(unittest.TestCase):
                     base.metadata,
                 ))
 
+    def test_uses_discovery_instead_of_discover_connectors(self):
+        logger = unittest.mock.Mock()
+        base = unittest.mock.Mock()
+        jid = unittest.mock.Mock()
+
+        discovery = CoroutineMock()
+        discovery.return_value = [
+            (unittest.mock.sentinel.h1,
+             unittest.mock.sentinel.p1,
+             base.c1),
+        ]
+
+        base.c1.connect = CoroutineMock()
+        base.c1.connect.return_value = (
+            unittest.mock.sentinel.transport,
+            unittest.mock.sentinel.protocol,
+            unittest.mock.sentinel.features,
+        )
+
+        result = run_coroutine(node.connect_xmlstream(
+            jid,
+            base.metadata,
+            loop=unittest.mock.sentinel.loop,
+            logger=logger,
+            discovery=discovery,
+        ))
+
+        self.discover_connectors.assert_not_called()
+        discovery.assert_called_once_with(
+            jid.domain.encode(),
+            loop=unittest.mock.sentinel.loop,
+            logger=logger,
+        )
+
+        self.assertEqual(
+            result,
+            (
+                unittest.mock.sentinel.transport,
+                unittest.mock.sentinel.protocol,
+                unittest.mock.sentinel.post_sasl_features,
+            )
+        )
+
 
 class TestClient(xmltestutils.XMLTestCase):
     @asyncio.coroutine
@@ -1286,7 +1329,7 @@ class TestClient(xmltestutils.XMLTestCase):
         return None, self.xmlstream, self.features
 
     @staticmethod
-    def _autoset_id(self):
+    def _autoset_id(self, **kwargs):
         # self refers to a StanzaBase object!
         self.id_ = "autoset"
 
@@ -1375,6 +1418,8 @@ class TestClient(xmltestutils.XMLTestCase):
             self.client.local_jid.bare(),
             self.client.stream.local_jid
         )
+        self.assertEqual(self.client.backoff_jitter, 0)
+        self.assertIsNone(self.client.discovery)
 
     def test_setup(self):
         def peer_iterator():
@@ -1436,6 +1481,21 @@ class TestClient(xmltestutils.XMLTestCase):
             override_peer=[],
             loop=self.loop,
             logger=self.client.logger,
+            discovery=None,
+        )
+
+    def test_start_with_discovery(self):
+        self.client.discovery = unittest.mock.sentinel.discovery
+        self.client.start()
+        run_coroutine(self.xmlstream.run_test(self.resource_binding))
+        self.connect_xmlstream_rec.assert_called_once_with(
+            self.test_jid,
+            self.security_layer,
+            negotiation_timeout=60.0,
+            override_peer=[],
+            loop=self.loop,
+            logger=self.client.logger,
+            discovery=unittest.mock.sentinel.discovery,
         )
 
     def test_start_with_override_peer(self):
@@ -1457,6 +1517,7 @@ class TestClient(xmltestutils.XMLTestCase):
             override_peer=self.client.override_peer,
             loop=self.loop,
             logger=self.client.logger,
+            discovery=None,
         )
 
     def test_reject_start_twice(self):
@@ -1573,7 +1634,8 @@ class TestClient(xmltestutils.XMLTestCase):
                     negotiation_timeout=0.01,
                     override_peer=[],
                     loop=self.loop,
-                    logger=self.client.logger)
+                    logger=self.client.logger,
+                    discovery=None)
             ]*2,
             self.connect_xmlstream_rec.mock_calls
         )
@@ -1599,7 +1661,8 @@ class TestClient(xmltestutils.XMLTestCase):
             negotiation_timeout=60.0,
             override_peer=[],
             loop=self.loop,
-            logger=self.client.logger)
+            logger=self.client.logger,
+            discovery=None)
 
         self.client.backoff_start = timedelta(seconds=0.005)
         self.client.backoff_factor = 2
@@ -1741,7 +1804,8 @@ class TestClient(xmltestutils.XMLTestCase):
                     negotiation_timeout=0.01,
                     override_peer=[],
                     loop=self.loop,
-                    logger=self.client.logger)
+                    logger=self.client.logger,
+                    discovery=None)
             ]*2,
             self.connect_xmlstream_rec.mock_calls
         )
@@ -1866,7 +1930,8 @@ class TestClient(xmltestutils.XMLTestCase):
             negotiation_timeout=60.0,
             override_peer=[],
             loop=self.loop,
-            logger=self.client.logger)
+            logger=self.client.logger,
+            discovery=None)
 
         exc = OSError()
         self.connect_xmlstream_rec.side_effect = exc
@@ -1934,6 +1999,43 @@ class TestClient(xmltestutils.XMLTestCase):
         self.client.stop()
         run_coroutine(asyncio.sleep(0))
 
+    def test_backoff_jitter(self):
+        exc = OSError()
+        self.connect_xmlstream_rec.side_effect = exc
+        self.client.backoff_start = timedelta(seconds=0.02)
+        self.client.backoff_factor = 2
+        self.client.backoff_jitter = 0.5
+
+        with unittest.mock.patch("random.uniform") as uniform:
+            uniform.return_value = -0.5
+            self.client.start()
+            run_coroutine(asyncio.sleep(0))
+
+            self.assertEqual(len(self.connect_xmlstream_rec.mock_calls), 1)
+            uniform.assert_called_once_with(-0.5, 0.5)
+
+            # the nominal delay is 0.02s, the jitter makes it 0.01s
+            run_coroutine(asyncio.sleep(0.015))
+
+            self.assertEqual(len(self.connect_xmlstream_rec.mock_calls), 2)
+
+        self.client.stop()
+        run_coroutine(asyncio.sleep(0))
+
+    def test_no_jitter_by_default(self):
+        exc = OSError()
+        self.connect_xmlstream_rec.side_effect = exc
+        self.client.backoff_start = timedelta(seconds=0.01)
+
+        with unittest.mock.patch("random.uniform") as uniform:
+            self.client.start()
+            run_coroutine(asyncio.sleep(0))
+
+        uniform.assert_not_called()
+
+        self.client.stop()
+        run_coroutine(asyncio.sleep(0))
+
     def test_abort_after_max_initial_attempts(self):
         self.client = node.Client(
             self.test_jid,
@@ -1951,7 +2053,8 @@ class TestClient(xmltestutils.XMLTestCase):
             negotiation_timeout=60.0,
             override_peer=[],
             loop=self.loop,
-            logger=self.client.logger)
+            logger=self.client.logger,
+            discovery=None)
 
         exc = OSError()
         self.connect_xmlstream_rec.side_effect = exc
@@ -1987,7 +2090,8 @@ class TestClient(xmltestutils.XMLTestCase):
             negotiation_timeout=60.0,
             override_peer=[],
             loop=self.loop,
-            logger=self.client.logger)
+            logger=self.client.logger,
+            discovery=None)
 
         exc = dns.resolver.NoNameservers()
         self.connect_xmlstream_rec.side_effect = exc
@@ -2339,7 +2443,8 @@ class TestClient(xmltestutils.XMLTestCase):
                     override_peer=[],
                     negotiation_timeout=60.0,
                     loop=self.loop,
-                    logger=self.client.logger),
+                    logger=self.client.logger,
+                    discovery=None),
                 unittest.mock.call(
                     self.test_jid,
                     self.security_layer,
@@ -2348,7 +2453,8 @@ class TestClient(xmltestutils.XMLTestCase):
                     ],
                     negotiation_timeout=60.0,
                     loop=self.loop,
-                    logger=self.client.logger),
+                    logger=self.client.logger,
+                    discovery=None),
             ],
             self.connect_xmlstream_rec.mock_calls
         )
@@ -2415,7 +2521,8 @@ class TestClient(xmltestutils.XMLTestCase):
                     ],
                     negotiation_timeout=60.0,
                     loop=self.loop,
-                    logger=self.client.logger),
+                    logger=self.client.logger,
+                    discovery=None),
                 unittest.mock.call(
                     self.test_jid,
                     self.security_layer,
@@ -2425,7 +2532,8 @@ class TestClient(xmltestutils.XMLTestCase):
                     ],
                     negotiation_timeout=60.0,
                     loop=self.loop,
-                    logger=self.client.logger),
+                    logger=self.client.logger,
+                    discovery=None),
             ],
             self.connect_xmlstream_rec.mock_calls
         )
@@ -2694,11 +2802,6 @@ class TestClient(xmltestutils.XMLTestCase):
     def test_signals_fire_correctly_on_fail_after_established_connection(self):
         self.client.start()
 
-        run_coroutine(self.xmlstream.run_test([]))
-
-        exc = aiosasl.AuthenticationFailure("not-authorized")
-        self.connect_xmlstream_rec.side_effect = exc
-
         run_coroutine(self.xmlstream.run_test([
             XMLStreamMock.Send(
                 stanza.IQ(
@@ -2720,6 +2823,9 @@ class TestClient(xmltestutils.XMLTestCase):
             )
         ]))
 
+        exc = aiosasl.AuthenticationFailure("not-authorized")
+        self.connect_xmlstream_rec.side_effect = exc
+
         run_coroutine(self.xmlstream.run_test(
             [
             ],
@@ -2921,7 +3027,7 @@ class TestPresenceManagedClient(xmltestutils.XMLTestCase):
         return None, self.xmlstream, self.features
 
     @staticmethod
-    def _autoset_id(self):
+    def _autoset_id(self, **kwargs):
         # self refers to a StanzaBase object!
         self.id_ = "autoset"
 
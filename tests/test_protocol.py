@@ -43,6 +43,7 @@ from aioxmpp.structs import JID
 from aioxmpp.utils import namespaces
 
 import aioxmpp.protocol as protocol
+import aioxmpp.xml as xml
 
 TEST_FROM = JID.fromstr("foo@bar.example")
 TEST_PEER = JID.fromstr("bar.example")
@@ -147,6 +148,58 @@ class TestXMLStream(unittest.TestCase):
         )
         self.assertIsNone(p.error_handler, None)
 
+    def test_parser_backend_defaults_to_class_attribute(self):
+        t, p = self._make_stream(to=TEST_PEER)
+        self.assertEqual(
+            XMLStream.parser_backend,
+            p.parser_backend
+        )
+
+    def test_parser_backend_argument(self):
+        default = XMLStream.parser_backend
+        for backend in protocol.ParserBackend:
+            t, p = self._make_stream(to=TEST_PEER, parser_backend=backend)
+            self.assertEqual(backend, p.parser_backend)
+            self.assertEqual(default, XMLStream.parser_backend)
+
+    def test_serializer_backend_defaults_to_class_attribute(self):
+        t, p = self._make_stream(to=TEST_PEER)
+        self.assertEqual(
+            XMLStream.serializer_backend,
+            p.serializer_backend
+        )
+
+    def test_serializer_backend_argument(self):
+        default = XMLStream.serializer_backend
+        for backend in protocol.SerializerBackend:
+            t, p = self._make_stream(to=TEST_PEER, serializer_backend=backend)
+            self.assertEqual(backend, p.serializer_backend)
+            self.assertEqual(default, XMLStream.serializer_backend)
+
+    def test_coalesce_writes_argument(self):
+        default = XMLStream.coalesce_writes
+        for value in [True, False]:
+            t, p = self._make_stream(to=TEST_PEER, coalesce_writes=value)
+            self.assertEqual(value, p.coalesce_writes)
+            self.assertEqual(default, XMLStream.coalesce_writes)
+
+    def test_write_statistics(self):
+        t, p = self._make_stream(to=TEST_PEER)
+        self.assertIsNone(p.write_statistics)
+        run_coroutine(t.run_test(
+            [
+                TransportMock.Write(STREAM_HEADER),
+            ],
+            partial=True
+        ))
+        if p.coalesce_writes:
+            stats = p.write_statistics
+            self.assertIsInstance(stats, protocol.WriteStatistics)
+            self.assertEqual(1, stats.writes)
+            self.assertEqual(len(STREAM_HEADER), stats.bytes_written)
+        else:
+            self.assertIsNone(p.write_statistics)
+
     def test_connection_made_check_state(self):
         t, p = self._make_stream(to=TEST_PEER)
         with self.assertRaisesRegex(RuntimeError, "invalid state"):
@@ -708,6 +761,52 @@ class TestXMLStream(unittest.TestCase):
 
         self.assertIsNone(p.transport)
 
+    def test_pause_and_resume_writing(self):
+        t, p = self._make_stream(to=TEST_PEER)
+        self.assertFalse(p.writing_paused)
+
+        p.pause_writing()
+        self.assertTrue(p.writing_paused)
+
+        drain = asyncio.async(p.drain())
+        run_coroutine(asyncio.sleep(0))
+        self.assertFalse(drain.done())
+
+        p.resume_writing()
+        self.assertFalse(p.writing_paused)
+        run_coroutine(drain)
+
+    def test_drain_returns_immediately_if_not_paused(self):
+        t, p = self._make_stream(to=TEST_PEER)
+        run_coroutine(p.drain())
+
+    def test_connection_lost_wakes_up_drain(self):
+        t, p = self._make_stream(to=TEST_PEER)
+        run_coroutine(
+            t.run_test(
+                [
+                    TransportMock.Write(
+                        STREAM_HEADER,
+                        response=[
+                            TransportMock.Receive(self._make_peer_header()),
+                        ]),
+                ],
+                partial=True
+            )
+        )
+
+        p.pause_writing()
+        drain = asyncio.async(p.drain())
+        run_coroutine(asyncio.sleep(0))
+        self.assertFalse(drain.done())
+
+        run_coroutine(t.run_test([]))
+
+        run_coroutine(drain)
+        self.assertFalse(p.writing_paused)
+        with self.assertRaises(ConnectionError):
+            p.send_xso(FakeIQ(structs.IQType.GET))
+
     def test_clean_state_if_starttls_fails(self):
         had_exception = False
         def exc_handler(loop, context):
@@ -1560,6 +1659,52 @@ class TestXMLStream(unittest.TestCase):
         )
 
 
+class TestXMLStreamWithExpatBackend(TestXMLStream):
+    def setUp(self):
+        super().setUp()
+        self._old_backend = XMLStream.parser_backend
+        XMLStream.parser_backend = protocol.ParserBackend.EXPAT
+
+    def tearDown(self):
+        XMLStream.parser_backend = self._old_backend
+
+    def test_uses_expat_processor(self):
+        t, p = self._make_stream(to=TEST_PEER)
+        run_coroutine(t.run_test(
+            [
+                TransportMock.Write(STREAM_HEADER),
+            ],
+            partial=True
+        ))
+        self.assertIsInstance(p._processor, xml.XMPPXMLExpatProcessor)
+        self.assertIs(p._processor, p._parser)
+
+
+class TestXMLStreamWithDirectSerializer(TestXMLStream):
+    def setUp(self):
+        super().setUp()
+        self._old_backend = XMLStream.serializer_backend
+        XMLStream.serializer_backend = protocol.SerializerBackend.DIRECT
+
+    def tearDown(self):
+        XMLStream.serializer_backend = self._old_backend
+
+    def test_uses_serializer(self):
+        with unittest.mock.patch(
+                "aioxmpp.xml.write_xmlstream",
+                wraps=xml.write_xmlstream) as write_xmlstream:
+            t, p = self._make_stream(to=TEST_PEER)
+            run_coroutine(t.run_test(
+                [
+                    TransportMock.Write(STREAM_HEADER),
+                ],
+                partial=True
+            ))
+
+        _, kwargs = write_xmlstream.call_args
+        self.assertTrue(kwargs["use_serializer"])
+
+
 class Testsend_and_wait_for(xmltestutils.XMLTestCase):
     def setUp(self):
         self.loop = asyncio.get_event_loop()
@@ -1862,3 +2007,299 @@ class Testsend_stream_error_and_close(xmltestutils.XMLTestCase):
             ),
             XMLStreamMock.Close()
         ]))
+
+
+class TestWriteCoalescer(unittest.TestCase):
+    def setUp(self):
+        self.dest = unittest.mock.Mock(["write"])
+        self.loop = unittest.mock.Mock(["time", "call_soon", "call_later"])
+        self.loop.time.return_value = 10
+        self.wc = protocol.WriteCoalescer(
+            self.dest,
+            self.loop,
+            max_buffer_size=16,
+        )
+
+    def tearDown(self):
+        del self.wc
+        del self.loop
+        del self.dest
+
+    def test_init(self):
+        self.assertIs(self.dest, self.wc.dest)
+        self.assertEqual(16, self.wc.max_buffer_size)
+        self.assertEqual(0, self.wc.max_delay)
+        self.assertEqual(0, self.wc.writes)
+        self.assertEqual(0, self.wc.bytes_written)
+        self.assertEqual(0, self.wc.bytes_per_write)
+        self.assertEqual(0, self.wc.writes_per_second)
+
+    def test_write_buffers(self):
+        self.wc.write(b"foo")
+        self.wc.write(b"bar")
+        self.dest.write.assert_not_called()
+        self.loop.call_soon.assert_not_called()
+
+    def test_flush_schedules_drain_once(self):
+        self.wc.write(b"foo")
+        self.wc.flush()
+        self.wc.write(b"bar")
+        self.wc.flush()
+        self.loop.call_soon.assert_called_once_with(self.wc.drain)
+        self.dest.write.assert_not_called()
+
+        self.wc.drain()
+        self.dest.write.assert_called_once_with(b"foobar")
+        self.loop.call_soon().cancel.assert_called_once_with()
+
+    def test_flush_without_data_is_noop(self):
+        self.wc.flush()
+        self.loop.call_soon.assert_not_called()
+        self.loop.call_later.assert_not_called()
+
+    def test_flush_uses_call_later_with_max_delay(self):
+        self.wc.max_delay = 0.5
+        self.wc.write(b"foo")
+        self.wc.flush()
+        self.loop.call_later.assert_called_once_with(0.5, self.wc.drain)
+        self.loop.call_soon.assert_not_called()
+
+    def test_write_drains_when_buffer_is_full(self):
+        self.wc.write(b"x" * 10)
+        self.dest.write.assert_not_called()
+        self.wc.write(b"y" * 6)
+        self.dest.write.assert_called_once_with(b"x" * 10 + b"y" * 6)
+
+        self.wc.write(b"z")
+        self.wc.drain()
+        self.assertSequenceEqual(
+            [
+                unittest.mock.call(b"x" * 10 + b"y" * 6),
+                unittest.mock.call(b"z"),
+            ],
+            self.dest.write.mock_calls
+        )
+
+    def test_drain_without_data_does_not_write(self):
+        self.wc.drain()
+        self.dest.write.assert_not_called()
+        self.assertEqual(0, self.wc.writes)
+
+    def test_discard(self):
+        self.wc.write(b"foo")
+        self.wc.flush()
+        self.wc.discard()
+        self.loop.call_soon().cancel.assert_called_once_with()
+        self.wc.drain()
+        self.dest.write.assert_not_called()
+
+    def test_statistics(self):
+        self.wc.write(b"foo")
+        self.wc.drain()
+        self.wc.write(b"barbaz")
+        self.wc.drain()
+        self.loop.time.return_value = 14
+
+        self.assertEqual(2, self.wc.writes)
+        self.assertEqual(9, self.wc.bytes_written)
+        self.assertEqual(4.5, self.wc.bytes_per_write)
+        self.assertEqual(0.5, self.wc.writes_per_second)
+
+        self.assertEqual(
+            protocol.WriteStatistics(2, 9, 4.5, 0.5),
+            self.wc.statistics
+        )
+
+
+class TestXMLStreamWithCoalescedWrites(TestXMLStream):
+    def setUp(self):
+        super().setUp()
+        self._old_coalesce_writes = XMLStream.coalesce_writes
+        XMLStream.coalesce_writes = True
+
+    def tearDown(self):
+        XMLStream.coalesce_writes = self._old_coalesce_writes
+
+    def _run_error_test(self, stimulus, error, *, eof_response=None,
+                        setup=None):
+        # the stream error and the stream footer are sent within the same
+        # loop iteration and thus end up in a single write
+        t, p = self._make_stream(to=TEST_PEER)
+        if setup is not None:
+            setup(p)
+        run_coroutine(t.run_test([
+            TransportMock.Write(
+                STREAM_HEADER,
+                response=[
+                    TransportMock.Receive(self._make_peer_header()),
+                    TransportMock.Receive(stimulus),
+                ]),
+            TransportMock.Write(error + b"</stream:stream>"),
+            TransportMock.WriteEof(response=eof_response),
+            TransportMock.Close()
+        ]))
+
+    def test_send_stream_error_from_feed(self):
+        self._run_error_test(
+            b"&foo;",
+            STREAM_ERROR_TEMPLATE_WITH_TEXT.format(
+                condition="restricted-xml",
+                text="non-predefined entities are not allowed in XMPP"
+            ).encode("utf-8")
+        )
+
+    def test_send_stream_error_on_malformed_xml(self):
+        self._run_error_test(
+            "<</>".encode("utf-8"),
+            STREAM_ERROR_TEMPLATE_WITH_TEXT.format(
+                condition="bad-format",
+                text="&lt;unknown&gt;:1:149: not well-formed (invalid token)"
+            ).encode("utf-8")
+        )
+
+    def test_error_propagation(self):
+        def cb(stanza):
+            pass
+
+        self._run_error_test(
+            "<foo xmlns='jabber:client' />",
+            STREAM_ERROR_TEMPLATE_WITH_TEXT.format(
+                condition="internal-server-error",
+                text="Internal error while parsing XML. Client logs have "
+                     "more details."
+            ).encode("utf-8"),
+            setup=lambda p: p.stanza_parser.add_class(
+                RuntimeErrorRaisingStanza, cb),
+        )
+
+    def test_check_version(self):
+        t, p = self._make_stream(to=TEST_PEER)
+        run_coroutine(
+            t.run_test(
+                [
+                    TransportMock.Write(
+                        STREAM_HEADER,
+                        response=[
+                            TransportMock.Receive(
+                                self._make_peer_header(version=(2, 0))),
+                        ]),
+                    TransportMock.Write(
+                        STREAM_ERROR_TEMPLATE_WITH_TEXT.format(
+                            condition="unsupported-version",
+                            text="unsupported version").encode("utf-8") +
+                        b"</stream:stream>"
+                    ),
+                    TransportMock.WriteEof(),
+                    TransportMock.Close()
+                ]
+            ))
+
+    def test_unknown_top_level_produces_stream_error(self):
+        self._run_error_test(
+            b'<foo xmlns="uri:bar"/>',
+            STREAM_ERROR_TEMPLATE_WITH_TEXT.format(
+                condition="unsupported-stanza-type",
+                text="unsupported stanza: {uri:bar}foo",
+            ).encode("utf-8"),
+            eof_response=[
+                TransportMock.Receive(self._make_eos()),
+            ]
+        )
+
+    def test_coalesces_xsos_sent_in_the_same_iteration(self):
+        t, p = self._make_stream(to=TEST_PEER)
+        run_coroutine(
+            t.run_test(
+                [
+                    TransportMock.Write(
+                        STREAM_HEADER,
+                        response=[
+                            TransportMock.Receive(self._make_peer_header()),
+                        ]),
+                ],
+                partial=True
+            )
+        )
+        writes = p.write_statistics.writes
+
+        for i in range(3):
+            st = FakeIQ(structs.IQType.GET)
+            st.id_ = "id{}".format(i)
+            p.send_xso(st)
+
+        run_coroutine(
+            t.run_test(
+                [
+                    TransportMock.Write(
+                        b'<iq id="id0" type="get"/>'
+                        b'<iq id="id1" type="get"/>'
+                        b'<iq id="id2" type="get"/>'
+                    ),
+                ],
+                partial=True
+            )
+        )
+
+        self.assertEqual(writes + 1, p.write_statistics.writes)
+
+    def test_abort_discards_pending_writes(self):
+        t, p = self._make_stream(to=TEST_PEER)
+        run_coroutine(
+            t.run_test(
+                [
+                    TransportMock.Write(
+                        STREAM_HEADER,
+                        response=[
+                            TransportMock.Receive(self._make_peer_header()),
+                        ]),
+                ],
+                partial=True
+            )
+        )
+
+        with unittest.mock.patch.object(
+                protocol.WriteCoalescer,
+                "discard") as discard:
+            p.abort()
+
+        discard.assert_called_once_with()
+
+        run_coroutine(
+            t.run_test(
+                [
+                    TransportMock.WriteEof(),
+                    TransportMock.Close(),
+                ],
+            )
+        )
+
+    def test_write_buffer_size_forces_immediate_write(self):
+        t, p = self._make_stream(to=TEST_PEER)
+        p.write_buffer_size = 1
+        run_coroutine(
+            t.run_test(
+                [
+                    TransportMock.Write(
+                        STREAM_HEADER,
+                        response=[
+                            TransportMock.Receive(self._make_peer_header()),
+                        ]),
+                ],
+                partial=True
+            )
+        )
+
+        for i in range(2):
+            st = FakeIQ(structs.IQType.GET)
+            st.id_ = "id{}".format(i)
+            p.send_xso(st)
+
+        run_coroutine(
+            t.run_test(
+                [
+                    TransportMock.Write(b'<iq id="id0" type="get"/>'),
+                    TransportMock.Write(b'<iq id="id1" type="get"/>'),
+                ],
+                partial=True
+            )
+        )
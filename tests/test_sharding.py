@@ -0,0 +1,385 @@
+########################################################################
+# File name: test_sharding.py
+# This file is part of: aioxmpp
+#
+# LICENSE
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program.  If not, see
+# <http://www.gnu.org/licenses/>.
+#
+########################################################################
+import asyncio
+import collections
+import multiprocessing
+import os
+import queue
+import unittest
+import unittest.mock
+
+import aioxmpp.callbacks as callbacks
+import aioxmpp.sharding as sharding
+import aioxmpp.stanza as stanza
+import aioxmpp.structs as structs
+
+from aioxmpp.testutils import run_coroutine
+
+
+# filled in by the test case before the workers are forked
+EVENTS = None
+
+
+class EventPipe:
+    """
+    Channel for the events reported by the :class:`FakeClient` instances in
+    the workers.
+
+    Unlike with :class:`multiprocessing.Queue`, :meth:`put` writes in the
+    calling thread instead of a feeder thread. Once a worker has answered a
+    request, it thus neither holds the write lock nor has a write in
+    progress, and it can be killed without corrupting the channel for the
+    other workers.
+    """
+
+    def __init__(self, context):
+        self._reader, self._writer = context.Pipe(duplex=False)
+        self._lock = context.Lock()
+
+    def put(self, obj):
+        with self._lock:
+            self._writer.send(obj)
+
+    def get(self, timeout):
+        if not self._reader.poll(timeout):
+            raise queue.Empty()
+        return self._reader.recv()
+
+    def close(self):
+        self._reader.close()
+        self._writer.close()
+
+
+class FakeStream:
+    def __init__(self, jid):
+        self.jid = jid
+
+    def enqueue(self, stanza):
+        EVENTS.put(("enqueue", str(self.jid), os.getpid(), str(stanza.to),
+                    stanza.body[None]))
+
+
+class FakeClient:
+    """
+    Stand-in for :class:`aioxmpp.Client` which reports what happens to it
+    instead of connecting to a server.
+    """
+
+    on_stream_established = callbacks.Signal()
+    on_stream_suspended = callbacks.Signal()
+    on_stream_destroyed = callbacks.Signal()
+    on_failure = callbacks.Signal()
+
+    def __init__(self, jid, tag):
+        self.jid = jid
+        self.tag = tag
+        self.stream = FakeStream(jid)
+        self.running = False
+        self.established = False
+        self.discovery = None
+        self.backoff_jitter = 0.0
+
+    def start(self):
+        self.running = True
+        self.established = True
+        EVENTS.put(("start", str(self.jid), os.getpid(), self.tag))
+
+    def stop(self):
+        self.running = False
+        self.established = False
+        EVENTS.put(("stop", str(self.jid), os.getpid(), self.tag))
+
+    def summon(self, class_):
+        raise NotImplementedError
+
+
+def failing_factory(jid, tag):
+    raise ValueError(tag)
+
+
+class TestHashRing(unittest.TestCase):
+    def test_empty(self):
+        ring = sharding.HashRing()
+        self.assertEqual(len(ring), 0)
+        with self.assertRaises(LookupError):
+            ring.get("foo")
+
+    def test_init_adds_nodes(self):
+        ring = sharding.HashRing([0, 1, 2])
+        self.assertEqual(len(ring), 3)
+        self.assertSetEqual(set(ring), {0, 1, 2})
+        self.assertIn(1, ring)
+
+    def test_get_is_deterministic(self):
+        ring1 = sharding.HashRing(range(4))
+        ring2 = sharding.HashRing(reversed(range(4)))
+        for i in range(100):
+            key = "user{}@example.com".format(i)
+            self.assertEqual(ring1.get(key), ring2.get(key))
+
+    def test_add_rejects_duplicate(self):
+        ring = sharding.HashRing([0])
+        with self.assertRaises(ValueError):
+            ring.add(0)
+
+    def test_remove_unknown(self):
+        ring = sharding.HashRing([0])
+        with self.assertRaises(KeyError):
+            ring.remove(1)
+
+    def test_distribution(self):
+        ring = sharding.HashRing(range(4), replicas=128)
+        counts = collections.Counter(
+            ring.get("user{}@example.com".format(i))
+            for i in range(4000)
+        )
+        self.assertSetEqual(set(counts), {0, 1, 2, 3})
+        for count in counts.values():
+            self.assertGreater(count, 500)
+
+    def test_remove_only_moves_keys_of_removed_node(self):
+        ring = sharding.HashRing(range(4))
+        keys = ["user{}@example.com".format(i) for i in range(1000)]
+        before = {key: ring.get(key) for key in keys}
+
+        ring.remove(2)
+        self.assertNotIn(2, ring)
+
+        for key in keys:
+            if before[key] == 2:
+                self.assertNotEqual(ring.get(key), 2)
+            else:
+                self.assertEqual(ring.get(key), before[key])
+
+    def test_add_back_restores_assignment(self):
+        ring = sharding.HashRing(range(4))
+        keys = ["user{}@example.com".format(i) for i in range(1000)]
+        before = {key: ring.get(key) for key in keys}
+
+        ring.remove(1)
+        ring.add(1)
+
+        for key in keys:
+            self.assertEqual(ring.get(key), before[key])
+
+
+@unittest.skipUnless(
+    "fork" in multiprocessing.get_all_start_methods(),
+    "requires the fork start method"
+)
+class TestShardedFarm(unittest.TestCase):
+    def setUp(self):
+        global EVENTS
+        self.loop = asyncio.get_event_loop()
+        EVENTS = EventPipe(multiprocessing.get_context("fork"))
+        self.farm = sharding.ShardedFarm(
+            FakeClient,
+            nworkers=3,
+            start_method="fork",
+            loop=self.loop,
+        )
+        self.farm.start()
+
+    def tearDown(self):
+        global EVENTS
+        run_coroutine(self.farm.stop())
+        EVENTS.close()
+        EVENTS = None
+
+    def _events(self, n, timeout=5):
+        return [EVENTS.get(timeout=timeout) for i in range(n)]
+
+    def _kill_worker(self, index):
+        died = asyncio.Future(loop=self.loop)
+
+        def on_worker_died(index):
+            if not died.done():
+                died.set_result(index)
+            return True
+
+        self.farm.on_worker_died.connect(on_worker_died)
+
+        # the workers report their events synchronously while handling a
+        # request; once the victim has answered a request, it is idle and
+        # killing it cannot leave a partial event in the pipe
+        worker = self.farm._workers[index]
+        run_coroutine(self.farm._request(worker, "statistics"), timeout=5)
+        worker.process.terminate()
+        self.assertEqual(run_coroutine(died, timeout=5), index)
+
+        # the accounts are restarted before the statistics requests are
+        # answered, as each worker processes its requests in order
+        run_coroutine(self.farm.statistics(), timeout=5)
+
+    def test_start_spawns_workers(self):
+        self.assertSetEqual(self.farm.workers, {0, 1, 2})
+
+    def test_reject_start_twice(self):
+        with self.assertRaises(RuntimeError):
+            self.farm.start()
+
+    def test_add_account_starts_client_in_responsible_worker(self):
+        pids = {}
+        for i in range(12):
+            jid = structs.JID.fromstr("user{}@example.com".format(i))
+            run_coroutine(self.farm.add_account(jid, i))
+            (kind, jidstr, pid, tag), = self._events(1)
+            self.assertEqual(kind, "start")
+            self.assertEqual(jidstr, str(jid))
+            self.assertEqual(tag, i)
+            pids.setdefault(self.farm.worker_of(jid), set()).add(pid)
+
+        # every worker maps to exactly one process
+        for worker_pids in pids.values():
+            self.assertEqual(len(worker_pids), 1)
+        self.assertEqual(len(self.farm), 12)
+
+    def test_add_account_rejects_duplicate(self):
+        jid = structs.JID.fromstr("user@example.com")
+        run_coroutine(self.farm.add_account(jid, 0))
+        with self.assertRaises(ValueError):
+            run_coroutine(self.farm.add_account(jid, 0))
+
+    def test_remove_account(self):
+        jid = structs.JID.fromstr("user@example.com")
+        run_coroutine(self.farm.add_account(jid, 0))
+        run_coroutine(self.farm.remove_account(jid))
+
+        events = self._events(2)
+        self.assertEqual(events[1][:2], ("stop", str(jid)))
+        self.assertNotIn(jid, self.farm)
+
+    def test_remove_unknown_account(self):
+        with self.assertRaises(KeyError):
+            run_coroutine(self.farm.remove_account(
+                structs.JID.fromstr("user@example.com")
+            ))
+
+    def test_send(self):
+        jid = structs.JID.fromstr("user@example.com")
+        run_coroutine(self.farm.add_account(jid, 0))
+
+        msg = stanza.Message(
+            to=structs.JID.fromstr("peer@example.com"),
+            type_=structs.MessageType.CHAT,
+        )
+        msg.body[None] = "Hello World!"
+        run_coroutine(self.farm.send(jid, msg))
+
+        _, (kind, jidstr, _, to, body) = self._events(2)
+        self.assertEqual(kind, "enqueue")
+        self.assertEqual(jidstr, str(jid))
+        self.assertEqual(to, "peer@example.com")
+        self.assertEqual(body, "Hello World!")
+
+    def test_send_to_unknown_account(self):
+        with self.assertRaises(KeyError):
+            run_coroutine(self.farm.send(
+                structs.JID.fromstr("user@example.com"),
+                stanza.Message(type_=structs.MessageType.CHAT),
+            ))
+
+    def test_statistics(self):
+        for i in range(6):
+            run_coroutine(self.farm.add_account(
+                structs.JID.fromstr("user{}@example.com".format(i)),
+                i,
+            ))
+
+        stats = run_coroutine(self.farm.statistics())
+        self.assertSetEqual(set(stats), {0, 1, 2})
+        self.assertEqual(sum(s.clients for s in stats.values()), 6)
+        self.assertEqual(sum(s.running for s in stats.values()), 6)
+
+    def test_worker_death_moves_accounts(self):
+        jids = [
+            structs.JID.fromstr("user{}@example.com".format(i))
+            for i in range(12)
+        ]
+        for i, jid in enumerate(jids):
+            run_coroutine(self.farm.add_account(jid, i))
+        self._events(len(jids))
+
+        victim = self.farm.worker_of(jids[0])
+        moved = [jid for jid in jids if self.farm.worker_of(jid) == victim]
+
+        died = unittest.mock.Mock()
+        died.return_value = None
+        self.farm.on_worker_died.connect(died)
+
+        self._kill_worker(victim)
+
+        died.assert_called_once_with(victim)
+        self.assertNotIn(victim, self.farm.workers)
+
+        events = self._events(len(moved))
+        self.assertSetEqual(
+            {(kind, jidstr) for kind, jidstr, *_ in events},
+            {("start", str(jid)) for jid in moved},
+        )
+        for jid in jids:
+            self.assertNotEqual(self.farm.worker_of(jid), victim)
+
+        with self.assertRaises(queue.Empty):
+            EVENTS.get(timeout=0.1)
+
+    def test_worker_death_with_respawn(self):
+        self.farm.respawn = True
+        jid = structs.JID.fromstr("user@example.com")
+        run_coroutine(self.farm.add_account(jid, 0))
+        _, _, old_pid, _ = EVENTS.get(timeout=5)
+
+        victim = self.farm.worker_of(jid)
+        self._kill_worker(victim)
+
+        self.assertSetEqual(self.farm.workers, {0, 1, 2})
+        self.assertEqual(self.farm.worker_of(jid), victim)
+        kind, jidstr, new_pid, _ = EVENTS.get(timeout=5)
+        self.assertEqual((kind, jidstr), ("start", str(jid)))
+        self.assertNotEqual(old_pid, new_pid)
+
+    def test_workers_exit_when_front_end_goes_away(self):
+        workers = list(self.farm._workers.values())
+        # closing the front-end ends of the pipes is what happens when the
+        # front-end process dies; every worker must see EOF, which requires
+        # that no worker holds a copy of another pipe end
+        for worker in workers:
+            self.farm._detach(worker)
+
+        for worker in workers:
+            worker.process.join(5)
+            self.assertFalse(worker.process.is_alive())
+
+    def test_factory_error_is_reraised(self):
+        run_coroutine(self.farm.stop())
+        self.farm = sharding.ShardedFarm(
+            failing_factory,
+            nworkers=1,
+            start_method="fork",
+            loop=self.loop,
+        )
+        self.farm.start()
+
+        jid = structs.JID.fromstr("user@example.com")
+        with self.assertRaisesRegex(ValueError, "foo"):
+            run_coroutine(self.farm.add_account(jid, "foo"))
+        self.assertNotIn(jid, self.farm)
@@ -0,0 +1,179 @@
+########################################################################
+# File name: test_ssl_transport.py
+# This file is part of: aioxmpp
+#
+# LICENSE
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program.  If not, see
+# <http://www.gnu.org/licenses/>.
+#
+########################################################################
+import asyncio
+import socket
+import unittest
+import unittest.mock
+
+import OpenSSL.SSL
+
+import aioxmpp._ssl_transport as ssl_transport
+
+from aioxmpp.testutils import run_coroutine
+
+
+class TestSTARTTLSTransportWriteBuffer(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.get_event_loop()
+        self.sock, self.peer = socket.socketpair()
+        self.sock.setblocking(False)
+        self.protocol = unittest.mock.Mock(asyncio.Protocol)
+        self.t = ssl_transport.STARTTLSTransport(
+            self.loop,
+            self.sock,
+            self.protocol,
+            None,
+            use_starttls=True,
+        )
+        # let connection_made run
+        run_coroutine(asyncio.sleep(0))
+
+    def tearDown(self):
+        self.loop.remove_reader(self.sock.fileno())
+        self.loop.remove_writer(self.sock.fileno())
+        self.sock.close()
+        self.peer.close()
+
+    def _read_from_peer(self, nbytes):
+        self.peer.setblocking(False)
+        data = bytearray()
+        while len(data) < nbytes:
+            run_coroutine(asyncio.sleep(0))
+            try:
+                data.extend(self.peer.recv(nbytes - len(data)))
+            except BlockingIOError:
+                pass
+        return bytes(data)
+
+    def test_default_write_buffer_limits(self):
+        self.assertEqual(
+            (16 * 1024, 64 * 1024),
+            self.t.get_write_buffer_limits()
+        )
+
+    def test_set_write_buffer_limits(self):
+        self.t.set_write_buffer_limits(high=100)
+        self.assertEqual((25, 100), self.t.get_write_buffer_limits())
+        self.t.set_write_buffer_limits(low=10)
+        self.assertEqual((10, 40), self.t.get_write_buffer_limits())
+        self.t.set_write_buffer_limits(high=20, low=5)
+        self.assertEqual((5, 20), self.t.get_write_buffer_limits())
+
+    def test_set_write_buffer_limits_rejects_invalid_values(self):
+        with self.assertRaises(ValueError):
+            self.t.set_write_buffer_limits(high=10, low=20)
+        with self.assertRaises(ValueError):
+            self.t.set_write_buffer_limits(high=-1, low=-2)
+
+    def test_write_buffers_data(self):
+        self.t.write(b"foo")
+        self.t.write(bytearray(b"bar"))
+        self.t.write(memoryview(b"baz"))
+        self.assertEqual(9, self.t.get_write_buffer_size())
+
+    def test_write_copies_mutable_buffers(self):
+        buf = bytearray(b"foo")
+        self.t.write(buf)
+        buf[:] = b"bar"
+        self.assertEqual(b"foo", self._read_from_peer(3))
+
+    def test_data_is_sent_in_order(self):
+        chunks = [
+            "chunk{}".format(i).encode("ascii") * (i + 1)
+            for i in range(200)
+        ]
+        for chunk in chunks:
+            self.t.write(chunk)
+
+        expected = b"".join(chunks)
+        self.assertEqual(expected, self._read_from_peer(len(expected)))
+        run_coroutine(asyncio.sleep(0))
+        self.assertEqual(0, self.t.get_write_buffer_size())
+
+    def test_large_backlog_is_sent_completely(self):
+        data = bytes(range(256)) * 8192
+        for i in range(0, len(data), 4096):
+            self.t.write(data[i:i+4096])
+
+        self.assertEqual(data, self._read_from_peer(len(data)))
+
+    def test_partial_send_keeps_remainder(self):
+        self.t.write(b"foobar")
+        self.t.write(b"baz")
+        self.t._consume_chunks(4)
+        self.assertEqual(5, self.t.get_write_buffer_size())
+        self.assertEqual(
+            [b"ar", b"baz"],
+            [bytes(chunk) for chunk in self.t._buffer]
+        )
+
+    def test_pause_and_resume_writing(self):
+        self.t.set_write_buffer_limits(high=10, low=2)
+        self.t.write(b"x" * 10)
+        self.protocol.pause_writing.assert_not_called()
+        self.t.write(b"x")
+        self.protocol.pause_writing.assert_called_once_with()
+        self.t.write(b"x")
+        self.protocol.pause_writing.assert_called_once_with()
+        self.protocol.resume_writing.assert_not_called()
+
+        self._read_from_peer(12)
+        run_coroutine(asyncio.sleep(0))
+        self.protocol.resume_writing.assert_called_once_with()
+
+    def test_set_write_buffer_limits_may_pause(self):
+        self.t.write(b"x" * 10)
+        self.t.set_write_buffer_limits(high=5)
+        self.protocol.pause_writing.assert_called_once_with()
+
+    def test_merge_head_chunks_for_tls(self):
+        for i in range(4):
+            self.t.write(b"x" * 6000)
+        self.t._merge_head_chunks()
+        self.assertEqual(
+            [12000, 6000, 6000],
+            [len(chunk) for chunk in self.t._buffer]
+        )
+        self.assertEqual(24000, self.t.get_write_buffer_size())
+
+    def test_tls_retry_uses_same_buffer(self):
+        sock = unittest.mock.Mock(["send"])
+        sock.send.side_effect = OpenSSL.SSL.WantWriteError()
+        self.t._sock = sock
+        self.t._state = ssl_transport._State.TLS_OPEN
+
+        self.t.write(b"foo")
+        self.t.write(b"bar")
+        self.t._write_ready()
+        first, = sock.send.mock_calls
+        self.assertEqual(unittest.mock.call(b"foobar"), first)
+
+        self.t.write(b"baz")
+        sock.send.side_effect = None
+        sock.send.return_value = 6
+        self.t._write_ready()
+        _, (_, (second,), _) = sock.send.mock_calls
+        self.assertIs(first[1][0], second)
+        self.assertEqual(3, self.t.get_write_buffer_size())
+
+        self.t._state = ssl_transport._State.RAW_OPEN
+        self.t._sock = self.sock
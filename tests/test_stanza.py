@@ -19,8 +19,10 @@
 # <http://www.gnu.org/licenses/>.
 #
 ########################################################################
+import base64
 import contextlib
 import itertools
+import os
 import unittest
 import unittest.mock
 
@@ -41,6 +43,70 @@ class TestPayload(xso.XSO):
         return "foobar"
 
 
+class Test_IDGenerator(unittest.TestCase):
+    def setUp(self):
+        self.gen = stanza._IDGenerator()
+
+    def _split(self, id_):
+        return id_[:-stanza._RANDOM_ID_SUFFIX_CHARS], \
+            id_[-stanza._RANDOM_ID_SUFFIX_CHARS:]
+
+    def test_ids_share_random_prefix(self):
+        id1 = self.gen()
+        id2 = self.gen()
+        self.assertNotEqual(id1, id2)
+        self.assertTrue(id1.startswith("x"))
+        self.assertEqual(self._split(id1)[0], self._split(id2)[0])
+
+    def test_suffixes_are_random(self):
+        n = stanza.RANDOM_ID_SUFFIX_BYTES
+        data = bytes(i % 256 for i in range(n * stanza.RANDOM_ID_BATCH))
+        with unittest.mock.patch("os.urandom") as urandom:
+            urandom.return_value = data
+            self.gen.reseed()
+            id1 = self.gen()
+            id2 = self.gen()
+
+        self.assertEqual(
+            base64.b64encode(data[:n]).decode("ascii"),
+            self._split(id1)[1]
+        )
+        self.assertEqual(
+            base64.b64encode(data[n:2*n]).decode("ascii"),
+            self._split(id2)[1]
+        )
+
+    def test_reads_random_data_in_batches(self):
+        with unittest.mock.patch("os.urandom",
+                                 wraps=os.urandom) as urandom:
+            self.gen.reseed()
+            urandom.reset_mock()
+            ids = {self.gen() for i in range(stanza.RANDOM_ID_BATCH + 1)}
+
+        self.assertEqual(stanza.RANDOM_ID_BATCH + 1, len(ids))
+        self.assertSequenceEqual(
+            [
+                unittest.mock.call(
+                    stanza.RANDOM_ID_SUFFIX_BYTES * stanza.RANDOM_ID_BATCH
+                ),
+            ] * 2,
+            urandom.mock_calls
+        )
+
+    def test_generators_use_different_prefixes(self):
+        self.assertNotEqual(
+            self._split(self.gen())[0],
+            self._split(stanza._IDGenerator()())[0],
+        )
+
+    def test_reseed(self):
+        id1 = self.gen()
+        self.gen.reseed()
+        id2 = self.gen()
+        self.assertNotEqual(self._split(id1)[0], self._split(id2)[0])
+        self.assertNotEqual(id1[:-1], id2[:-1])
+
+
 class TestStanzaBase(unittest.TestCase):
     class FakeStanza(stanza.StanzaBase, protect=False):
         pass
@@ -117,6 +183,32 @@ class TestStanzaBase(unittest.TestCase):
         # ensure that there are not too many A chars (i.e. zero bits)
         self.assertLess(sum(1 for c in id1 if c == "A"), 5)
 
+    def test_autoset_id_generates_unique_ids(self):
+        ids = set()
+        for i in range(1000):
+            s = self.FakeStanza()
+            s.autoset_id()
+            ids.add(s.id_)
+        self.assertEqual(len(ids), 1000)
+
+    def test_autoset_id_uses_id_generator(self):
+        s = self.FakeStanza()
+        with unittest.mock.patch("aioxmpp.stanza._next_id") as next_id:
+            next_id.return_value = "xfoo"
+            s.autoset_id()
+        next_id.assert_called_once_with()
+        self.assertEqual(s.id_, "xfoo")
+
+    def test_autoset_id_uses_given_id_generator(self):
+        s = self.FakeStanza()
+        id_generator = unittest.mock.Mock()
+        id_generator.return_value = "xbar"
+        with unittest.mock.patch("aioxmpp.stanza._next_id") as next_id:
+            s.autoset_id(id_generator=id_generator)
+        id_generator.assert_called_once_with()
+        self.assertFalse(next_id.mock_calls)
+        self.assertEqual(s.id_, "xbar")
+
     def test_autoset_id_does_not_override(self):
         s = self.FakeStanza()
         s.id_ = "foo"
@@ -95,6 +95,7 @@ def make_mocked_streams(loop):
     xmlstream.send_xso = _on_send_xso
     xmlstream.on_closing = callbacks.AdHocSignal()
     xmlstream.close_and_wait = CoroutineMock()
+    xmlstream.writing_paused = False
     stanzastream = stream.StanzaStream(
         TEST_FROM.bare(),
         loop=loop)
@@ -221,6 +222,204 @@ class TestFilter(unittest.TestCase):
             calls
         )
 
+    def test_unregister_keeps_order_of_remaining_functions(self):
+        mock = unittest.mock.Mock()
+
+        self.f.register(mock.func1, 1)
+        token = self.f.register(mock.func2, 0)
+        self.f.register(mock.func3, 0)
+        self.f.unregister(token)
+
+        self.f.filter(mock.stanza)
+
+        self.assertSequenceEqual(
+            [
+                unittest.mock.call.func3(mock.stanza),
+                unittest.mock.call.func1(mock.func3.return_value),
+            ],
+            mock.mock_calls
+        )
+
+    def test_selector_skips_function_if_child_is_absent(self):
+        mock = unittest.mock.Mock()
+        mock.func1.side_effect = lambda x: x
+        mock.func2.side_effect = lambda x: x
+
+        self.f.register(mock.func1, 0, selector=stanza.Message.error)
+        self.f.register(mock.func2, 0)
+
+        msg = stanza.Message(structs.MessageType.CHAT)
+        self.assertIs(self.f.filter(msg), msg)
+
+        self.assertSequenceEqual(
+            [
+                unittest.mock.call.func2(msg),
+            ],
+            mock.mock_calls
+        )
+
+    def test_selector_calls_function_if_child_is_present(self):
+        mock = unittest.mock.Mock()
+        mock.func1.side_effect = lambda x: x
+
+        self.f.register(mock.func1, 0, selector=stanza.Message.error)
+
+        msg = stanza.Message(structs.MessageType.ERROR)
+        msg.error = stanza.Error()
+        self.assertIs(self.f.filter(msg), msg)
+
+        self.assertSequenceEqual(
+            [
+                unittest.mock.call.func1(msg),
+            ],
+            mock.mock_calls
+        )
+
+    def test_selector_uses_result_of_previous_function(self):
+        mock = unittest.mock.Mock()
+        replacement = stanza.Message(structs.MessageType.ERROR)
+        replacement.error = stanza.Error()
+        mock.func1.return_value = replacement
+        mock.func2.side_effect = lambda x: x
+
+        self.f.register(mock.func1, 0)
+        self.f.register(mock.func2, 1, selector=stanza.Message.error)
+
+        msg = stanza.Message(structs.MessageType.CHAT)
+        self.assertIs(self.f.filter(msg), replacement)
+
+        mock.func2.assert_called_once_with(replacement)
+
+    def test_selector_is_evaluated_once_per_stanza(self):
+        mock = unittest.mock.Mock()
+        for name in ["func1", "func2", "func3", "func4"]:
+            getattr(mock, name).side_effect = lambda x: x
+
+        self.f.register(mock.func1, 0, selector=stanza.Message.error)
+        self.f.register(mock.func2, 1, selector=stanza.Message.body)
+        self.f.register(mock.func3, 2, selector=stanza.Message.error)
+        self.f.register(mock.func4, 3)
+
+        msg = stanza.Message(structs.MessageType.ERROR)
+        msg.error = stanza.Error()
+
+        with unittest.mock.patch(
+                "aioxmpp.stream._selector_matches",
+                wraps=stream._selector_matches) as selector_matches:
+            self.assertIs(self.f.filter(msg), msg)
+            self.assertIs(self.f.filter(msg), msg)
+
+        self.assertEqual(selector_matches.call_count, 4)
+        self.assertSequenceEqual(
+            [
+                unittest.mock.call.func1(msg),
+                unittest.mock.call.func2(msg),
+                unittest.mock.call.func3(msg),
+                unittest.mock.call.func4(msg),
+            ] * 2,
+            mock.mock_calls
+        )
+
+    def test_selector_group_skips_all_of_its_functions(self):
+        mock = unittest.mock.Mock()
+        for name in ["func1", "func2", "func3"]:
+            getattr(mock, name).side_effect = lambda x: x
+
+        self.f.register(mock.func1, 0, selector=stanza.Message.error)
+        self.f.register(mock.func2, 1)
+        self.f.register(mock.func3, 2, selector=stanza.Message.error)
+
+        msg = stanza.Message(structs.MessageType.CHAT)
+        self.assertIs(self.f.filter(msg), msg)
+
+        self.assertSequenceEqual(
+            [
+                unittest.mock.call.func2(msg),
+            ],
+            mock.mock_calls
+        )
+
+    def test_unregister_removes_function_from_selector_group(self):
+        mock = unittest.mock.Mock()
+        mock.func1.side_effect = lambda x: x
+        mock.func2.side_effect = lambda x: x
+
+        token = self.f.register(mock.func1, 0, selector=stanza.Message.error)
+        self.f.register(mock.func2, 1, selector=stanza.Message.error)
+
+        msg = stanza.Message(structs.MessageType.ERROR)
+        msg.error = stanza.Error()
+        self.f.filter(msg)
+        self.f.unregister(token)
+        self.f.filter(msg)
+
+        self.assertSequenceEqual(
+            [
+                unittest.mock.call.func1(msg),
+                unittest.mock.call.func2(msg),
+                unittest.mock.call.func2(msg),
+            ],
+            mock.mock_calls
+        )
+
+    def test_profiling_disabled_by_default(self):
+        func = unittest.mock.Mock()
+        func.side_effect = lambda x: x
+
+        self.assertFalse(self.f.profiling)
+
+        self.f.register(func, 0)
+        self.f.filter(unittest.mock.sentinel.stanza)
+
+        self.assertSequenceEqual(
+            self.f.statistics(),
+            [
+                stream.FilterStatistics(func, 0, 0, 0, 0.0),
+            ]
+        )
+
+    def test_profiling(self):
+        mock = unittest.mock.Mock()
+        mock.func1.side_effect = lambda x: x
+        mock.func2.side_effect = lambda x: x
+
+        self.f.register(mock.func2, 1)
+        self.f.register(mock.func1, 0, selector=stanza.Message.error)
+        self.f.profiling = True
+
+        with unittest.mock.patch("time.perf_counter") as perf_counter:
+            perf_counter.side_effect = [1.0, 1.5, 2.0, 2.25]
+            self.f.filter(stanza.Message(structs.MessageType.CHAT))
+            self.f.filter(stanza.Message(structs.MessageType.CHAT))
+
+        self.assertSequenceEqual(
+            self.f.statistics(),
+            [
+                stream.FilterStatistics(mock.func1, 0, 0, 2, 0.0),
+                stream.FilterStatistics(mock.func2, 1, 2, 0, 0.75),
+            ]
+        )
+
+        self.f.reset_statistics()
+
+        self.assertSequenceEqual(
+            self.f.statistics(),
+            [
+                stream.FilterStatistics(mock.func1, 0, 0, 0, 0.0),
+                stream.FilterStatistics(mock.func2, 1, 0, 0, 0.0),
+            ]
+        )
+
+    def test_profiling_counts_aborting_function(self):
+        func = unittest.mock.Mock()
+        func.return_value = None
+
+        self.f.register(func, 0)
+        self.f.profiling = True
+
+        self.assertIsNone(self.f.filter(unittest.mock.sentinel.stanza))
+        self.assertEqual(self.f.statistics()[0].calls, 1)
+
 
 class TestAppFilter(TestFilter):
     def setUp(self):
@@ -251,6 +450,283 @@ class TestAppFilter(TestFilter):
         )
 
 
+class Test_TimeoutWheel(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.get_event_loop()
+        self.expired = []
+        self.wheel = stream._TimeoutWheel(
+            self.expired.append,
+            resolution=0.01,
+            slots=8,
+            loop=self.loop,
+        )
+
+    def tearDown(self):
+        self.wheel.clear()
+
+    def test_expires_items_in_batches(self):
+        self.wheel.schedule("a", 0.02)
+        self.wheel.schedule("b", 0.02)
+        self.wheel.schedule("c", 0.1)
+        self.assertEqual(len(self.wheel), 3)
+
+        run_coroutine(asyncio.sleep(0.05))
+        self.assertEqual(len(self.expired), 1)
+        self.assertSetEqual(set(self.expired[0]), {"a", "b"})
+        self.assertNotIn("a", self.wheel)
+        self.assertIn("c", self.wheel)
+
+        run_coroutine(asyncio.sleep(0.08))
+        self.assertSequenceEqual(self.expired[1], ["c"])
+        self.assertEqual(len(self.wheel), 0)
+
+    def test_timeouts_longer_than_a_revolution(self):
+        self.wheel.schedule("a", 0.15)
+        run_coroutine(asyncio.sleep(0.1))
+        self.assertSequenceEqual(self.expired, [])
+        run_coroutine(asyncio.sleep(0.08))
+        self.assertSequenceEqual(self.expired, [["a"]])
+
+    def test_cancel(self):
+        self.wheel.schedule("a", 0.01)
+        self.wheel.schedule("b", 0.01)
+        self.wheel.cancel("a")
+        self.wheel.cancel("x")
+
+        run_coroutine(asyncio.sleep(0.03))
+        self.assertSequenceEqual(self.expired, [["b"]])
+
+    def test_uses_a_single_timer(self):
+        with unittest.mock.patch.object(
+                self.loop, "call_at",
+                wraps=self.loop.call_at) as call_at:
+            for i in range(100):
+                self.wheel.schedule(i, 0.05)
+        self.assertEqual(len(call_at.mock_calls), 1)
+
+    def test_clear(self):
+        self.wheel.schedule("a", 0.01)
+        self.wheel.clear()
+        run_coroutine(asyncio.sleep(0.03))
+        self.assertSequenceEqual(self.expired, [])
+        self.assertEqual(len(self.wheel), 0)
+
+
+class TestIQRequestExecutor(unittest.TestCase):
+    class OtherPayload:
+        pass
+
+    def setUp(self):
+        self.loop = asyncio.get_event_loop()
+        self.executor = stream.IQRequestExecutor(loop=self.loop)
+        self.futures = {}
+        self.started = []
+        self.done_cb = unittest.mock.Mock()
+        self.done_cb._is_coroutine = False
+
+    def tearDown(self):
+        self.executor.cancel_all()
+        run_coroutine(asyncio.sleep(0))
+
+    def _request(self, name, payload_cls=FancyTestIQ):
+        request = unittest.mock.Mock(["payload"])
+        request.payload = payload_cls()
+        request.name = name
+        self.futures[name] = asyncio.Future(loop=self.loop)
+        return request
+
+    @asyncio.coroutine
+    def _handler(self, request):
+        self.started.append(request.name)
+        return (yield from self.futures[request.name])
+
+    def _submit(self, request):
+        return self.executor.submit(request, self._handler, self.done_cb)
+
+    def _finish(self, name, result=None):
+        self.futures[name].set_result(result)
+        run_coroutine(asyncio.sleep(0))
+
+    def test_defaults(self):
+        self.assertIsNone(self.executor.max_in_flight)
+        self.assertIsNone(self.executor.max_queued)
+        self.assertEqual(self.executor.in_flight, 0)
+        self.assertEqual(self.executor.queue_depth, 0)
+        self.assertEqual(
+            self.executor.statistics,
+            stream.IQRequestStatistics(0, 0, 0, 0.0, 0.0, 0.0, 0.0)
+        )
+
+    def test_unbounded_starts_everything(self):
+        requests = [self._request(i) for i in range(5)]
+        for request in requests:
+            self.assertTrue(self._submit(request))
+        run_coroutine(asyncio.sleep(0))
+
+        self.assertSequenceEqual(self.started, list(range(5)))
+        self.assertEqual(self.executor.in_flight, 5)
+        self.assertEqual(self.executor.queue_depth, 0)
+
+    def test_done_cb_is_called_with_request_and_task(self):
+        request = self._request("a")
+        self._submit(request)
+        run_coroutine(asyncio.sleep(0))
+        self._finish("a", unittest.mock.sentinel.result)
+
+        (_, (req, task), _), = self.done_cb.mock_calls
+        self.assertIs(req, request)
+        self.assertEqual(task.result(), unittest.mock.sentinel.result)
+        self.assertEqual(self.executor.in_flight, 0)
+        self.assertEqual(self.executor.statistics.completed, 1)
+
+    def test_max_in_flight_queues_excess_requests(self):
+        self.executor.max_in_flight = 2
+        for i in range(4):
+            self.assertTrue(self._submit(self._request(i)))
+        run_coroutine(asyncio.sleep(0))
+
+        self.assertSequenceEqual(self.started, [0, 1])
+        self.assertEqual(self.executor.in_flight, 2)
+        self.assertEqual(self.executor.queue_depth, 2)
+
+        self._finish(1)
+        run_coroutine(asyncio.sleep(0))
+        self.assertSequenceEqual(self.started, [0, 1, 2])
+        self.assertEqual(self.executor.queue_depth, 1)
+
+    def test_max_queued_rejects_requests(self):
+        self.executor.max_in_flight = 1
+        self.executor.max_queued = 1
+
+        self.assertTrue(self._submit(self._request("a")))
+        self.assertTrue(self._submit(self._request("b")))
+        self.assertFalse(self._submit(self._request("c")))
+
+        stats = self.executor.statistics
+        self.assertEqual(stats.submitted, 3)
+        self.assertEqual(stats.rejected, 1)
+        self.assertEqual(self.executor.queue_depth, 1)
+
+    def test_max_queued_zero_disables_queueing(self):
+        self.executor.max_in_flight = 1
+        self.executor.max_queued = 0
+
+        self.assertTrue(self._submit(self._request("a")))
+        self.assertFalse(self._submit(self._request("b")))
+
+    def test_priority_orders_queued_requests(self):
+        self.executor.max_in_flight = 1
+        self.executor.set_class_policy(self.OtherPayload, priority=10)
+
+        self._submit(self._request("a"))
+        self._submit(self._request("b"))
+        self._submit(self._request("c", self.OtherPayload))
+        self._submit(self._request("d"))
+        run_coroutine(asyncio.sleep(0))
+
+        for name in ["a", "c", "b"]:
+            self._finish(name)
+            run_coroutine(asyncio.sleep(0))
+
+        self.assertSequenceEqual(self.started, ["a", "c", "b", "d"])
+
+    def test_class_quota_does_not_block_other_classes(self):
+        self.executor.set_class_policy(FancyTestIQ, quota=1)
+
+        self._submit(self._request("a"))
+        self._submit(self._request("b"))
+        self._submit(self._request("c", self.OtherPayload))
+        run_coroutine(asyncio.sleep(0))
+
+        self.assertSequenceEqual(self.started, ["a", "c"])
+        self.assertEqual(self.executor.queue_depth, 1)
+
+        self._finish("a")
+        run_coroutine(asyncio.sleep(0))
+        self.assertSequenceEqual(self.started, ["a", "c", "b"])
+
+    def test_blocked_class_keeps_fifo_order_behind_other_classes(self):
+        self.executor.max_in_flight = 2
+        self.executor.set_class_policy(FancyTestIQ, quota=1)
+
+        self._submit(self._request("a"))
+        self._submit(self._request("b"))
+        self._submit(self._request("c"))
+        self._submit(self._request("d", self.OtherPayload))
+        self._submit(self._request("e", self.OtherPayload))
+        run_coroutine(asyncio.sleep(0))
+
+        self.assertSequenceEqual(self.started, ["a", "d"])
+        self.assertEqual(self.executor.queue_depth, 3)
+
+        self._finish("d")
+        run_coroutine(asyncio.sleep(0))
+        self.assertSequenceEqual(self.started, ["a", "d", "e"])
+
+        self._finish("a")
+        run_coroutine(asyncio.sleep(0))
+        self._finish("e")
+        run_coroutine(asyncio.sleep(0))
+        self.assertSequenceEqual(self.started, ["a", "d", "e", "b"])
+
+        self._finish("b")
+        run_coroutine(asyncio.sleep(0))
+        self.assertSequenceEqual(self.started, ["a", "d", "e", "b", "c"])
+        self.assertEqual(self.executor.queue_depth, 0)
+
+    def test_set_class_policy_reorders_queued_requests(self):
+        self.executor.max_in_flight = 1
+        self.executor.set_class_policy(self.OtherPayload)
+
+        self._submit(self._request("a"))
+        self._submit(self._request("b"))
+        self._submit(self._request("c", self.OtherPayload))
+        run_coroutine(asyncio.sleep(0))
+
+        self.executor.set_class_policy(self.OtherPayload, priority=10)
+
+        self._finish("a")
+        run_coroutine(asyncio.sleep(0))
+        self.assertSequenceEqual(self.started, ["a", "c"])
+
+    def test_statistics_measure_queue_and_run_time(self):
+        self.executor.max_in_flight = 1
+        self._submit(self._request("a"))
+        self._submit(self._request("b"))
+        run_coroutine(asyncio.sleep(0.02))
+        self._finish("a")
+        run_coroutine(asyncio.sleep(0))
+        self._finish("b")
+
+        stats = self.executor.statistics
+        self.assertEqual(stats.completed, 2)
+        self.assertGreaterEqual(stats.max_queue_time, 0.02)
+        self.assertGreaterEqual(stats.queue_time, stats.max_queue_time)
+        self.assertGreaterEqual(stats.max_run_time, 0.02)
+        self.assertGreaterEqual(stats.run_time, stats.max_run_time)
+
+        self.executor.reset_statistics()
+        self.assertEqual(
+            self.executor.statistics,
+            stream.IQRequestStatistics(0, 0, 0, 0.0, 0.0, 0.0, 0.0)
+        )
+
+    def test_cancel_all(self):
+        self.executor.max_in_flight = 1
+        self._submit(self._request("a"))
+        self._submit(self._request("b"))
+        run_coroutine(asyncio.sleep(0))
+
+        self.executor.cancel_all()
+        run_coroutine(asyncio.sleep(0))
+
+        self.assertSequenceEqual(self.started, ["a"])
+        self.assertEqual(self.executor.in_flight, 0)
+        self.assertEqual(self.executor.queue_depth, 0)
+        (_, (_, task), _), = self.done_cb.mock_calls
+        self.assertTrue(task.cancelled())
+
+
 class StanzaStreamTestBase(xmltestutils.XMLTestCase):
     def setUp(self):
         self.loop = asyncio.get_event_loop()
@@ -424,6 +900,129 @@ class TestStanzaStream(StanzaStreamTestBase):
 
         self.assertIsNone(caught_exc)
 
+    def test_ping_event_uses_loop_timer(self):
+        self.stream.start(self.xmlstream)
+        run_coroutine(asyncio.sleep(0))
+
+        timer = self.stream._ping_timer
+        self.assertIsInstance(timer, asyncio.TimerHandle)
+        self.assertAlmostEqual(
+            self.loop.time() + self.stream.ping_interval.total_seconds(),
+            self.stream._next_ping_event_at,
+            delta=0.1,
+        )
+
+        # further wakeups do not re-arm the timer
+        self.stream.recv_stanza(make_test_presence())
+        run_coroutine(asyncio.sleep(0))
+        self.assertIs(timer, self.stream._ping_timer)
+
+        self.stream.stop()
+        run_coroutine(asyncio.sleep(0))
+        self.assertIsNone(self.stream._ping_timer)
+
+    def test_init_max_incoming_batch(self):
+        self.assertEqual(64, self.stream.max_incoming_batch)
+
+    def _run_incoming_batch(self, npresences):
+        received = []
+        self.stream.register_presence_callback(
+            structs.PresenceType.AVAILABLE,
+            None,
+            received.append,
+        )
+
+        presences = [
+            make_test_presence(from_=TEST_FROM.replace(resource=str(i)))
+            for i in range(npresences)
+        ]
+        for pres in presences:
+            self.stream.recv_stanza(pres)
+
+        process_batch = unittest.mock.Mock(
+            wraps=self.stream._process_incoming_batch
+        )
+        with unittest.mock.patch.object(self.stream,
+                                        "_process_incoming_batch",
+                                        new=process_batch):
+            self.stream.start(self.xmlstream)
+            run_coroutine(asyncio.sleep(0.01))
+
+        return presences, received, process_batch
+
+    def test_processes_incoming_stanzas_in_batches(self):
+        self.stream.max_incoming_batch = 4
+        presences, received, process_batch = self._run_incoming_batch(10)
+
+        self.assertSequenceEqual(presences, received)
+        self.assertEqual(3, len(process_batch.mock_calls))
+
+    def test_batch_of_one_processes_stanzas_one_by_one(self):
+        self.stream.max_incoming_batch = 1
+        presences, received, process_batch = self._run_incoming_batch(10)
+
+        self.assertSequenceEqual(presences, received)
+        self.assertEqual(10, len(process_batch.mock_calls))
+
+    def test_incoming_batch_interleaves_with_outgoing(self):
+        self.stream.max_incoming_batch = 2
+        order = []
+
+        def on_presence(pres):
+            order.append(("in", pres))
+
+        def send_handler(obj):
+            order.append(("out", obj))
+
+        self.xmlstream.send_xso = send_handler
+        self.stream.register_presence_callback(
+            structs.PresenceType.AVAILABLE,
+            None,
+            on_presence,
+        )
+
+        presences = [
+            make_test_presence(from_=TEST_FROM.replace(resource=str(i)))
+            for i in range(6)
+        ]
+        for pres in presences:
+            self.stream.recv_stanza(pres)
+        iq = make_test_iq()
+        self.stream.enqueue(iq)
+
+        self.stream.start(self.xmlstream)
+        run_coroutine(asyncio.sleep(0.01))
+
+        self.assertCountEqual(
+            [("in", pres) for pres in presences] + [("out", iq)],
+            order,
+        )
+        self.assertLess(order.index(("out", iq)), 3)
+
+    def test_incoming_batch_stops_on_stop(self):
+        self.stream.max_incoming_batch = 10
+        received = []
+
+        def stop_filter(pres):
+            received.append(pres)
+            self.stream.stop()
+            return pres
+
+        self.stream.app_inbound_presence_filter.register(stop_filter, 0)
+
+        presences = [
+            make_test_presence(from_=TEST_FROM.replace(resource=str(i)))
+            for i in range(3)
+        ]
+        for pres in presences:
+            self.stream.recv_stanza(pres)
+
+        self.stream.start(self.xmlstream)
+        run_coroutine(asyncio.sleep(0.01))
+
+        self.assertSequenceEqual(presences[:1], received)
+        self.assertEqual(2, len(self.stream._incoming_queue))
+
     def test_queue_stanza(self):
         iq = make_test_iq(type_=structs.IQType.GET)
 
@@ -787,6 +1386,47 @@ class TestStanzaStream(StanzaStreamTestBase):
 
         self.stream.stop()
 
+    def test_run_iq_request_rejected_by_executor(self):
+        iq = make_test_iq()
+        fut = asyncio.Future()
+
+        @asyncio.coroutine
+        def handle_request(stanza):
+            return (yield from fut)
+
+        self.stream.iq_request_executor.max_in_flight = 1
+        self.stream.iq_request_executor.max_queued = 0
+        self.stream.register_iq_request_coro(
+            structs.IQType.GET,
+            FancyTestIQ,
+            handle_request)
+        self.stream.start(self.xmlstream)
+        self.stream.recv_stanza(iq)
+        self.stream.recv_stanza(make_test_iq())
+
+        response_got = run_coroutine(self.sent_stanzas.get())
+        self.assertEqual(
+            structs.IQType.ERROR,
+            response_got.type_
+        )
+        self.assertEqual(
+            (namespaces.stanzas, "resource-constraint"),
+            response_got.error.condition
+        )
+        self.assertEqual(
+            structs.ErrorType.WAIT,
+            response_got.error.type_
+        )
+        self.assertEqual(self.stream.iq_request_executor.in_flight, 1)
+
+        fut.set_result(None)
+        response_got = run_coroutine(self.sent_stanzas.get())
+        self.assertEqual(iq.id_, response_got.id_)
+        self.assertEqual(structs.IQType.RESULT, response_got.type_)
+        self.assertEqual(self.stream.iq_request_executor.in_flight, 0)
+
+        self.stream.stop()
+
     def test_unregister_iq_request_coro_raises_if_none_was_registered(self):
         with self.assertRaises(KeyError):
             self.stream.unregister_iq_request_coro(
@@ -1534,22 +2174,19 @@ class TestStanzaStream(StanzaStreamTestBase):
         self.assertIsInstance(exc, asyncio.CancelledError)
 
     def test_close_sets_active_stanza_tokens_to_aborted(self):
-        get_mock = CoroutineMock()
-        get_mock.delay = 1000
         # let’s mess with the processor a bit ...
         # otherwise, the stanza is sent before the close can happen
-        with unittest.mock.patch.object(
-                self.stream._active_queue,
-                "get",
-                new=get_mock):
+        self.xmlstream.writing_paused = True
+        self.xmlstream.drain = CoroutineMock()
+        self.xmlstream.drain.delay = 1000
 
-            self.stream.start(self.xmlstream)
-            run_coroutine(asyncio.sleep(0))
-            self.assertTrue(self.stream.running)
+        self.stream.start(self.xmlstream)
+        run_coroutine(asyncio.sleep(0))
+        self.assertTrue(self.stream.running)
 
-            token = self.stream.enqueue(make_test_message())
+        token = self.stream.enqueue(make_test_message())
 
-            run_coroutine(self.stream.close())
+        run_coroutine(self.stream.close())
 
         self.assertFalse(self.stream.running)
 
@@ -1573,6 +2210,21 @@ class TestStanzaStream(StanzaStreamTestBase):
 
         self.assertEqual(token.state, stream.StanzaState.DISCONNECTED)
 
+    def test_enqueue_uses_id_prefix_of_stream(self):
+        other = stream.StanzaStream(TEST_FROM.bare(), loop=self.loop)
+        suffix_len = stanza._RANDOM_ID_SUFFIX_CHARS
+
+        msg1 = make_test_message()
+        msg2 = make_test_message()
+        msg3 = make_test_message()
+        self.stream.enqueue(msg1)
+        self.stream.enqueue(msg2)
+        other.enqueue(msg3)
+
+        self.assertNotEqual(msg1.id_, msg2.id_)
+        self.assertEqual(msg1.id_[:-suffix_len], msg2.id_[:-suffix_len])
+        self.assertNotEqual(msg1.id_[:-suffix_len], msg3.id_[:-suffix_len])
+
     def test_enqueue_raises_after_close(self):
         run_coroutine(self.stream.close())
 
@@ -1629,6 +2281,168 @@ class TestStanzaStream(StanzaStreamTestBase):
             state_change_handler.mock_calls
         )
 
+    def test_does_not_send_while_writing_is_paused(self):
+        writable = asyncio.Event()
+        self.xmlstream.writing_paused = True
+
+        @asyncio.coroutine
+        def drain():
+            yield from writable.wait()
+
+        self.xmlstream.drain = drain
+
+        iqs = [make_test_iq() for i in range(3)]
+        tokens = [self.stream.enqueue(iq) for iq in iqs]
+
+        self.stream.start(self.xmlstream)
+        run_coroutine(asyncio.sleep(0.01))
+
+        self.assertTrue(self.sent_stanzas.empty())
+        for token in tokens:
+            self.assertEqual(stream.StanzaState.ACTIVE, token.state)
+
+        self.xmlstream.writing_paused = False
+        writable.set()
+
+        for iq in iqs:
+            self.assertIs(
+                iq,
+                run_coroutine(self.sent_stanzas.get()),
+            )
+
+    def test_bulk_send_stops_when_writing_is_paused(self):
+        iqs = [make_test_iq() for i in range(3)]
+
+        @asyncio.coroutine
+        def drain():
+            yield from asyncio.sleep(3600)
+
+        def send_handler(stanza_obj):
+            self.xmlstream.writing_paused = True
+            self.sent_stanzas.put_nowait(stanza_obj)
+
+        self.xmlstream.send_xso = send_handler
+        self.xmlstream.drain = drain
+
+        tokens = [self.stream.enqueue(iq) for iq in iqs]
+
+        self.stream.start(self.xmlstream)
+        self.assertIs(iqs[0], run_coroutine(self.sent_stanzas.get()))
+        run_coroutine(asyncio.sleep(0.01))
+
+        self.assertTrue(self.sent_stanzas.empty())
+        self.assertEqual(stream.StanzaState.SENT_WITHOUT_SM, tokens[0].state)
+        self.assertEqual(stream.StanzaState.ACTIVE, tokens[1].state)
+        self.assertEqual(stream.StanzaState.ACTIVE, tokens[2].state)
+
+    def test_init_max_queue_size(self):
+        self.assertIsNone(self.stream.max_queue_size)
+
+    def test_enqueue_raises_if_queue_is_full(self):
+        self.stream.max_queue_size = 2
+        self.stream.enqueue(make_test_iq())
+        self.stream.enqueue(make_test_iq())
+
+        with self.assertRaises(asyncio.QueueFull):
+            self.stream.enqueue(make_test_iq())
+
+    def test_enqueue_throttled_returns_token(self):
+        iq = make_test_iq()
+        token = run_coroutine(self.stream.enqueue_throttled(iq))
+        self.assertIsInstance(token, stream.StanzaToken)
+        self.assertIs(iq, token.stanza)
+
+    def test_enqueue_throttled_waits_for_space(self):
+        self.stream.max_queue_size = 2
+        self.stream.enqueue(make_test_iq())
+        self.stream.enqueue(make_test_iq())
+
+        iq = make_test_iq()
+        task = asyncio.async(self.stream.enqueue_throttled(iq))
+        run_coroutine(asyncio.sleep(0))
+        self.assertFalse(task.done())
+
+        self.stream.start(self.xmlstream)
+        token = run_coroutine(task)
+        self.assertIs(iq, token.stanza)
+
+        for i in range(3):
+            run_coroutine(self.sent_stanzas.get())
+
+    def test_enqueue_throttled_raises_after_close(self):
+        self.stream.max_queue_size = 1
+        self.stream.enqueue(make_test_iq())
+
+        task = asyncio.async(
+            self.stream.enqueue_throttled(make_test_iq())
+        )
+        run_coroutine(asyncio.sleep(0))
+        self.assertFalse(task.done())
+
+        run_coroutine(self.stream.close())
+
+        with self.assertRaisesRegex(ConnectionError, r"close\(\) called"):
+            run_coroutine(task)
+
+    def test_send_waits_for_queue_space(self):
+        self.stream.max_queue_size = 1
+        self.stream.enqueue(make_test_iq())
+
+        msg = make_test_message()
+        task = asyncio.async(self.stream.send(msg))
+        run_coroutine(asyncio.sleep(0))
+        self.assertFalse(task.done())
+
+        self.stream.start(self.xmlstream)
+        run_coroutine(task)
+
+        run_coroutine(self.sent_stanzas.get())
+        self.assertIs(msg, run_coroutine(self.sent_stanzas.get()))
+
+    def test_iq_replies_ignore_max_queue_size(self):
+        writable = asyncio.Event()
+        self.xmlstream.writing_paused = True
+
+        @asyncio.coroutine
+        def drain():
+            yield from writable.wait()
+
+        self.xmlstream.drain = drain
+
+        @asyncio.coroutine
+        def handle_request(request):
+            return FancyTestIQ()
+
+        self.stream.register_iq_request_coro(
+            structs.IQType.GET,
+            FancyTestIQ,
+            handle_request,
+        )
+
+        self.stream.max_queue_size = 2
+        iqs = [make_test_iq() for i in range(2)]
+        for iq in iqs:
+            self.stream.enqueue(iq)
+
+        self.stream.start(self.xmlstream)
+        request = make_test_iq(from_=TEST_TO, to=TEST_FROM)
+        self.stream.recv_stanza(request)
+        run_coroutine(asyncio.sleep(0.01))
+
+        self.assertTrue(self.stream.running)
+        self.assertTrue(self.sent_stanzas.empty())
+
+        self.xmlstream.writing_paused = False
+        writable.set()
+
+        for iq in iqs:
+            self.assertIs(iq, run_coroutine(self.sent_stanzas.get()))
+
+        reply = run_coroutine(self.sent_stanzas.get())
+        self.assertEqual(structs.IQType.RESULT, reply.type_)
+        self.assertEqual(request.id_, reply.id_)
+        self.assertTrue(self.stream.running)
+
     def test_running(self):
         self.assertFalse(self.stream.running)
         self.stream.start(self.xmlstream)
@@ -1824,38 +2638,143 @@ class TestStanzaStream(StanzaStreamTestBase):
             )
         )
 
-        task = asyncio.async(
-            self.stream.send_iq_and_wait_for_reply(iq),
-            loop=self.loop)
+        task = asyncio.async(
+            self.stream.send_iq_and_wait_for_reply(iq),
+            loop=self.loop)
+
+        self.stream.start(self.xmlstream)
+        run_coroutine(asyncio.sleep(0))
+        self.stream.recv_stanza(response)
+        with self.assertRaises(errors.XMPPCancelError) as ctx:
+            run_coroutine(task)
+        self.assertEqual(
+            (namespaces.stanzas, "item-not-found"),
+            ctx.exception.condition
+        )
+
+    def test_send_iq_and_wait_for_reply_timeout(self):
+        iq = make_test_iq()
+
+        task = asyncio.async(
+            self.stream.send_iq_and_wait_for_reply(
+                iq,
+                timeout=0.01),
+            loop=self.loop)
+
+        self.stream.start(self.xmlstream)
+        run_coroutine(asyncio.sleep(0))
+
+        @asyncio.coroutine
+        def test_task():
+            with self.assertRaises(TimeoutError):
+                yield from task
+
+        run_coroutine(test_task())
+
+    def test_send_timeout_does_not_leave_wheel_entries(self):
+        iq = make_test_iq()
+        self.stream.start(self.xmlstream)
+
+        task = asyncio.async(self.stream.send(iq, timeout=1))
+        run_coroutine(self.sent_stanzas.get())
+        self.assertEqual(len(self.stream._iq_response_timeouts), 1)
+
+        self.stream.recv_stanza(iq.make_reply(type_=structs.IQType.RESULT))
+        run_coroutine(task)
+        self.assertEqual(len(self.stream._iq_response_timeouts), 0)
+
+    def _reply(self, iq, payload=None):
+        response = iq.make_reply(type_=structs.IQType.RESULT)
+        response.payload = payload
+        self.stream.recv_stanza(response)
+
+    def test_send_many_returns_payloads_in_submission_order(self):
+        iqs = [make_test_iq() for i in range(3)]
+        payloads = [FancyTestIQ() for i in range(3)]
+        self.stream.start(self.xmlstream)
+
+        task = asyncio.async(self.stream.send_many(iqs))
+        sent = [run_coroutine(self.sent_stanzas.get()) for iq in iqs]
+        self.assertSequenceEqual(sent, iqs)
+
+        for i in [2, 0, 1]:
+            self._reply(iqs[i], payloads[i])
+
+        self.assertSequenceEqual(run_coroutine(task), payloads)
+
+    def test_send_many_enqueues_in_one_step(self):
+        iqs = [make_test_iq() for i in range(3)]
+        with unittest.mock.patch.object(
+                self.stream, "enqueue",
+                wraps=self.stream.enqueue) as enqueue:
+            task = asyncio.async(self.stream.send_many(iqs))
+            run_coroutine(asyncio.sleep(0))
+
+        self.assertSequenceEqual(
+            enqueue.mock_calls,
+            [unittest.mock.call(iq) for iq in iqs],
+        )
+        task.cancel()
+        run_coroutine(asyncio.sleep(0))
+
+    def test_send_many_respects_window(self):
+        iqs = [make_test_iq() for i in range(3)]
+        self.stream.start(self.xmlstream)
+
+        task = asyncio.async(self.stream.send_many(iqs, window=2))
+        first = run_coroutine(self.sent_stanzas.get())
+        second = run_coroutine(self.sent_stanzas.get())
+        self.assertSequenceEqual([first, second], iqs[:2])
+
+        run_coroutine(asyncio.sleep(0.01))
+        self.assertTrue(self.sent_stanzas.empty())
+
+        self._reply(iqs[1])
+        self.assertIs(run_coroutine(self.sent_stanzas.get()), iqs[2])
+
+        self._reply(iqs[0])
+        self._reply(iqs[2])
+        self.assertSequenceEqual(run_coroutine(task), [None] * 3)
 
+    def test_send_many_timeout(self):
+        iqs = [make_test_iq() for i in range(2)]
         self.stream.start(self.xmlstream)
-        run_coroutine(asyncio.sleep(0))
-        self.stream.recv_stanza(response)
-        with self.assertRaises(errors.XMPPCancelError) as ctx:
-            run_coroutine(task)
-        self.assertEqual(
-            (namespaces.stanzas, "item-not-found"),
-            ctx.exception.condition
-        )
 
-    def test_send_iq_and_wait_for_reply_timeout(self):
-        iq = make_test_iq()
+        task = asyncio.async(self.stream.send_many(
+            iqs,
+            timeout=0.05,
+            return_exceptions=True,
+        ))
+        run_coroutine(self.sent_stanzas.get())
+        self._reply(iqs[0])
 
-        task = asyncio.async(
-            self.stream.send_iq_and_wait_for_reply(
-                iq,
-                timeout=0.01),
-            loop=self.loop)
+        result = run_coroutine(task)
+        self.assertIsNone(result[0])
+        self.assertIsInstance(result[1], TimeoutError)
+        self.assertEqual(len(self.stream._iq_response_timeouts), 0)
 
+    def test_send_many_raises_first_error(self):
+        iqs = [make_test_iq() for i in range(2)]
         self.stream.start(self.xmlstream)
-        run_coroutine(asyncio.sleep(0))
 
-        @asyncio.coroutine
-        def test_task():
-            with self.assertRaises(TimeoutError):
-                yield from task
+        task = asyncio.async(self.stream.send_many(iqs))
+        run_coroutine(self.sent_stanzas.get())
+        self.stream.recv_stanza(iqs[1].make_error(stanza.Error(
+            condition=(namespaces.stanzas, "item-not-found"),
+        )))
 
-        run_coroutine(test_task())
+        with self.assertRaises(errors.XMPPCancelError):
+            run_coroutine(task)
+
+    def test_send_many_rejects_non_requests(self):
+        iq = make_test_iq()
+        with self.assertRaises(ValueError):
+            run_coroutine(self.stream.send_many([
+                iq,
+                iq.make_reply(type_=structs.IQType.RESULT),
+            ]))
+        with self.assertRaises(ValueError):
+            run_coroutine(self.stream.send_many([make_test_message()]))
 
     def test_send_iq_and_wait_for_reply_emits_deprecation_warning(self):
         iq = make_test_iq()
@@ -2775,6 +3694,115 @@ class TestStanzaStream(StanzaStreamTestBase):
             ]
         )
 
+    def test_presence_callback_does_not_fall_back_to_bare_jid(self):
+        base = unittest.mock.Mock()
+        base.bare.return_value = None
+        base.bare._is_coroutine = False
+        base.wildcard.return_value = None
+        base.wildcard._is_coroutine = False
+
+        self.stream.register_presence_callback(
+            structs.PresenceType.AVAILABLE, TEST_FROM.bare(),
+            base.bare
+        )
+        self.stream.register_presence_callback(
+            structs.PresenceType.AVAILABLE, None,
+            base.wildcard
+        )
+
+        self.stream.start(self.xmlstream)
+
+        full = make_test_presence(from_=TEST_FROM)
+        bare = make_test_presence(from_=TEST_FROM.bare())
+        self.stream.recv_stanza(full)
+        self.stream.recv_stanza(bare)
+
+        run_coroutine(asyncio.sleep(0.01))
+
+        self.assertSequenceEqual(
+            base.mock_calls,
+            [
+                unittest.mock.call.wildcard(full),
+                unittest.mock.call.bare(bare),
+            ]
+        )
+
+    def test_message_without_from_uses_from_wildcards(self):
+        base = unittest.mock.Mock()
+        base.chat_full.return_value = None
+        base.chat_full._is_coroutine = False
+        base.fallback.return_value = None
+        base.fallback._is_coroutine = False
+
+        self.stream.register_message_callback(
+            structs.MessageType.CHAT, TEST_FROM,
+            base.chat_full
+        )
+        self.stream.register_message_callback(
+            None, None,
+            base.fallback
+        )
+
+        self.stream.start(self.xmlstream)
+
+        msg = make_test_message(from_=None)
+        self.stream.recv_stanza(msg)
+
+        run_coroutine(asyncio.sleep(0.01))
+
+        self.assertSequenceEqual(
+            base.mock_calls,
+            [
+                unittest.mock.call.fallback(msg),
+            ]
+        )
+
+    def test_unregister_message_callback_keeps_other_callbacks(self):
+        base = unittest.mock.Mock()
+        base.full.return_value = None
+        base.full._is_coroutine = False
+        base.bare.return_value = None
+        base.bare._is_coroutine = False
+
+        self.stream.register_message_callback(
+            structs.MessageType.CHAT, TEST_FROM,
+            base.full
+        )
+        self.stream.register_message_callback(
+            structs.MessageType.CHAT, TEST_FROM.bare(),
+            base.bare
+        )
+        self.stream.unregister_message_callback(
+            structs.MessageType.CHAT, TEST_FROM
+        )
+
+        with self.assertRaises(KeyError):
+            self.stream.unregister_message_callback(
+                structs.MessageType.CHAT, TEST_FROM
+            )
+
+        self.stream.start(self.xmlstream)
+
+        msg = make_test_message(from_=TEST_FROM)
+        self.stream.recv_stanza(msg)
+
+        run_coroutine(asyncio.sleep(0.01))
+
+        self.assertSequenceEqual(
+            base.mock_calls,
+            [
+                unittest.mock.call.bare(msg),
+            ]
+        )
+
+        self.stream.unregister_message_callback(
+            structs.MessageType.CHAT, TEST_FROM.bare()
+        )
+        self.assertNotIn(
+            (structs.MessageType.CHAT, TEST_FROM.bare()),
+            self.stream._message_map,
+        )
+
     def test_task_crash_leads_to_closing_of_xmlstream(self):
         self.stream.ping_interval = timedelta(seconds=0.01)
         self.stream.ping_opportunistic_interval = timedelta(seconds=0.01)
@@ -3474,11 +4502,12 @@ class TestStanzaStreamSM(StanzaStreamTestBase):
             self.stream.sm_inbound_ctr
         )
 
+        # the last two IQs were received in one batch, so their replies are
+        # sent in one bulk
         run_coroutine(self.xmlstream.run_test([
             XMLStreamMock.Send(error_iqs.pop()),
             XMLStreamMock.Send(nonza.SMRequest()),
             XMLStreamMock.Send(error_iqs.pop()),
-            XMLStreamMock.Send(nonza.SMRequest()),
             XMLStreamMock.Send(error_iqs.pop()),
             XMLStreamMock.Send(nonza.SMRequest()),
         ]))
@@ -3878,6 +4907,156 @@ class TestStanzaStreamSM(StanzaStreamTestBase):
         l1.append("foo")
         self.assertFalse(self.stream.sm_unacked_list)
 
+    def test_sm_statistics(self):
+        iqs = [make_test_iq() for i in range(3)]
+
+        self.stream.start(self.xmlstream)
+        run_coroutine_with_peer(
+            self.stream.start_sm(),
+            self.xmlstream.run_test(self.successful_sm)
+        )
+        self.assertEqual(
+            self.stream.sm_statistics,
+            stream.SMStatistics(0, 0, 0, 0.0, 0.0)
+        )
+
+        for iq in iqs:
+            self.stream.enqueue(iq)
+        run_coroutine(self.xmlstream.run_test([
+            XMLStreamMock.Send(iqs[0]),
+            XMLStreamMock.Send(iqs[1]),
+            XMLStreamMock.Send(iqs[2]),
+            XMLStreamMock.Send(nonza.SMRequest()),
+        ]))
+        self.assertEqual(self.stream.sm_statistics.unacked, 3)
+
+        run_coroutine(asyncio.sleep(0.02))
+        run_coroutine(self.xmlstream.run_test(
+            [],
+            stimulus=XMLStreamMock.Receive(
+                nonza.SMAcknowledgement(counter=2)
+            )
+        ))
+
+        stats = self.stream.sm_statistics
+        self.assertEqual(stats.unacked, 1)
+        self.assertEqual(stats.acked, 2)
+        self.assertEqual(stats.resent, 0)
+        self.assertGreaterEqual(stats.max_ack_latency, 0.02)
+        self.assertGreaterEqual(stats.ack_latency, 2 * 0.02)
+
+    def test_sm_statistics_requires_enabled_sm(self):
+        with self.assertRaisesRegex(RuntimeError, "not enabled"):
+            self.stream.sm_statistics
+
+    def test_sm_resume_resends_in_order(self):
+        iqs = [make_test_iq() for i in range(4)]
+
+        additional_iq = iqs.pop()
+
+        self.stream.start(self.xmlstream)
+        run_coroutine_with_peer(
+            self.stream.start_sm(),
+            self.xmlstream.run_test(self.successful_sm)
+        )
+
+        for iq in iqs:
+            self.stream.enqueue(iq)
+
+        run_coroutine(asyncio.sleep(0))
+
+        run_coroutine(self.xmlstream.run_test([
+            XMLStreamMock.Send(iqs[0]),
+            XMLStreamMock.Send(iqs[1]),
+            XMLStreamMock.Send(iqs[2]),
+            XMLStreamMock.Send(
+                nonza.SMRequest(),
+                response=XMLStreamMock.Receive(
+                    nonza.SMAcknowledgement(counter=0)
+                )
+            )
+        ]))
+
+        self.stream.stop()
+        run_coroutine(asyncio.sleep(0))
+
+        self.stream.enqueue(additional_iq)
+
+        run_coroutine_with_peer(
+            self.stream.resume_sm(self.xmlstream),
+            self.xmlstream.run_test([
+                XMLStreamMock.Send(
+                    nonza.SMResume(previd="foobar",
+                                         counter=0),
+                    response=XMLStreamMock.Receive(
+                        nonza.SMResumed(previd="foobar",
+                                              counter=1)
+                    )
+                ),
+                XMLStreamMock.Send(iqs[1]),
+                XMLStreamMock.Send(iqs[2]),
+                XMLStreamMock.Send(additional_iq),
+                XMLStreamMock.Send(nonza.SMRequest()),
+            ])
+        )
+
+        stats = self.stream.sm_statistics
+        self.assertEqual(stats.acked, 1)
+        self.assertEqual(stats.resent, 2)
+        self.assertEqual(stats.unacked, 3)
+
+    def _start_sm_and_send(self, *batches):
+        self.stream.start(self.xmlstream)
+        run_coroutine_with_peer(
+            self.stream.start_sm(),
+            self.xmlstream.run_test(self.successful_sm)
+        )
+        for batch in batches:
+            for iq in batch:
+                self.stream.enqueue(iq)
+            run_coroutine(asyncio.sleep(0))
+
+    def test_sm_request_every(self):
+        iqs = [make_test_iq() for i in range(3)]
+        self.stream.sm_request_every = 3
+
+        self._start_sm_and_send(iqs[:2], iqs[2:])
+
+        run_coroutine(self.xmlstream.run_test([
+            XMLStreamMock.Send(iqs[0]),
+            XMLStreamMock.Send(iqs[1]),
+            XMLStreamMock.Send(iqs[2]),
+            XMLStreamMock.Send(nonza.SMRequest()),
+        ]))
+
+    def test_sm_request_interval(self):
+        iqs = [make_test_iq() for i in range(2)]
+        self.stream.sm_request_interval = timedelta(hours=1)
+
+        self._start_sm_and_send(iqs[:1])
+        self.stream.sm_request_interval = timedelta(0)
+        self.stream.enqueue(iqs[1])
+        run_coroutine(asyncio.sleep(0))
+
+        run_coroutine(self.xmlstream.run_test([
+            XMLStreamMock.Send(iqs[0]),
+            XMLStreamMock.Send(iqs[1]),
+            XMLStreamMock.Send(nonza.SMRequest()),
+        ]))
+
+    def test_sm_max_unacked(self):
+        iqs = [make_test_iq() for i in range(2)]
+        self.stream.sm_request_every = 100
+        self.stream.sm_max_unacked = 2
+
+        self._start_sm_and_send(iqs[:1], iqs[1:])
+
+        run_coroutine(self.xmlstream.run_test([
+            XMLStreamMock.Send(iqs[0]),
+            XMLStreamMock.Send(iqs[1]),
+            XMLStreamMock.Send(nonza.SMRequest()),
+        ]))
+
     def test_sm_ignore_late_remote_counter(self):
         self.stream.start(self.xmlstream)
         run_coroutine_with_peer(
@@ -4207,16 +5386,14 @@ class TestStanzaStreamSM(StanzaStreamTestBase):
         run_coroutine_with_peer(
             self.stream.close(),
             self.xmlstream.run_test([
+                # the broker is woken up by enqueue() directly and thus sends
+                # the stanza before close() gets to run
+                XMLStreamMock.Send(pres),
+                XMLStreamMock.Send(nonza.SMRequest()),
                 XMLStreamMock.Send(
                     nonza.SMAcknowledgement()
                 ),
                 XMLStreamMock.Close(),
-                # this is a race-condition of the test suite
-                # in a real stream, the Send would not happen as the stream
-                # changes state immediately and raises an exception from
-                # send_xso
-                XMLStreamMock.Send(pres),
-                XMLStreamMock.Send(nonza.SMRequest()),
             ]),
         )
 
@@ -4819,6 +5996,22 @@ class Teststanza_filter(unittest.TestCase):
             unittest.mock.sentinel.func,
         )
 
+    def test_enter_passes_selector(self):
+        self.cm = stream.stanza_filter(
+            self.filter_,
+            unittest.mock.sentinel.func,
+            unittest.mock.sentinel.order,
+            selector=unittest.mock.sentinel.selector,
+        )
+
+        self.cm.__enter__()
+
+        self.filter_.register.assert_called_with(
+            unittest.mock.sentinel.func,
+            unittest.mock.sentinel.order,
+            selector=unittest.mock.sentinel.selector,
+        )
+
     def test_exit_unregisters_filter(self):
         self.filter_.register.return_value = \
             unittest.mock.sentinel.token
@@ -19,7 +19,11 @@
 # <http://www.gnu.org/licenses/>.
 #
 ########################################################################
+import random
 import unittest
+import unittest.mock
+
+import aioxmpp.stringprep
 
 from aioxmpp.stringprep import (
     nodeprep, resourceprep, nameprep,
@@ -94,6 +98,19 @@ class TestNodeprep(unittest.TestCase):
             "\u0221",
             nodeprep("\u0221", allow_unassigned=True))
 
+    def test_ascii(self):
+        self.assertEqual(
+            "foo.bar-baz_123",
+            nodeprep("Foo.Bar-BAZ_123"),
+            "Nodeprep requirement: map A-Z to a-z")
+
+    def test_ascii_prohibited_character(self):
+        for c in " \x00\x1f\x7f\"&'/:<>@":
+            with self.assertRaisesRegex(
+                    ValueError,
+                    r"U\+{:04x}".format(ord(c))):
+                nodeprep("foo" + c)
+
 
 class TestNameprep(unittest.TestCase):
     def test_map_to_nothing(self):
@@ -176,6 +193,12 @@ class TestNameprep(unittest.TestCase):
             "\u0221",
             nameprep("\u0221", allow_unassigned=True))
 
+    def test_ascii(self):
+        self.assertEqual(
+            "xn--example-123.test",
+            nameprep("XN--Example-123.TEST"),
+            "Nameprep requirement: map A-Z to a-z")
+
 
 class TestResourceprep(unittest.TestCase):
     def test_map_to_nothing(self):
@@ -194,6 +217,19 @@ class TestResourceprep(unittest.TestCase):
             resourceprep("\u2168"),
             "Resourceprep requirement: NFKC")
 
+    def test_ascii(self):
+        self.assertEqual(
+            "Foo Bar/@baz",
+            resourceprep("Foo Bar/@baz"),
+            "Resourceprep requirement: no case mapping")
+
+    def test_ascii_prohibited_character(self):
+        for c in "\x00\x1f\x7f":
+            with self.assertRaisesRegex(
+                    ValueError,
+                    r"U\+{:04x}".format(ord(c))):
+                resourceprep("foo" + c)
+
     def test_prohibited_character(self):
         with self.assertRaisesRegex(
                 ValueError,
@@ -223,3 +259,76 @@ class TestResourceprep(unittest.TestCase):
         self.assertEqual(
             "\u0221",
             resourceprep("\u0221", allow_unassigned=True))
+
+
+class TestDifferential(unittest.TestCase):
+    """
+    Compare the table-driven profiles against the straightforward
+    implementations on random input.
+    """
+
+    PROFILES = [
+        (nodeprep, aioxmpp.stringprep._nodeprep_reference),
+        (resourceprep, aioxmpp.stringprep._resourceprep_reference),
+        (nameprep, aioxmpp.stringprep._nameprep_reference),
+    ]
+
+    # code points which are special for at least one of the tables
+    INTERESTING = [
+        0x0020, 0x0041, 0x00ad, 0x00aa, 0x00df, 0x0221, 0x05be, 0x0627,
+        0x06dd, 0x200b, 0x200e, 0x2168, 0x2ff0, 0x3000, 0xd800, 0xe000,
+        0xfff9, 0x1fffe, 0xe0001,
+    ]
+
+    RANGES = [
+        (0x0000, 0x0080),
+        (0x0080, 0x0800),
+        (0x0590, 0x0700),
+        (0x2000, 0x3100),
+        (0xfb00, 0x10000),
+        (0x10000, 0x30000),
+        (0xe0000, 0xe0080),
+    ]
+
+    def _result(self, func, string, allow_unassigned):
+        try:
+            return func(string, allow_unassigned=allow_unassigned)
+        except ValueError as exc:
+            return ValueError, str(exc)
+
+    def _compare(self, string):
+        for impl, reference in self.PROFILES:
+            for allow_unassigned in [False, True]:
+                self.assertEqual(
+                    self._result(impl, string, allow_unassigned),
+                    self._result(reference, string, allow_unassigned),
+                    "{} differs for {!r} (allow_unassigned={})".format(
+                        impl.__name__,
+                        string,
+                        allow_unassigned,
+                    )
+                )
+
+    def _random_codepoint(self, rng):
+        if rng.random() < 0.2:
+            return rng.choice(self.INTERESTING)
+        return rng.randrange(*rng.choice(self.RANGES))
+
+    def test_single_codepoints(self):
+        for cp in list(range(0x0000, 0x0250)) + self.INTERESTING:
+            self._compare(chr(cp))
+
+    def test_fuzz(self):
+        rng = random.Random(6122)
+        for i in range(3000):
+            string = "".join(
+                chr(self._random_codepoint(rng))
+                for j in range(rng.randint(0, 10))
+            )
+            self._compare(string)
+
+    def test_tables_are_bounded(self):
+        with unittest.mock.patch("aioxmpp.stringprep._TABLE_LIMIT", new=4):
+            table = aioxmpp.stringprep._CodepointTable(lambda cp: cp + 1)
+            self.assertEqual("abcdefgh".translate(table), "bcdefghi")
+            self.assertEqual(len(table), 4)
@@ -20,8 +20,10 @@
 #
 ########################################################################
 import collections.abc
+import contextlib
 import enum
 import unittest
+import unittest.mock
 import warnings
 
 import aioxmpp
@@ -481,6 +483,32 @@ class TestJID(unittest.TestCase):
             structs.JID("foo", "example.test", None),
             j.bare())
 
+    def test_bare_returns_bare_jid_unchanged(self):
+        j = structs.JID("foo", "example.test", None)
+        self.assertIs(j.bare(), j)
+
+    def test_bare_is_cached(self):
+        j1 = structs.JID("foo", "example.test", "bar")
+        j2 = structs.JID("foo", "example.test", "baz")
+        self.assertIs(j1.bare(), j2.bare())
+        self.assertIsInstance(j1.bare(), structs.JID)
+
+    def test_bare_does_not_run_stringprep(self):
+        j = structs.JID("bare-test", "example.test", "bar")
+        with contextlib.ExitStack() as stack:
+            nodeprep = stack.enter_context(unittest.mock.patch(
+                "aioxmpp.structs.nodeprep"
+            ))
+            nameprep = stack.enter_context(unittest.mock.patch(
+                "aioxmpp.structs.nameprep"
+            ))
+            bare = j.bare()
+
+        self.assertEqual(bare, structs.JID("bare-test", "example.test", None))
+
+        nodeprep.assert_not_called()
+        nameprep.assert_not_called()
+
     def test_is_bare(self):
         self.assertFalse(structs.JID("foo", "example.test", "bar").is_bare)
         self.assertTrue(structs.JID("foo", "example.test", None).is_bare)
@@ -525,6 +553,21 @@ class TestJID(unittest.TestCase):
             structs.JID.fromstr("ix.test")
         )
 
+    def test_fromstr_is_cached(self):
+        j = structs.JID.fromstr("cached@example.test/bar")
+        self.assertIs(j, structs.JID.fromstr("cached@example.test/bar"))
+
+    def test_fromstr_cache_respects_strict(self):
+        j = structs.JID.fromstr("\u0221@example.test", strict=False)
+        self.assertEqual(j.localpart, "\u0221")
+        with self.assertRaises(ValueError):
+            structs.JID.fromstr("\u0221@example.test")
+
+    def test_fromstr_errors_are_not_cached(self):
+        for i in range(2):
+            with self.assertRaises(ValueError):
+                structs.JID.fromstr("foo@example.test/")
+
     def test_fromstr_domain_nonstrict(self):
         self.assertEqual(
             structs.JID("\U0001f601", "\U0001f601example.test", "\U0001f601",
@@ -918,6 +918,20 @@ class TestXMLStreamMock(XMLTestCase):
             ConnectionError
         )
 
+    def test_pause_and_resume_writing(self):
+        self.assertFalse(self.xmlstream.writing_paused)
+        run_coroutine(self.xmlstream.drain())
+
+        self.xmlstream.pause_writing()
+        self.assertTrue(self.xmlstream.writing_paused)
+        task = asyncio.async(self.xmlstream.drain())
+        run_coroutine(asyncio.sleep(0))
+        self.assertFalse(task.done())
+
+        self.xmlstream.resume_writing()
+        self.assertFalse(self.xmlstream.writing_paused)
+        run_coroutine(task)
+
     def test_catch_surplus_abort(self):
         self.xmlstream.abort()
 
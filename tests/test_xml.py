@@ -30,6 +30,7 @@ import lxml.sax
 import xml.sax.handler as saxhandler
 
 import aioxmpp.xml as xml
+import aioxmpp.stanza as stanza
 import aioxmpp.structs as structs
 import aioxmpp.errors as errors
 import aioxmpp.xso as xso
@@ -872,6 +873,222 @@ class Testwrite_xmlstream(unittest.TestCase):
         del self.buf
 
 
+class TestXMPPXMLSerializer(unittest.TestCase):
+    TEST_TO = structs.JID.fromstr("example.test")
+
+    class Child(xso.XSO):
+        TAG = ("uri:foo", "child")
+
+        DECLARE_NS = {
+            None: "uri:foo",
+            "bar": "uri:bar",
+        }
+
+        attr = xso.Attr("a", default=None)
+        lang = xso.LangAttr()
+        text = xso.Text(default=None)
+        flag = xso.ChildFlag(("uri:bar", "flag"))
+
+    class Root(xso.XSO):
+        TAG = ("jabber:client", "root")
+
+        attr_z = xso.Attr("z", default=None)
+        attr_a = xso.Attr("a", default=None)
+        text = xso.ChildText(("jabber:client", "text"), default=None)
+        children = xso.ChildList([])
+        collector = xso.Collector()
+
+    Root.register_child(Root.children, Child)
+
+    class NamespacedAttr(xso.XSO):
+        TAG = ("uri:foo", "nsattr")
+
+        attr = xso.Attr(("uri:bar", "a"), default=None)
+
+    def setUp(self):
+        self.buf = io.BytesIO()
+
+    def _make_root(self):
+        root = self.Root()
+        root.attr_z = "z\"'<&>"
+        root.attr_a = "a"
+        root.text = "foo & bar"
+        child = self.Child()
+        child.attr = "x"
+        child.lang = structs.LanguageTag.fromstr("de")
+        child.text = "<text>"
+        child.flag = True
+        root.children.append(child)
+        root.children.append(self.Child())
+        root.collector.append(etree.fromstring(
+            "<other xmlns='uri:other'><nested/></other>"
+        ))
+        return root
+
+    def _serialize(self, objs, *, use_serializer, **kwargs):
+        buf = io.BytesIO()
+        gen = xml.write_xmlstream(buf, self.TEST_TO,
+                                  use_serializer=use_serializer,
+                                  **kwargs)
+        next(gen)
+        for obj in objs:
+            gen.send(obj)
+        gen.close()
+        return buf.getvalue()
+
+    def _assert_identical_output(self, objs, **kwargs):
+        expected = self._serialize(objs, use_serializer=False, **kwargs)
+        self.assertEqual(
+            expected,
+            self._serialize(objs, use_serializer=True, **kwargs)
+        )
+        return expected
+
+    def test_is_generator(self):
+        self.assertTrue(issubclass(
+            xml.XMPPXMLSerializer,
+            xml.XMPPXMLGenerator,
+        ))
+
+    def test_buffers_output_until_flush(self):
+        out = unittest.mock.Mock()
+        gen = xml.XMPPXMLSerializer(out)
+        gen.write_xso(self._make_root())
+        self.assertSequenceEqual([], out.mock_calls)
+
+        gen.flush()
+        self.assertSequenceEqual(
+            [
+                unittest.mock.call.write(unittest.mock.ANY),
+                unittest.mock.call.flush(),
+            ],
+            out.mock_calls
+        )
+
+    def test_write_xso_equals_unparse_to_sax(self):
+        output = self._assert_identical_output(
+            [self._make_root(), self._make_root()],
+            nsmap={None: "jabber:client"},
+        )
+        self.assertIn(b'<child xmlns="uri:foo" xmlns:bar="uri:bar"', output)
+
+    def test_write_xso_equals_unparse_to_sax_sorted(self):
+        self._assert_identical_output(
+            [self._make_root(), self._make_root()],
+            nsmap={None: "jabber:client"},
+            sorted_attributes=True,
+        )
+
+    def test_write_xso_equals_unparse_to_sax_with_auto_prefixes(self):
+        self._assert_identical_output(
+            [self._make_root(), self._make_root()],
+            nsmap={"foo": "uri:foo"},
+        )
+
+    def test_write_xso_equals_unparse_to_sax_for_long_empty_elements(self):
+        out = io.BytesIO()
+        gen = xml.XMPPXMLGenerator(out, short_empty_elements=False)
+        self._make_root().unparse_to_sax(gen)
+        gen.flush()
+
+        out_serializer = io.BytesIO()
+        gen = xml.XMPPXMLSerializer(out_serializer,
+                                    short_empty_elements=False)
+        gen.write_xso(self._make_root())
+        gen.flush()
+
+        self.assertEqual(out.getvalue(), out_serializer.getvalue())
+
+    def test_write_xso_equals_unparse_to_sax_for_stanzas(self):
+        msg = stanza.Message(type_="chat", to=self.TEST_TO)
+        msg.id_ = "foo"
+        msg.body[None] = "foo"
+        msg.body[structs.LanguageTag.fromstr("de")] = "bar"
+        iq = stanza.IQ(type_="error", to=self.TEST_TO)
+        iq.id_ = "bar"
+        iq.error = stanza.Error(
+            condition=(namespaces.stanzas, "item-not-found"),
+            text="foo",
+        )
+        self._assert_identical_output(
+            [msg, iq, stanza.Presence(), msg],
+            nsmap={None: "jabber:client"},
+        )
+
+    def test_write_xso_falls_back_for_namespaced_attributes(self):
+        obj = self.NamespacedAttr()
+        obj.attr = "foo"
+        output = self._assert_identical_output([obj, obj])
+        self.assertIn(b'ns0:a="foo"', output)
+
+    def test_write_xso_falls_back_for_custom_unparse_to_sax(self):
+        class Custom(xso.XSO):
+            TAG = ("uri:foo", "custom")
+
+            def unparse_to_sax(self, dest):
+                dest.startElementNS(("uri:foo", "other"), None, {})
+                dest.endElementNS(("uri:foo", "other"), None)
+
+        output = self._assert_identical_output([Custom()])
+        self.assertIn(b"other", output)
+
+    def test_write_xso_writes_end_tag_on_error(self):
+        class FailingType(xso.AbstractType):
+            def parse(self, v):
+                return v
+
+            def format(self, v):
+                raise TypeError()
+
+        class Failing(xso.XSO):
+            TAG = ("uri:foo", "failing")
+
+            text = xso.Text(type_=FailingType())
+
+        obj = Failing()
+        obj.text = "foo"
+
+        outputs = []
+        for cls in [xml.XMPPXMLGenerator, xml.XMPPXMLSerializer]:
+            out = io.BytesIO()
+            gen = cls(out)
+            with self.assertRaises(TypeError):
+                if cls is xml.XMPPXMLSerializer:
+                    gen.write_xso(obj)
+                else:
+                    obj.unparse_to_sax(gen)
+            gen.flush()
+            outputs.append(out.getvalue())
+
+        self.assertEqual(outputs[0], outputs[1])
+
+    def test_plans_are_cached_and_invalidated(self):
+        class Foo(xso.XSO):
+            TAG = ("uri:foo", "foo")
+
+        gen = xml.XMPPXMLSerializer(self.buf)
+        gen.write_xso(Foo())
+        self.assertEqual(1, len(Foo._xso_unparse_plans))
+
+        Foo.attr = xso.Attr("a")
+        self.assertNotIn("_xso_unparse_plans", Foo.__dict__)
+
+        obj = Foo()
+        obj.attr = "bar"
+        gen.write_xso(obj)
+        gen.flush()
+        self.assertEqual(
+            b'<foo xmlns="uri:foo"/>'
+            b'<foo xmlns="uri:foo" a="bar"/>',
+            self.buf.getvalue()
+        )
+
+
+class Testwrite_xmlstreamWithSerializer(Testwrite_xmlstream):
+    def _make_gen(self, **kwargs):
+        return super()._make_gen(use_serializer=True, **kwargs)
+
+
 class TestXMPPXMLProcessor(unittest.TestCase):
     VALID_STREAM_HEADER = "".join((
         "<stream:stream xmlns:stream='{}'".format(namespaces.xmlstream),
@@ -1414,6 +1631,90 @@ class TestXMPPXMLProcessor(unittest.TestCase):
         del self.parser
 
 
+class TestXMPPXMLExpatProcessor(TestXMPPXMLProcessor):
+    def setUp(self):
+        self.proc = xml.XMPPXMLExpatProcessor()
+        self.parser = self.proc
+
+    def test_is_processor(self):
+        self.assertIsInstance(self.proc, xml.XMPPXMLProcessor)
+
+    def test_name_cache_is_bounded(self):
+        self.assertIsNotNone(xml._split_expat_name.cache_info().maxsize)
+
+    def test_split_expat_name(self):
+        self.assertEqual(
+            ("uri:foo", "bar"),
+            xml._split_expat_name("uri:foo bar")
+        )
+        self.assertEqual(
+            (None, "bar"),
+            xml._split_expat_name("bar")
+        )
+
+    def _assert_feed_raises(self, data, condition):
+        self.proc.stanza_parser = xso.XSOParser()
+        with self.assertRaises(errors.StreamError) as cm:
+            self.proc.feed(self.VALID_STREAM_HEADER.encode("utf-8") + data)
+        self.assertEqual(
+            (namespaces.streams, condition),
+            cm.exception.condition
+        )
+
+    def test_feed_rejects_comments(self):
+        self._assert_feed_raises(b"<!-- foo -->", "restricted-xml")
+
+    def test_feed_rejects_processing_instructions(self):
+        self._assert_feed_raises(b"<?foo bar?>", "restricted-xml")
+
+    def test_feed_rejects_non_predefined_entities(self):
+        self._assert_feed_raises(b"<foo>&bar;</foo>", "restricted-xml")
+
+    def test_feed_rejects_dtd(self):
+        self.proc.stanza_parser = xso.XSOParser()
+        with self.assertRaises(errors.StreamError) as cm:
+            self.proc.feed(b"<!DOCTYPE stream:stream>" +
+                           self.VALID_STREAM_HEADER.encode("utf-8"))
+        self.assertEqual(
+            (namespaces.streams, "restricted-xml"),
+            cm.exception.condition
+        )
+
+    def test_feed_rejects_malformed_xml(self):
+        self._assert_feed_raises(b"<foo></bar>", "bad-format")
+
+    def test_feed_parses_stanzas(self):
+        class Cls(xso.XSO):
+            TAG = ("uri:foo", "foo")
+
+            attr = xso.Attr("a")
+            lang = xso.LangAttr()
+            text = xso.Text(default="")
+
+        results = []
+        self.proc.stanza_parser = xso.XSOParser()
+        self.proc.stanza_parser.add_class(Cls, results.append)
+        on_stream_footer = unittest.mock.Mock()
+        self.proc.on_stream_footer = on_stream_footer
+
+        self.proc.feed(self.VALID_STREAM_HEADER.encode("utf-8"))
+        self.proc.feed(b"<foo xmlns='uri:foo' a='x' xml:lang='de'>a&amp;")
+        self.proc.feed(b"b</foo>\n<foo xmlns='uri:foo' a='y'/>")
+        self.assertFalse(on_stream_footer.mock_calls)
+        self.proc.feed(b"</stream:stream>")
+
+        self.assertEqual(
+            [("x", structs.LanguageTag.fromstr("de"), "a&b"),
+             ("y", None, "")],
+            [(obj.attr, obj.lang, obj.text) for obj in results]
+        )
+        self.assertSequenceEqual(
+            [unittest.mock.call()],
+            on_stream_footer.mock_calls
+        )
+
+
+
 class Testmake_parser(unittest.TestCase):
     def setUp(self):
         self.p = xml.make_parser()
@@ -1650,6 +1650,112 @@ class TestXMLStreamClass(unittest.TestCase):
             new.mock_calls
         )
 
+    def _parse(self, cls, *events):
+        gen = cls.parse_events(events[0][1:], self.ctx)
+        next(gen)
+        with self.assertRaises(StopIteration) as ctx:
+            for ev in events[1:]:
+                gen.send(ev)
+        return ctx.exception.value
+
+    def test_parse_events_caches_parse_plan(self):
+        class Cls(xso.XSO):
+            TAG = "foo"
+
+        with unittest.mock.patch.object(
+                xso_model.XMLStreamClass,
+                "_compile_parse_events",
+                autospec=True,
+                side_effect=xso_model.XMLStreamClass._compile_parse_events,
+                ) as compile_:
+            self._parse(Cls, ("start", None, "foo", {}), ("end",))
+            self._parse(Cls, ("start", None, "foo", {}), ("end",))
+
+        self.assertSequenceEqual(
+            [
+                unittest.mock.call(Cls),
+            ],
+            compile_.mock_calls
+        )
+
+    def test_parse_plan_is_invalidated_by_setattr(self):
+        class Cls(xso.XSO):
+            TAG = "foo"
+
+        self._parse(Cls, ("start", None, "foo", {(None, "a"): "x"}),
+                    ("end",))
+
+        Cls.UNKNOWN_ATTR_POLICY = xso.UnknownAttrPolicy.FAIL
+
+        with self.assertRaisesRegex(ValueError, "unexpected attribute"):
+            self._parse(Cls, ("start", None, "foo", {(None, "a"): "x"}),
+                        ("end",))
+
+        Cls.attr = xso.Attr("a")
+
+        obj = self._parse(Cls, ("start", None, "foo", {(None, "a"): "x"}),
+                          ("end",))
+        self.assertEqual("x", obj.attr)
+
+    def test_parse_plan_is_invalidated_for_subclasses(self):
+        class Base(xso.XSO):
+            TAG = "foo"
+
+        class Cls(Base):
+            pass
+
+        self._parse(Cls, ("start", None, "foo", {}),
+                    ("start", None, "bar", {}),
+                    ("end",),
+                    ("end",))
+
+        Base.UNKNOWN_CHILD_POLICY = xso.UnknownChildPolicy.FAIL
+
+        with self.assertRaisesRegex(ValueError, "unexpected child"):
+            self._parse(Cls, ("start", None, "foo", {}),
+                        ("start", None, "bar", {}),
+                        ("end",),
+                        ("end",))
+
+    def test_parse_plan_is_invalidated_by_register_child(self):
+        class Child(xso.XSO):
+            TAG = "bar"
+
+        class Cls(xso.XSO):
+            TAG = "foo"
+            UNKNOWN_CHILD_POLICY = xso.UnknownChildPolicy.FAIL
+
+            child = xso.Child([])
+
+        with self.assertRaisesRegex(ValueError, "unexpected child"):
+            self._parse(Cls, ("start", None, "foo", {}),
+                        ("start", None, "bar", {}),
+                        ("end",),
+                        ("end",))
+
+        Cls.register_child(Cls.child, Child)
+
+        obj = self._parse(Cls, ("start", None, "foo", {}),
+                          ("start", None, "bar", {}),
+                          ("end",),
+                          ("end",))
+        self.assertIsInstance(obj.child, Child)
+
+    def test_parse_plan_calls_handle_missing_only_where_needed(self):
+        class Cls(xso.XSO):
+            TAG = "foo"
+
+            optional = xso.Attr("a", default=None)
+            required = xso.Attr("b")
+
+        with unittest.mock.patch.object(
+                Cls.optional.xq_descriptor, "handle_missing"
+                ) as optional_missing:
+            with self.assertRaisesRegex(ValueError, "missing attribute"):
+                self._parse(Cls, ("start", None, "foo", {}), ("end",))
+
+        self.assertSequenceEqual([], optional_missing.mock_calls)
+
     def test_default_declare_ns_to_empty_dict_for_namespaceless_tag(self):
         class Cls(metaclass=xso_model.XMLStreamClass):
             TAG = "foo"